@@ -0,0 +1,68 @@
+"""
+Benchmark for the bulk attribute reads of zync_maya.get_scene_files().
+Scans a synthetic scene once with the handler attributes prefetched a node
+type at a time through bulk_get_attr(), the way it's done through the
+OpenMaya API in Maya, and once with every attribute read with its own
+getAttr call, and compares the wall time and the number of maya.cmds calls
+of the two. Both scans have to find the same files. Many of the scene's
+nodes lack some of the attributes read, as meshes lack miProxyFile when
+Mental Ray isn't loaded; the bulk reads record those misses, so they don't
+cost a getAttr each either.
+
+The synthetic scene answers a getAttr a lot faster than Maya does, so the
+call counts are the better guide to the difference in Maya.
+
+Usage:
+    python benchmarks/bench_bulk_attrs.py [--nodes 50000]
+"""
+
+import optparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import zync_maya
+from replay import CountingBackend
+from synthetic import PerPlugBackend, SyntheticScene
+
+def scan(backend):
+    """
+    Runs get_scene_files against the given backend from cold caches.
+    Returns the (files, seconds, CountingBackend) of the scan.
+    """
+    counter = CountingBackend(backend)
+    previous = zync_maya.set_cmds_backend(counter, backend.mel)
+    try:
+        zync_maya.clear_attr_cache()
+        zync_maya.clear_attr_schemas()
+        started = time.time()
+        files = list(zync_maya.get_scene_files(zync_maya.SceneIndex()))
+        elapsed = time.time() - started
+    finally:
+        zync_maya.set_cmds_backend(*previous)
+    return files, elapsed, counter
+
+def main(argv):
+    parser = optparse.OptionParser(usage='%prog [--nodes N]')
+    parser.add_option('--nodes', type='int', default=50000,
+                      help='node count of the synthetic scene [default: %default]')
+    options, args = parser.parse_args(argv)
+
+    scene = SyntheticScene(options.nodes)
+    per_plug_files, per_plug_time, per_plug = scan(PerPlugBackend(scene))
+    bulk_files, bulk_time, bulk = scan(scene)
+    if bulk_files != per_plug_files:
+        sys.exit('The bulk and per plug scans found different files.')
+
+    print '%d nodes, %d files' % (len(scene.nodes), len(bulk_files))
+    print '%-10s %10s %8s %8s %14s' % ('reads', 'ms', 'calls', 'getAttr', 'bulk_get_attr')
+    for name, elapsed, counter in (('per plug', per_plug_time, per_plug),
+                                   ('bulk', bulk_time, bulk)):
+        print '%-10s %10.1f %8d %8d %14d' % (name, elapsed * 1000.0, counter.total(),
+                                             counter.counts['getAttr'],
+                                             counter.counts['bulk_get_attr'])
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
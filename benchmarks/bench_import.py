@@ -0,0 +1,120 @@
+"""
+Benchmark for the cost of importing zync_maya, which Maya pays the first
+time the ZYNC shelf button is used and mayapy workers pay on every scene.
+Imports the module in fresh interpreters against a stub maya package and a
+stub zync module, and reports the import time, the number of modules the
+import loads, and whether it read config_maya.py, constructed the ZYNC
+client or read the metadata cache from disk - none of which it should do
+before a submit needs them.
+
+Usage:
+    python benchmarks/bench_import.py [--runs 20]
+"""
+
+import json
+import optparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+#
+#   Stub modules, written to a temp dir that goes on the path ahead of the
+#   plugin. The zync stub records being imported and constructed.
+#
+_STUBS = {
+    'maya/__init__.py': '',
+    'maya/cmds.py': '',
+    'maya/mel.py': '',
+    'maya/utils.py': 'def executeDeferred(func, *args):\n    func(*args)\n',
+    'zync.py': 'import sys\n'
+               'sys.zync_imported = True\n'
+               'class Zync(object):\n'
+               '    def __init__(self, *args, **kwargs):\n'
+               '        sys.zync_client_constructed = True\n',
+}
+
+#
+#   Run in each fresh interpreter; prints the measurements as JSON.
+#
+_IMPORT_SCRIPT = '''
+import json, sys, time
+before = set(sys.modules)
+started = time.time()
+import zync_maya
+elapsed = time.time() - started
+print json.dumps({
+    'ms': elapsed * 1000.0,
+    'modules': len(set(sys.modules) - before),
+    'config_loaded': 'config_maya' in sys.modules,
+    'zync_imported': getattr(sys, 'zync_imported', False),
+    'client_constructed': getattr(sys, 'zync_client_constructed', False),
+    'metadata_cache_read': zync_maya.METADATA_CACHE._entries is not None})
+'''
+
+def _write_stubs(stub_dir):
+    for name, source in _STUBS.items():
+        path = os.path.join(stub_dir, name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        f = open(path, 'w')
+        try:
+            f.write(source)
+        finally:
+            f.close()
+
+def _write_metadata_cache(home_dir):
+    # a cache file for the import to leave alone
+    cache_dir = os.path.join(home_dir, '.zync')
+    os.makedirs(cache_dir)
+    f = open(os.path.join(cache_dir, 'maya_metadata_cache.json'), 'w')
+    try:
+        json.dump({'project_list': [0, {'code': 0, 'response': []}]}, f)
+    finally:
+        f.close()
+
+def measure(runs):
+    """
+    Imports zync_maya in the given number of fresh interpreters. Returns
+    the list of measurements, one dict per run.
+    """
+    temp_dir = tempfile.mkdtemp(prefix='zync_bench_import_')
+    try:
+        stub_dir = os.path.join(temp_dir, 'stubs')
+        home_dir = os.path.join(temp_dir, 'home')
+        _write_stubs(stub_dir)
+        _write_metadata_cache(home_dir)
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join([stub_dir, PLUGIN_DIR])
+        env['HOME'] = home_dir
+        env['USERPROFILE'] = home_dir
+        env['PYTHONDONTWRITEBYTECODE'] = '1'
+        results = []
+        for i in range(runs):
+            output = subprocess.check_output([sys.executable, '-c', _IMPORT_SCRIPT],
+                                             env=env, cwd=temp_dir)
+            results.append(json.loads(output.strip().splitlines()[-1]))
+        return results
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def main(argv):
+    parser = optparse.OptionParser(usage='%prog [--runs N]')
+    parser.add_option('--runs', type='int', default=20,
+                      help='number of fresh interpreters to import in [default: %default]')
+    options, args = parser.parse_args(argv)
+
+    results = measure(options.runs)
+    times = sorted(result['ms'] for result in results)
+    print 'import zync_maya, %d runs' % (len(results),)
+    print '  median %.1f ms, min %.1f ms, max %.1f ms' % (times[len(times) // 2],
+                                                        times[0], times[-1])
+    print '  modules loaded: %d' % (results[0]['modules'],)
+    for key in ('config_loaded', 'zync_imported', 'client_constructed', 'metadata_cache_read'):
+        print '  %s: %s' % (key.replace('_', ' '), any(result[key] for result in results))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,92 @@
+"""
+Benchmark for how zync_maya.collect_layer_info() resolves render layer
+overrides. Collects the info of every render layer of a synthetic scene by
+reading the layers' adjustments, as collect_layer_info() does, and by
+switching to each layer and back, as it did before, checks that both give
+the same info and compares their wall time, maya.cmds calls and layer
+switches per layer.
+
+In Maya every layer switch re-evaluates the scene, which costs far more than
+the synthetic scene's switches do, so the switch counts are the better guide
+to the difference in Maya.
+
+Usage:
+    python benchmarks/bench_layer_overrides.py [--nodes 60000] [--renderer vray]
+"""
+
+import optparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import zync_maya
+from replay import CountingBackend
+from synthetic import SyntheticScene
+
+def collect_by_switching(layer, renderer, index):
+    """
+    Collects the info of the given layer the way collect_layer_info() used
+    to, by making the layer current.
+    """
+    cur_layer = zync_maya.cmds.editRenderLayerGlobals(q=True, currentRenderLayer=True)
+    zync_maya.cmds.editRenderLayerGlobals(currentRenderLayer=layer)
+    try:
+        return zync_maya._collect_layer_info(renderer, index, zync_maya.cmds.getAttr)
+    finally:
+        zync_maya.cmds.editRenderLayerGlobals(currentRenderLayer=cur_layer)
+
+def collect_from_overrides(layer, renderer, index):
+    return zync_maya.collect_layer_info(layer, renderer, index=index)
+
+def run(scene, renderer, collect):
+    """
+    Collects the info of every layer of the scene with the given function,
+    from cold caches. Returns the (infos, seconds, CountingBackend) of the
+    run.
+    """
+    counter = CountingBackend(scene)
+    previous = zync_maya.set_cmds_backend(counter, scene.mel)
+    try:
+        zync_maya.clear_layer_info()
+        index = zync_maya.SceneIndex()
+        counter.counts.clear()
+        started = time.time()
+        infos = [collect(layer, renderer, index) for layer in scene.layers]
+        elapsed = time.time() - started
+    finally:
+        zync_maya.set_cmds_backend(*previous)
+    return infos, elapsed, counter
+
+def main(argv):
+    parser = optparse.OptionParser(usage='%prog [--nodes N] [--renderer vray|sw]')
+    parser.add_option('--nodes', type='int', default=60000,
+                      help='node count of the synthetic scene, which has a render layer '
+                           'per 2000 nodes [default: %default]')
+    parser.add_option('--renderer', default='vray',
+                      help='renderer to collect the layer info for [default: %default]')
+    options, args = parser.parse_args(argv)
+
+    scene = SyntheticScene(options.nodes)
+    switched, switch_time, switch_counter = run(scene, options.renderer, collect_by_switching)
+    resolved, resolve_time, resolve_counter = run(scene, options.renderer, collect_from_overrides)
+    if switched != resolved:
+        sys.exit('Switching layers and reading overrides gave different layer info.')
+    if scene.current_layer != 'defaultRenderLayer':
+        sys.exit('The current render layer was not restored.')
+
+    layer_count = len(scene.layers)
+    print '%d render layers, %s' % (layer_count, options.renderer)
+    print '%-12s %14s %16s %18s' % ('layers by', 'ms per layer', 'calls per layer',
+                                    'switches per layer')
+    for name, elapsed, counter in (('switching', switch_time, switch_counter),
+                                   ('overrides', resolve_time, resolve_counter)):
+        # the queries for the current layer don't switch
+        switches = counter.counts['editRenderLayerGlobals'] - layer_count
+        print '%-12s %14.3f %16.1f %18.1f' % (name, elapsed * 1000.0 / layer_count,
+                                              counter.total() / float(layer_count),
+                                              switches / float(layer_count))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
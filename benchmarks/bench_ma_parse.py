@@ -0,0 +1,118 @@
+"""
+Benchmark for the Maya ASCII reference scanner, zync_maya.parse_ma_file()
+and scan_ma_references(). Writes a synthetic shot - a top level .ma file
+referencing asset .ma files, some of them nested, padded with mesh data to
+the requested total size - and times scanning it.
+
+Usage:
+    python benchmarks/bench_ma_parse.py [--size-mb 2048] [--assets 8] [--dir path] [--keep]
+"""
+
+import optparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import zync_maya
+
+_HEADER = '//Maya ASCII 2014 scene\nrequires maya "2014";\ncurrentUnit -l centimeter -a degree -t film;\n'
+
+def _write_mesh(f, name, rnd, vertex_count):
+    f.write('createNode transform -n "%s";\n' % (name,))
+    f.write('createNode mesh -n "%sShape" -p "%s";\n' % (name, name))
+    f.write('\tsetAttr -k off ".v";\n')
+    f.write('\tsetAttr -s %d ".vt";\n' % (vertex_count,))
+    for start in range(0, vertex_count, 3):
+        end = min(start + 3, vertex_count) - 1
+        points = ' '.join('%.6f %.6f %.6f' % (rnd.random(), rnd.random(), rnd.random()) \
+            for i in range(start, end + 1))
+        f.write('\tsetAttr ".vt[%d:%d]" %s;\n' % (start, end, points) if start == 0 \
+            else '\t\t %s\n' % (points,))
+    f.write('\t\t;\n')
+
+def _write_scene(path, rnd, size, references, textures):
+    f = open(path, 'w')
+    try:
+        f.write(_HEADER)
+        for i, (ref_path, deferred) in enumerate(references):
+            f.write('file -r%s -ns "ref%d" -rfn "ref%dRN" -op "v=0;" -typ "mayaAscii" "%s";\n' % (
+                deferred and ' -dr 1' or '', i, i, ref_path))
+        for i, texture in enumerate(textures):
+            f.write('createNode file -n "file%d";\n' % (i,))
+            f.write('\tsetAttr ".ftn" -type "string" "%s";\n' % (texture,))
+            f.write('\tsetAttr ".ft" 2;\n')
+            if i % 10 == 0:
+                f.write('createNode AlembicNode -n "abc%d";\n' % (i,))
+                f.write('\tsetAttr ".fn" -type "string" "cache/alembic/asset%d.abc";\n' % (i,))
+        mesh = 0
+        while f.tell() < size:
+            _write_mesh(f, 'mesh%d' % (mesh,), rnd, 20000)
+            mesh += 1
+    finally:
+        f.close()
+
+def write_shot(dir_path, size, assets, seed=1):
+    """
+    Writes the synthetic shot to dir_path. Returns the path of its top
+    level scene.
+    """
+    rnd = random.Random(seed)
+    asset_size = size // (assets + 1)
+    for i in range(assets):
+        nested = []
+        if i % 2 == 0 and i + 1 < assets:
+            nested = [('%s/asset%d.ma' % (dir_path, i + 1), False)]
+        textures = ['sourceimages/asset%d/tex%d.<UDIM>.exr' % (i, t) for t in range(200)]
+        _write_scene('%s/asset%d.ma' % (dir_path, i), rnd, asset_size, nested, textures)
+    top_refs = [('%s/asset%d.ma' % (dir_path, i), i % 3 == 0) for i in range(0, assets, 2)]
+    shot_path = '%s/shot.ma' % (dir_path,)
+    _write_scene(shot_path, rnd, asset_size, top_refs, ['sourceimages/shot/plate%d.exr' % (t,) for t in range(50)])
+    return shot_path
+
+def main(argv):
+    parser = optparse.OptionParser(usage='%prog [--size-mb N] [--assets N] [--dir path] [--keep]')
+    parser.add_option('--size-mb', type='int', default=2048,
+                      help='total size of the .ma files to write [default: %default]')
+    parser.add_option('--assets', type='int', default=8,
+                      help='number of referenced asset files [default: %default]')
+    parser.add_option('--dir', help='write the files here instead of a temp dir')
+    parser.add_option('--keep', action='store_true', help="don't delete the files afterwards")
+    options, args = parser.parse_args(argv)
+
+    dir_path = options.dir or tempfile.mkdtemp(prefix='zync_ma_bench_')
+    try:
+        started = time.time()
+        shot_path = write_shot(dir_path, options.size_mb * 1024 * 1024, options.assets)
+        total = sum(os.path.getsize(os.path.join(dir_path, name)) for name in os.listdir(dir_path))
+        print 'wrote %.0f MB in %.1fs' % (total / 1048576.0, time.time() - started)
+
+        started = time.time()
+        result = zync_maya.parse_ma_file(shot_path)
+        elapsed = time.time() - started
+        size = os.path.getsize(shot_path) / 1048576.0
+        print 'parse_ma_file: %.0f MB in %.2fs (%.0f MB/s), %d references, %d files' % (
+            size, elapsed, size / elapsed, len(result['references']), len(result['files']))
+
+        for processes in (1, zync_maya.MA_PARSE_PROCESSES):
+            zync_maya._MA_PARSE_CACHE.clear()
+            started = time.time()
+            result = zync_maya.scan_ma_references([shot_path], processes=processes)
+            elapsed = time.time() - started
+            print 'scan_ma_references, %d processes: %.2fs (%.0f MB/s), %d references, %d files' % (
+                processes, elapsed, total / 1048576.0 / elapsed, len(result['references']),
+                len(result['files']))
+
+        started = time.time()
+        zync_maya.scan_ma_references([shot_path])
+        print 'scan_ma_references, unchanged files: %.3fs' % (time.time() - started,)
+    finally:
+        if not options.keep:
+            shutil.rmtree(dir_path)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
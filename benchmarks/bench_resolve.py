@@ -0,0 +1,112 @@
+"""
+Benchmark for resolving scene file paths with zync_maya.PathResolver.
+Resolves a stream of paths like the ones a scan finds - relative to the
+workspace, with environment variables, on Windows drives, many of them
+repeated - once with a PathResolver, which queries the workspace once and
+memoizes what it resolves, and once the way the handlers used to, querying
+the workspace root and file rule and expanding variables for every path.
+Both have to give the same paths; the time and maya.cmds calls per 10k
+paths of each are reported.
+
+Usage:
+    python benchmarks/bench_resolve.py [--paths 100000] [--distinct 0.2]
+"""
+
+import optparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import zync_maya
+from replay import CountingBackend
+from synthetic import SyntheticScene
+
+PER_PATHS = 10000
+
+def synthetic_paths(count, distinct, seed=1):
+    """
+    Returns count scene file paths, of which about the given fraction are
+    distinct, paired with the workspace file rule each is looked up under,
+    or None.
+    """
+    rnd = random.Random(seed)
+    unique = []
+    for i in range(max(1, int(count * distinct))):
+        kind = i % 5
+        if kind == 0:
+            unique.append(('sourceimages/tex%d.exr' % (i,), None))
+        elif kind == 1:
+            unique.append(('$ASSETS/textures/../textures/tex%d.tx' % (i,), None))
+        elif kind == 2:
+            unique.append(('C:\\projects\\bench\\sourceimages\\tex%d.tx' % (i,), None))
+        elif kind == 3:
+            unique.append(('/projects/bench//cache/alembic/asset%d.abc' % (i,), None))
+        else:
+            unique.append(('startup/particleShape%d*' % (i,), 'particles'))
+    return [rnd.choice(unique) for i in range(count)]
+
+def resolve_per_path(paths):
+    # what resolving every path on its own takes: the workspace root and
+    # the file rule queried, and variables expanded, each time
+    resolved = []
+    for path, rule in paths:
+        root = zync_maya.cmds.workspace(q=True, rd=True)
+        if rule != None:
+            entry = zync_maya.cmds.workspace(fileRuleEntry=rule) or rule
+            root = zync_maya.canonical_path(zync_maya.expand_env_vars(entry), root)
+        path = zync_maya.expand_env_vars(path)
+        resolved.append(zync_maya.canonical_path(path, root))
+    return resolved
+
+def resolve_with_resolver(paths):
+    resolver = zync_maya.PathResolver()
+    resolved = []
+    for path, rule in paths:
+        if rule != None:
+            path = '%s/%s' % (resolver.rule_dir(rule, rule), path)
+        resolved.append(resolver.resolve(path))
+    return resolved
+
+def run(scene, paths, resolve):
+    """
+    Resolves the given paths with the given function against the scene.
+    Returns the (resolved paths, seconds, CountingBackend) of the run.
+    """
+    counter = CountingBackend(scene)
+    previous = zync_maya.set_cmds_backend(counter, scene.mel)
+    try:
+        started = time.time()
+        resolved = resolve(paths)
+        elapsed = time.time() - started
+    finally:
+        zync_maya.set_cmds_backend(*previous)
+    return resolved, elapsed, counter
+
+def main(argv):
+    parser = optparse.OptionParser(usage='%prog [--paths N] [--distinct F]')
+    parser.add_option('--paths', type='int', default=100000,
+                      help='number of paths to resolve [default: %default]')
+    parser.add_option('--distinct', type='float', default=0.2,
+                      help='fraction of the paths that are distinct [default: %default]')
+    options, args = parser.parse_args(argv)
+
+    os.environ['ASSETS'] = '/projects/bench/assets'
+    scene = SyntheticScene(10)
+    paths = synthetic_paths(options.paths, options.distinct)
+    per_path, per_path_time, per_path_counter = run(scene, paths, resolve_per_path)
+    resolver, resolver_time, resolver_counter = run(scene, paths, resolve_with_resolver)
+    if per_path != resolver:
+        sys.exit('The per path and PathResolver results differ.')
+
+    scale = float(PER_PATHS) / len(paths)
+    print '%d paths, %d distinct' % (len(paths), len(set(paths)))
+    print '%-14s %16s %18s' % ('resolved', 'ms per 10k', 'calls per 10k')
+    for name, elapsed, counter in (('per path', per_path_time, per_path_counter),
+                                   ('PathResolver', resolver_time, resolver_counter)):
+        print '%-14s %16.2f %18.1f' % (name, elapsed * 1000.0 * scale, counter.total() * scale)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,144 @@
+"""
+Offline benchmark for the zync_maya scene scan. Runs get_scene_files,
+collect_layer_info, udim_range and SceneScanner.get_scene_info against
+synthetic scenes, or a fixture recorded in Maya with record(), and reports
+the wall time and the number of maya.cmds calls each of them made.
+
+Usage:
+    python benchmarks/bench_scan.py [--sizes 1000,10000,100000] [--fixture path] [--json path]
+
+To record a fixture, run this inside Maya with the scene open:
+    import bench_scan
+    bench_scan.record('/path/to/shot.json')
+"""
+
+import json
+import optparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import zync_maya
+from replay import CallLog, CountingBackend, RecordingBackend, ReplayBackend, \
+    load_fixture, save_fixture
+from synthetic import SyntheticScene
+
+DEFAULT_SIZES = '1000,10000,100000'
+TOP_COMMANDS = 3
+
+def _reset_caches():
+    zync_maya.SCAN_CACHE.reset()
+    zync_maya.clear_attr_cache()
+    zync_maya.clear_attr_schemas()
+    zync_maya.clear_layer_info()
+
+def _step_scene_files():
+    return list(zync_maya.get_scene_files(zync_maya.SceneIndex()))
+
+def _step_layer_info(renderer, layers):
+    def step():
+        index = zync_maya.SceneIndex()
+        for layer in layers:
+            zync_maya.collect_layer_info(layer, renderer, index=index)
+    return step
+
+def _step_udim_range():
+    return zync_maya.udim_range(zync_maya.SceneIndex())
+
+def _step_scene_info(renderer, layers):
+    def step():
+        return zync_maya.SceneScanner().get_scene_info(renderer, layers=layers)
+    return step
+
+def _steps(renderer, layers):
+    return [('get_scene_files', _step_scene_files),
+            ('collect_layer_info', _step_layer_info(renderer, layers)),
+            ('udim_range', _step_udim_range),
+            ('get_scene_info', _step_scene_info(renderer, layers))]
+
+def run_steps(name, backend, renderer, layers):
+    """
+    Runs each benchmark step against the given backend, from cold caches,
+    and returns a list of result dicts.
+    """
+    results = []
+    for step_name, step in _steps(renderer, layers):
+        counter = CountingBackend(backend)
+        previous = zync_maya.set_cmds_backend(counter, backend.mel)
+        try:
+            _reset_caches()
+            started = time.time()
+            step()
+            elapsed = time.time() - started
+        finally:
+            zync_maya.set_cmds_backend(*previous)
+        results.append({'scene': name,
+                        'step': step_name,
+                        'ms': round(elapsed * 1000.0, 2),
+                        'calls': counter.total(),
+                        'top': counter.counts.most_common(TOP_COMMANDS)})
+    return results
+
+def print_results(results):
+    print '%-20s %-20s %10s %8s  %s' % ('scene', 'step', 'ms', 'calls', 'top commands')
+    for result in results:
+        top = ', '.join('%s=%d' % command for command in result['top'])
+        print '%-20s %-20s %10.1f %8d  %s' % (result['scene'], result['step'], result['ms'],
+                                               result['calls'], top)
+
+def record(fixture_path, renderer=None, layers=None):
+    """
+    Runs get_scene_info on the scene open in Maya with every maya.cmds and
+    maya.mel call recorded, and saves the recording as a fixture that this
+    benchmark can replay without Maya. Defaults to the current renderer and
+    every renderable layer.
+    """
+    import maya.cmds
+    import maya.mel
+    if renderer is None:
+        renderer = zync_maya.current_renderer()
+    if layers is None:
+        layers = [layer for layer in maya.cmds.ls(type='renderLayer') \
+            if maya.cmds.getAttr('%s.renderable' % (layer,))]
+    log = CallLog()
+    previous = zync_maya.set_cmds_backend(RecordingBackend(maya.cmds, log),
+                                          RecordingBackend(maya.mel, log, prefix='mel.'))
+    try:
+        for step_name, step in _steps(renderer, layers):
+            _reset_caches()
+            step()
+    finally:
+        zync_maya.set_cmds_backend(*previous)
+    save_fixture(fixture_path, log, info={'renderer': renderer, 'layers': layers})
+
+def main(argv):
+    parser = optparse.OptionParser(usage='%prog [--sizes N,N] [--fixture path] [--json path]')
+    parser.add_option('--sizes', default=DEFAULT_SIZES,
+                      help='comma separated node counts of the synthetic scenes to scan, '
+                           'or "" for none [default: %default]')
+    parser.add_option('--fixture', action='append', default=[],
+                      help='replay a fixture recorded with record(); may be repeated')
+    parser.add_option('--json', help='also write the results to this JSON file')
+    options, args = parser.parse_args(argv)
+
+    results = []
+    for size in [int(size) for size in options.sizes.split(',') if size.strip()]:
+        scene = SyntheticScene(size)
+        results += run_steps('synthetic-%d' % (size,), scene, 'vray', scene.layers[1:])
+    for fixture_path in options.fixture:
+        backend = ReplayBackend(load_fixture(fixture_path))
+        results += run_steps(os.path.basename(fixture_path), backend,
+                             backend.info['renderer'], backend.info['layers'])
+
+    print_results(results)
+    if options.json:
+        f = open(options.json, 'w')
+        try:
+            json.dump(results, f, indent=2)
+        finally:
+            f.close()
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
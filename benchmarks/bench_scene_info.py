@@ -0,0 +1,115 @@
+"""
+Benchmark for the compact scene info encoding, zync_maya.encode_scene_info().
+Builds the scene info of a synthetic shot with the given number of files,
+laid out the way a production's are - textures per asset and channel, UDIM
+tiles, caches and plates - and compares the size and encode time of plain
+JSON, zlib compressed JSON and the compact encoding.
+
+Usage:
+    python benchmarks/bench_scene_info.py [--files 100000]
+"""
+
+import base64
+import json
+import optparse
+import os
+import random
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import zync_maya
+
+_CHANNELS = ['diffuse', 'specular', 'roughness', 'bump', 'displacement', 'normal', 'mask']
+
+def synthetic_scene_info(file_count, seed=1):
+    rnd = random.Random(seed)
+    files = []
+    asset = 0
+    while len(files) < file_count:
+        asset_type = rnd.choice(['chr', 'prop', 'env', 'veh'])
+        asset_dir = '/mnt/projects/bigshow/assets/%s/%s%04d' % (asset_type, asset_type, asset)
+        for channel in rnd.sample(_CHANNELS, 4):
+            for tile in range(rnd.randint(1, 20)):
+                files.append('%s/textures/v%03d/%s%04d_%s.%d.tx' % (
+                    asset_dir, rnd.randint(1, 20), asset_type, asset, channel, 1001 + tile))
+        files.append('%s/cache/%s%04d_anim.abc' % (asset_dir, asset_type, asset))
+        asset += 1
+    files = files[:file_count]
+    files += ['/mnt/projects/bigshow/seq/sq010/sh0100/plates/bg.%04d.exr' % (frame,)
+              for frame in range(1001, 1241)]
+    references = ['/mnt/projects/bigshow/assets/chr/chr%04d/rig/chr%04d_rig.ma' % (i, i)
+                  for i in range(0, asset, 20)]
+    return {'files': files,
+            'changed_files': files[::10],
+            'references': references,
+            'unresolved_references': [path.replace('/mnt/projects/bigshow', '$SHOW')
+                                      for path in references],
+            'render_layers': ['bg', 'fg', 'chars'],
+            'render_passes': {'bg': ['diffuse', 'specular'], 'fg': ['diffuse']},
+            'file_prefix': ['<Layer>/<Scene>', {}],
+            'plugins': ['vrayformaya', 'AbcImport'],
+            'vray_version': '3.00.01'}
+
+#
+#   Paths that share a prefix ending inside a multi-byte character, as
+#   UTF-8 byte strings - the way the .ma and .ass parsers read them - and as
+#   unicode, mixed.
+#
+_NON_ASCII_FILES = ['/p/caf\xc3\xa9/a.exr',
+                    '/p/caf\xc3\xa8/b.exr',
+                    u'/p/caf\xe8/c.exr',
+                    u'/p/\u30c6\u30af\u30b9\u30c1\u30e3/d.exr',
+                    '/p/\xe3\x83\x86\xe3\x82\xaf\xe3\x82\xb9\xe3\x83\x88/e.exr']
+
+def check_non_ascii():
+    """
+    Returns whether scene info with non-ASCII paths survives the compact
+    encoding, with the paths coming back as unicode.
+    """
+    expected = [_unicode(path) for path in _NON_ASCII_FILES]
+    decoded = zync_maya.decode_scene_info(
+        zync_maya.encode_scene_info({'files': _NON_ASCII_FILES}))
+    return decoded['files'] == expected
+
+def _unicode(path):
+    if isinstance(path, str):
+        return path.decode('utf-8')
+    return path
+
+def _timed(func, *args):
+    started = time.time()
+    result = func(*args)
+    return result, time.time() - started
+
+def main(argv):
+    parser = optparse.OptionParser(usage='%prog [--files N]')
+    parser.add_option('--files', type='int', default=100000,
+                      help='number of files in the scene info [default: %default]')
+    options, args = parser.parse_args(argv)
+
+    scene_info = synthetic_scene_info(options.files)
+    plain, plain_time = _timed(json.dumps, scene_info)
+    # "bytes" is the size of the JSON or compressed data, "sent" that of the
+    # payload as it's sent, with the compact encoding's data in base64
+    print '%-16s %12s %12s %10s' % ('encoding', 'bytes', 'sent', 'ms')
+    print '%-16s %12d %12d %10.1f' % ('json', len(plain), len(plain), plain_time * 1000)
+    for level in (1, 6):
+        started = time.time()
+        compressed = zlib.compress(json.dumps(scene_info), level)
+        print '%-16s %12d %12s %10.1f' % ('json + zlib %d' % (level,), len(compressed), '-',
+                                          (time.time() - started) * 1000)
+    for level in (1, 6, 9):
+        encoded, encode_time = _timed(zync_maya.encode_scene_info, scene_info, level)
+        print '%-16s %12d %12d %10.1f' % ('compact %d' % (level,),
+                                          len(base64.b64decode(encoded['data'])),
+                                          len(json.dumps(encoded)), encode_time * 1000)
+    decoded, decode_time = _timed(zync_maya.decode_scene_info, encoded)
+    print 'decoded in %.1f ms, round trip %s' % (decode_time * 1000,
+                                                 decoded == scene_info and 'ok' or 'FAILED')
+    print 'non-ASCII paths round trip %s' % (check_non_ascii() and 'ok' or 'FAILED',)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
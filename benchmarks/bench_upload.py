@@ -0,0 +1,204 @@
+"""
+Benchmark for the scene file uploader, zync_maya.Uploader, against a local
+stand-in for the upload server. Uploads many small files and a few huge
+ones over 1 and several connections, then interrupts an upload halfway and
+resumes it from its checkpoint.
+
+The stand-in adds a delay to every request, as a stand-in for the round
+trip to a real server; with none, everything runs at memory speed and
+connections make no difference.
+
+Usage:
+    python benchmarks/bench_upload.py [--small 2000] [--small-kb 64] [--huge 4] [--huge-mb 256]
+                                      [--latency-ms 20] [--connections 4] [--dir path]
+"""
+
+import BaseHTTPServer
+import SocketServer
+import json
+import optparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import zync_maya
+
+class StandInServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    Accepts uploads the way zync_maya.Uploader sends them, keeping only the
+    size of each part. After fail_after parts it fails every request, to
+    interrupt an upload.
+    """
+    daemon_threads = True
+
+    def __init__(self, latency=0.0, fail_after=None):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0), _StandInHandler)
+        self.latency = latency
+        self.fail_after = fail_after
+        self.parts = {}
+        self.completed = {}
+        self.part_count = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%d/upload' % (self.server_address[1],)
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+class _StandInHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # the response is written a line at a time
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body=''):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        remaining = int(self.headers.get('Content-Length', 0))
+        received = 0
+        while remaining:
+            data = self.rfile.read(min(remaining, 1024 * 1024))
+            if not data:
+                break
+            received += len(data)
+            remaining -= len(data)
+        return received
+
+    def do_PUT(self):
+        prefix, key, part = self.path.rsplit('/', 2)
+        received = self._read_body()
+        server = self.server
+        time.sleep(server.latency)
+        with server.lock:
+            if server.fail_after != None and server.part_count >= server.fail_after:
+                self._reply(503, 'unavailable')
+                return
+            server.part_count += 1
+            server.parts.setdefault(key, {})[int(part)] = received
+        self._reply(201)
+
+    def do_POST(self):
+        prefix, key, action = self.path.rsplit('/', 2)
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        server = self.server
+        time.sleep(server.latency)
+        with server.lock:
+            parts = server.parts.get(key, {})
+            if len(parts) != body['parts'] or sum(parts.values()) != body['size']:
+                self._reply(400, 'missing parts')
+                return
+            server.completed[key] = body['path']
+        self._reply(200)
+
+def write_files(dir_path, count, size, prefix):
+    """
+    Writes count files of size bytes to dir_path. Returns them as a list of
+    (path, size, mtime), the way stat_scene_files() does.
+    """
+    block = os.urandom(min(size, 1024 * 1024))
+    files = []
+    for i in range(count):
+        path = '%s/%s%04d.bin' % (dir_path, prefix, i)
+        f = open(path, 'wb')
+        try:
+            written = 0
+            while written < size:
+                f.write(block[:size - written])
+                written += len(block[:size - written])
+        finally:
+            f.close()
+        st = os.stat(path)
+        files.append((path, st.st_size, st.st_mtime))
+    return files
+
+def timed_upload(files, connections, latency, checkpoint_path, server=None):
+    """
+    Uploads files to a fresh stand-in server, unless one is given, with a
+    checkpoint at checkpoint_path. Returns (seconds, bytes sent, server).
+    """
+    if server == None:
+        server = StandInServer(latency)
+        server.start()
+    checkpoint = zync_maya.UploadCheckpoint(server.url, path=checkpoint_path)
+    uploader = zync_maya.Uploader(server.url, connections=connections,
+                                  limiter=zync_maya.RateLimiter(None), checkpoint=checkpoint)
+    started = time.time()
+    try:
+        sent = uploader.upload(files)
+    finally:
+        elapsed = time.time() - started
+    return elapsed, sent, server
+
+def main(argv):
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('--small', type='int', default=2000, help='number of small files [default: %default]')
+    parser.add_option('--small-kb', type='int', default=64, help='size of the small files [default: %default]')
+    parser.add_option('--huge', type='int', default=4, help='number of huge files [default: %default]')
+    parser.add_option('--huge-mb', type='int', default=256, help='size of the huge files [default: %default]')
+    parser.add_option('--latency-ms', type='float', default=20,
+                      help='delay the stand-in server adds to each request [default: %default]')
+    parser.add_option('--connections', type='int', default=zync_maya.UPLOAD_CONNECTIONS,
+                      help='connections to compare against 1 [default: %default]')
+    parser.add_option('--dir', help='write the files here instead of a temp dir')
+    options, args = parser.parse_args(argv)
+
+    dir_path = options.dir or tempfile.mkdtemp(prefix='zync_upload_bench_')
+    latency = options.latency_ms / 1000.0
+    try:
+        sets = [('%d x %d KB' % (options.small, options.small_kb),
+                 write_files(dir_path, options.small, options.small_kb * 1024, 'small')),
+                ('%d x %d MB' % (options.huge, options.huge_mb),
+                 write_files(dir_path, options.huge, options.huge_mb * 1024 * 1024, 'huge'))]
+        print '%-16s %12s %10s %10s' % ('files', 'connections', 'seconds', 'MB/s')
+        for name, files in sets:
+            for connections in (1, options.connections):
+                checkpoint_path = '%s/checkpoint.json' % (dir_path,)
+                if os.path.exists(checkpoint_path):
+                    os.remove(checkpoint_path)
+                elapsed, sent, server = timed_upload(files, connections, latency, checkpoint_path)
+                server.stop()
+                print '%-16s %12d %10.2f %10.1f' % (name, connections, elapsed, sent / 1048576.0 / elapsed)
+
+        # interrupt the huge files halfway, then resume
+        name, files = sets[1]
+        checkpoint_path = '%s/checkpoint.json' % (dir_path,)
+        os.remove(checkpoint_path)
+        total = sum(size for path, size, mtime in files)
+        parts = total // zync_maya.UPLOAD_PART_SIZE
+        server = StandInServer(latency, fail_after=parts // 2)
+        server.start()
+        try:
+            timed_upload(files, options.connections, latency, checkpoint_path, server=server)
+        except zync_maya.UploadError as e:
+            print 'interrupted: %s' % (e,)
+        server.fail_after = None
+        elapsed, sent, server = timed_upload(files, options.connections, latency, checkpoint_path,
+                                             server=server)
+        print 'resumed %s: sent %.0f of %.0f MB again in %.2fs, %d of %d files complete' % (
+            name, sent / 1048576.0, total / 1048576.0, elapsed, len(server.completed), len(files))
+        server.stop()
+    finally:
+        if not options.dir:
+            shutil.rmtree(dir_path)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
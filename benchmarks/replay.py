@@ -0,0 +1,159 @@
+"""
+Stand-ins for the maya.cmds and maya.mel modules, for benchmarking
+zync_maya outside of Maya:
+
+RecordingBackend wraps the real modules inside Maya and logs every call and
+its response; save_fixture() writes the log to a JSON fixture file.
+ReplayBackend serves the responses from such a fixture back, so the same
+scan can be replayed on a machine without Maya. CountingBackend wraps either
+of them, or a synthetic scene, and counts calls per command.
+
+Install a backend with zync_maya.set_cmds_backend().
+"""
+
+import collections
+import json
+
+FIXTURE_VERSION = 1
+
+def _call_key(name, args, kwargs):
+    return json.dumps([name, list(args), sorted(kwargs.items())])
+
+class CallLog(object):
+    """
+    The calls made through a RecordingBackend, in order, with what each
+    returned or raised.
+    """
+    def __init__(self):
+        self.calls = []
+
+    def add(self, name, args, kwargs, result=None, error=None):
+        self.calls.append([name, list(args), kwargs, result, error])
+
+class RecordingBackend(object):
+    """
+    Forwards every function call to the wrapped module (maya.cmds or
+    maya.mel) and logs it to a CallLog. prefix tells the modules apart in the
+    log, e.g. "mel." for maya.mel.
+    """
+    def __init__(self, module, log, prefix=''):
+        self._module = module
+        self._log = log
+        self._prefix = prefix
+
+    def __getattr__(self, name):
+        func = getattr(self._module, name)
+        if not callable(func):
+            return func
+        log = self._log
+        full_name = self._prefix + name
+        def record(*args, **kwargs):
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                log.add(full_name, args, kwargs, error=[type(e).__name__, str(e)])
+                raise
+            log.add(full_name, args, kwargs, result=result)
+            return result
+        return record
+
+def save_fixture(path, log, info=None):
+    """
+    Writes the calls in the given CallLog to a fixture file. info is a dict
+    of anything else the replay needs to know, e.g. the renderer and the
+    render layers the recorded scan was run for.
+    """
+    f = open(path, 'w')
+    try:
+        json.dump({'version': FIXTURE_VERSION,
+                   'info': info or {},
+                   'calls': log.calls}, f)
+    finally:
+        f.close()
+
+def load_fixture(path):
+    f = open(path)
+    try:
+        fixture = json.load(f)
+    finally:
+        f.close()
+    if fixture.get('version') != FIXTURE_VERSION:
+        raise ValueError('Unsupported fixture version in %s' % (path,))
+    return fixture
+
+class ReplayError(Exception):
+    """
+    Raised for a call the fixture has no recorded response for.
+    """
+
+_ERRORS = {'RuntimeError': RuntimeError,
+           'ValueError': ValueError,
+           'TypeError': TypeError,
+           'KeyError': KeyError}
+
+class _ReplayModule(object):
+    def __init__(self, responses, names, prefix):
+        self._responses = responses
+        self._names = names
+        self._prefix = prefix
+
+    def __getattr__(self, name):
+        full_name = self._prefix + name
+        # commands the recording never called may not exist at all, e.g.
+        # the optional bulk_get_attr
+        if name.startswith('__') or full_name not in self._names:
+            raise AttributeError(name)
+        responses = self._responses
+        def replay(*args, **kwargs):
+            queue = responses.get(_call_key(full_name, args, kwargs))
+            if not queue:
+                raise ReplayError('No recorded response for %s%r %r' % (full_name, args, kwargs))
+            if len(queue) > 1:
+                result, error = queue.popleft()
+            else:
+                result, error = queue[0]
+            if error is not None:
+                raise _ERRORS.get(error[0], RuntimeError)(error[1])
+            return result
+        return replay
+
+class ReplayBackend(_ReplayModule):
+    """
+    Answers calls with the responses recorded in a fixture. A call made
+    several times gets its recorded responses in order, and the last one
+    again once they run out, so replaying a scan that switches render layers
+    sees the same values the recording did.
+
+    Use backend.mel for the maya.mel half.
+    """
+    def __init__(self, fixture):
+        responses = {}
+        names = set()
+        for name, args, kwargs, result, error in fixture['calls']:
+            key = _call_key(name, args, kwargs)
+            responses.setdefault(key, collections.deque()).append((result, error))
+            names.add(name)
+        _ReplayModule.__init__(self, responses, names, '')
+        self.info = fixture.get('info', {})
+        self.mel = _ReplayModule(responses, names, 'mel.')
+
+class CountingBackend(object):
+    """
+    Forwards calls to the wrapped backend and counts them per command.
+    """
+    def __init__(self, backend):
+        self._backend = backend
+        self.counts = collections.Counter()
+
+    def __getattr__(self, name):
+        func = getattr(self._backend, name)
+        if not callable(func):
+            return func
+        counts = self.counts
+        def count(*args, **kwargs):
+            counts[name] += 1
+            return func(*args, **kwargs)
+        return count
+
+    def total(self):
+        return sum(self.counts.values())
@@ -0,0 +1,291 @@
+"""
+Synthetic scenes for benchmarking zync_maya without Maya. A SyntheticScene
+holds a generated scene in plain dicts and answers the maya.cmds and
+maya.mel queries zync_maya makes about it, the way Maya would.
+"""
+
+import random
+import re
+
+#
+#   Node types the scene generator uses, with the types they derive from,
+#   as cmds.nodeType(inherited=True) would list them.
+#
+_INHERITED = {'file': ['texture2d', 'file'],
+              'AlembicNode': ['AlembicNode'],
+              'mesh': ['shape', 'surfaceShape', 'deformableShape', 'controlPoint', 'mesh'],
+              'particle': ['shape', 'deformableShape', 'controlPoint', 'particle'],
+              'nParticle': ['shape', 'deformableShape', 'controlPoint', 'particle', 'nParticle'],
+              'imagePlane': ['imagePlane'],
+              'FurDescription': ['FurDescription'],
+              'transform': ['transform'],
+              'camera': ['shape', 'camera'],
+              'renderLayer': ['renderLayer'],
+              'reference': ['reference'],
+              'VRayRenderElement': ['VRayRenderElement'],
+              'VRayBakeOptions': ['VRayBakeOptions'],
+              'VRaySettingsNode': ['VRaySettingsNode'],
+              'renderGlobals': ['renderGlobals']}
+
+_ADJUSTMENT_VALUE = re.compile(r'^(.*)\.adjustments\[(\d+)\]\.value$')
+
+class SyntheticScene(object):
+    """
+    A generated scene of about node_count nodes with a production-like mix:
+    file textures (some UDIM tiled or image sequences, many sharing paths),
+    Alembic caches, meshes, particles, image planes and fur, plus render
+    layers with overrides, VRay render elements, references and bake sets.
+    The same node_count and seed always give the same scene.
+
+    Pass the scene as the cmds backend and scene.mel as the mel backend to
+    zync_maya.set_cmds_backend(). It reads attributes in bulk through
+    bulk_get_attr(), as Maya does through the OpenMaya API; wrap it in a
+    PerPlugBackend to have every attribute read with getAttr instead.
+    """
+    def __init__(self, node_count, seed=1):
+        self.nodes = {}
+        self.attrs = {}
+        self.connections = {}
+        self.overrides = {}
+        self.uvs = {}
+        self.current_layer = 'defaultRenderLayer'
+        self.scene_path = '/projects/bench/scenes/bench_%d.ma' % (node_count,)
+        self.project_dir = '/projects/bench/'
+        self.mel = _SyntheticMel()
+        self._listed_attrs = {}
+        self._generate(node_count, random.Random(seed))
+
+    def _add(self, node, node_type, **attrs):
+        self.nodes[node] = node_type
+        for attr, value in attrs.items():
+            self.attrs['%s.%s' % (node, attr)] = value
+
+    def _generate(self, node_count, rnd):
+        texture_count = max(1, node_count // 20)
+        for i in range(node_count):
+            kind = i % 10
+            if kind < 5:
+                texture = rnd.randrange(texture_count)
+                if texture % 10 == 0:
+                    path = 'sourceimages/tiles/tex%d.<UDIM>.exr' % (texture,)
+                elif texture % 10 == 1:
+                    path = '/projects/bench/sourceimages/seq/tex%d.%04d.exr' % (texture, 1001 + i % 24)
+                elif texture % 10 == 2:
+                    path = 'C:\\projects\\bench\\sourceimages\\tex%d.tx' % (texture,)
+                else:
+                    path = '$ASSETS/textures/tex%d.exr' % (texture,)
+                self._add('file%d' % (i,), 'file', fileTextureName=path,
+                          useFrameExtension=(texture % 10 == 1))
+            elif kind == 5:
+                self._add('abc%d' % (i,), 'AlembicNode',
+                          abc_File='/projects/bench/cache/alembic/asset%d.abc' % (i % 97,))
+            elif kind == 6:
+                # only some meshes have a miProxyFile, as when Mental Ray
+                # isn't loaded for all of them
+                if i % 3 == 1:
+                    self._add('meshShape%d' % (i,), 'mesh',
+                              miProxyFile='/projects/bench/proxies/p%d.mi' % (i % 50,))
+                else:
+                    self._add('meshShape%d' % (i,), 'mesh')
+            elif kind == 7:
+                self._add('particleShape%d' % (i,), rnd.choice(['particle', 'nParticle']),
+                          scp=rnd.choice(['', 'startup']))
+            elif kind == 8:
+                self._add('imagePlaneShape%d' % (i,), 'imagePlane', displayMode=i % 2 * 3,
+                          imageName='/projects/bench/plates/plate%d.%04d.jpg' % (i % 5, i),
+                          useFrameExtension=True)
+            else:
+                self._add('furDescription%d' % (i,), 'FurDescription', BaseColorMap=None,
+                          Length=1.0)
+                self.attrs['furDescription%d.BaseColorMap[0]' % (i,)] = \
+                    '/projects/bench/fur/map%d.iff' % (i % 40,)
+
+        self._add('defaultArnoldRenderOptions', 'renderGlobals', use_existing_tiled_textures=False)
+        self._add('vraySettings', 'VRaySettingsNode', ifile='/projects/bench/irmap/map', imode=7,
+                  fnm='/projects/bench/lightcache/lc.vrlmap', imageFormatStr='exr',
+                  relements_enableall=True, fileNamePrefix='<Layer>/<Scene>',
+                  fileNamePadding=4)
+        self._add('defaultRenderGlobals', 'renderGlobals', currentRenderer='vray',
+                  imageFilePrefix='', startFrame=1.0, endFrame=100.0, byFrameStep=1.0,
+                  imfPluginKey='exr', extensionPadding=4)
+        self._add('perspShape', 'camera')
+        self._add('persp', 'transform', renderable=True)
+
+        layers = ['defaultRenderLayer']
+        for i in range(max(3, node_count // 2000)):
+            layers.append('layer%d' % (i,))
+        for i in range(5):
+            element = 'vrayRE_element%d' % (i,)
+            self._add(element, 'VRayRenderElement', enabled=True)
+            self.attrs['%s.vray_name_element' % (element,)] = 'element%d' % (i,)
+            self.attrs['%s.vrayClassType' % (element,)] = 'ExtraTexElement'
+        for i, layer in enumerate(layers):
+            self._add(layer, 'renderLayer', renderable=True)
+            if i > 0:
+                self.overrides[layer] = {
+                    'vrayRE_element%d.enabled' % (i % 5,): False,
+                    'vraySettings.fileNamePrefix': '%s/<Scene>' % (layer,)}
+        for i in range(max(1, node_count // 5000)):
+            self._add('asset%dRN' % (i,), 'reference')
+        for i in range(max(1, node_count // 10000)):
+            bake_set = 'bakeSet%d' % (i,)
+            self._add(bake_set, 'VRayBakeOptions', bakeChannel=1,
+                      outputTexturePath='/projects/bench/bake')
+            self.connections[bake_set] = ['bakeGeo%d' % (i,)]
+            self._add('bakeGeo%d' % (i,), 'transform')
+            self.uvs['bakeGeo%d' % (i,)] = self._uv_layout(rnd)
+        self.layers = layers
+
+    def _uv_layout(self, rnd, faces_per_tile=2500):
+        # a grid of faces filling each of a few UDIM tiles, as UV points
+        uvs = []
+        side = int(faces_per_tile ** 0.5)
+        for tile in rnd.sample(range(30), 4):
+            tile_u = tile % 10
+            tile_v = tile // 10
+            for row in range(side + 1):
+                for col in range(side + 1):
+                    uvs += [tile_u + float(col) / side, tile_v + float(row) / side]
+        return uvs
+
+    #
+    #   maya.cmds
+    #
+
+    def ls(self, *args, **kwargs):
+        if kwargs.get('showType'):
+            listing = []
+            for node in sorted(self.nodes):
+                listing += [node, self.nodes[node]]
+            return listing
+        node_type = kwargs.get('type')
+        if node_type is None:
+            return sorted(self.nodes)
+        return sorted(node for node, exact_type in self.nodes.items() \
+            if node_type in _INHERITED.get(exact_type, [exact_type]))
+
+    def nodeType(self, node, inherited=False, isTypeName=False, **kwargs):
+        if isTypeName and inherited:
+            return list(_INHERITED.get(node, [node]))
+        return self.nodes[node]
+
+    def _layer_adjustments(self, layer):
+        if layer == 'defaultRenderLayer':
+            # Maya keeps the master values of whatever the current layer
+            # overrides in the default layer's adjustments
+            if self.current_layer == layer:
+                return []
+            return [(plug, self.attrs[plug]) for plug in sorted(self.overrides.get(self.current_layer, {}))]
+        return sorted(self.overrides.get(layer, {}).items())
+
+    def getAttr(self, plug, **kwargs):
+        match = _ADJUSTMENT_VALUE.match(plug)
+        if match:
+            return self._layer_adjustments(match.group(1))[int(match.group(2))][1]
+        overrides = self.overrides.get(self.current_layer, {})
+        if plug in overrides:
+            return overrides[plug]
+        if plug not in self.attrs:
+            raise ValueError('No object matches name: %s' % (plug,))
+        return self.attrs[plug]
+
+    def bulk_get_attr(self, nodes, attr):
+        # the zync_maya.set_cmds_backend() hook for the reads that go
+        # through the OpenMaya API in Maya; nodes without the attribute get
+        # the error getAttr would raise for them
+        overrides = self.overrides.get(self.current_layer, {})
+        values = {}
+        for node in nodes:
+            plug = '%s.%s' % (node, attr)
+            if plug in overrides:
+                values[node] = overrides[plug]
+            elif plug in self.attrs:
+                values[node] = self.attrs[plug]
+            else:
+                values[node] = ValueError('No object matches name: %s' % (plug,))
+        return values
+
+    def listAttr(self, node, **kwargs):
+        if not self._listed_attrs:
+            for plug in self.attrs:
+                attr_node, attr = plug.split('.', 1)
+                if '[' not in attr:
+                    self._listed_attrs.setdefault(attr_node, []).append(attr)
+        return list(self._listed_attrs.get(node, []))
+
+    def attributeQuery(self, attr, node=None, at=False, **kwargs):
+        value = self.attrs.get('%s.%s' % (node, attr))
+        if isinstance(value, bool):
+            return 'bool'
+        if isinstance(value, (int, float)):
+            return 'double'
+        return 'typed'
+
+    def listConnections(self, plug, **kwargs):
+        if plug.endswith('.adjustments'):
+            layer = plug[:-len('.adjustments')]
+            listing = []
+            for i, (attr_plug, value) in enumerate(self._layer_adjustments(layer)):
+                listing += ['%s.adjustments[%d].plug' % (layer, i), attr_plug]
+            return listing
+        return self.connections.get(plug)
+
+    def listRelatives(self, node, **kwargs):
+        if kwargs.get('ap') or kwargs.get('allParents'):
+            return [node[:-len('Shape')]]
+        return ['%sShape' % (node,)]
+
+    def workspace(self, *args, **kwargs):
+        if 'fileRuleEntry' in kwargs:
+            return ''
+        return self.project_dir
+
+    def file(self, *args, **kwargs):
+        return self.scene_path
+
+    def fileInfo(self, *args, **kwargs):
+        return ['2014 x64']
+
+    def pluginInfo(self, *args, **kwargs):
+        if kwargs.get('pluginsInUse'):
+            return ['vrayformaya', '3.00.01', 'AbcImport', '1.0']
+        return '3.00.01'
+
+    def referenceQuery(self, node, **kwargs):
+        path = '/projects/bench/assets/%s.ma' % (node[:-len('RN')],)
+        if kwargs.get('unresolvedName'):
+            return path.replace('/projects/bench', '$PROJECT')
+        return path
+
+    def polyEvaluate(self, node, **kwargs):
+        uvs = self.uvs[node]
+        return [(min(uvs[0::2]), max(uvs[0::2])), (min(uvs[1::2]), max(uvs[1::2]))]
+
+    def polyEditUV(self, components, **kwargs):
+        return list(self.uvs[components.split('.')[0]])
+
+    def editRenderLayerGlobals(self, **kwargs):
+        if kwargs.get('q') or kwargs.get('query'):
+            return self.current_layer
+        self.current_layer = kwargs['currentRenderLayer']
+
+class PerPlugBackend(object):
+    """
+    Forwards everything but bulk_get_attr() to the wrapped scene, so
+    zync_maya reads each attribute with its own getAttr call, as it does
+    with a backend that can't read plugs in bulk.
+    """
+    def __init__(self, scene):
+        self._scene = scene
+        self.mel = scene.mel
+
+    def __getattr__(self, name):
+        if name == 'bulk_get_attr':
+            raise AttributeError(name)
+        return getattr(self._scene, name)
+
+class _SyntheticMel(object):
+    def eval(self, command):
+        if command == 'about -api':
+            return 201400
+        raise RuntimeError('Unsupported MEL command: %s' % (command,))
@@ -1,8 +1,6 @@
 import os
 import sys
 
-import zync_maya
-
 import maya.cmds as cmds
 import maya.mel
 import maya.utils
@@ -12,6 +10,11 @@ def create_zync_shelf():
     shelfTab = maya.mel.eval('global string $gShelfTopLevel;')
     maya.mel.eval('global string $scriptsShelf;')
     maya.mel.eval('$scriptsShelf = `shelfLayout -p $gShelfTopLevel ZYNC`;')
-    maya.mel.eval('shelfButton -parent $scriptsShelf -annotation "Render on ZYNC" -label "Render on ZYNC" -image "zync.png" -sourceType "python" -command ("zync_maya.submit_dialog()") -width 34 -height 34 -style "iconOnly";')
+    maya.mel.eval('shelfButton -parent $scriptsShelf -annotation "Render on ZYNC" -label "Render on ZYNC" -image "zync.png" -sourceType "python" -command ("import zync_maya; zync_maya.submit_dialog()") -width 34 -height 34 -style "iconOnly";')
 
-maya.utils.executeDeferred( create_zync_shelf )
+#
+#   zync_maya is imported by the shelf button when it's first used, so Maya
+#   sessions that never submit - and batch renders - don't pay for it.
+#
+if not cmds.about(batch=True):
+    maya.utils.executeDeferred( create_zync_shelf )
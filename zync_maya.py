@@ -13,38 +13,315 @@ Usage:
 
 """
 
+from contextlib import contextmanager
 from functools import partial
+import base64
+import bisect
+import csv
+import fnmatch
+import glob
+import gzip
 import hashlib
+import heapq
+import httplib
+import itertools
+import json
 import math
 import os
 import platform
+import posixpath
+import Queue
 import re
+import socket
+import stat
 import string
+import subprocess
 import sys
+import tempfile
+import threading
 import time
+import traceback
+import urlparse
+import zlib
 
 __author__ = 'Alex Schworer'
 __copyright__ = 'Copyright 2011, Atomic Fiction, Inc.'
 
-config_path = '%s/config_maya.py' % ( os.path.dirname(__file__), )
-if not os.path.exists( config_path ):
-    raise Exception('Could not locate config_maya.py, please create.')
-from config_maya import *
-
 required_config = ['API_DIR', 'API_KEY']
+# settings config_maya.py may override, see UPLOAD_URL, SCENE_INFO_ENCODING,
+# PLAN_CHUNKS and COMPACT_SEQUENCES
+optional_config = ['UPLOAD_URL', 'UPLOAD_CONNECTIONS', 'UPLOAD_PART_SIZE',
+                   'UPLOAD_MAX_BYTES_PER_SECOND', 'UPLOAD_LIMIT_HOURS',
+                   'SCENE_INFO_ENCODING', 'PLAN_CHUNKS', 'COMPACT_SEQUENCES']
+
+_zync_lock = threading.Lock()
+_zync_api = []
+
+def _load_zync():
+    """
+    Loads config_maya.py, imports the zync module and constructs the ZYNC
+    client, the first time any of them is needed. Constructing the client
+    talks to ZYNC, so this is deferred until a submit actually needs it
+    rather than done whenever Maya (or mayapy on the farm) imports this
+    module. Returns the (zync module, ZYNC client) pair.
+    """
+    with _zync_lock:
+        if not _zync_api:
+            config_path = '%s/config_maya.py' % ( os.path.dirname(__file__), )
+            if not os.path.exists( config_path ):
+                raise Exception('Could not locate config_maya.py, please create.')
+            import config_maya
+
+            for key in required_config:
+                if not hasattr(config_maya, key):
+                    raise Exception('config_maya.py must define a value for %s.' % (key,))
+            for key in optional_config:
+                if hasattr(config_maya, key):
+                    globals()[key] = getattr(config_maya, key)
+
+            if config_maya.API_DIR not in sys.path:
+                sys.path.append(config_maya.API_DIR)
+            import zync
+            client = zync.Zync('maya_plugin', config_maya.API_KEY, application='maya')
+            _zync_api.extend([zync, client])
+    return _zync_api[0], _zync_api[1]
+
+class _DeferredZync(object):
+    """
+    Stands in for the zync module or the ZYNC client, loading them with
+    _load_zync() on first attribute access.
+    """
+    def __init__(self, index):
+        self._index = index
 
-for key in required_config:
-    if not key in globals():
-        raise Exception('config_maya.py must define a value for %s.' % (key,))
+    def __getattr__(self, name):
+        return getattr(_load_zync()[self._index], name)
 
-sys.path.append(API_DIR)
-import zync
-ZYNC = zync.Zync('maya_plugin', API_KEY, application='maya')
+zync = _DeferredZync(0)
+ZYNC = _DeferredZync(1)
 
 UI_FILE = '%s/resources/submit_dialog.ui' % (os.path.dirname(__file__),)
 
-import maya.cmds as cmds
-import maya.mel
+#
+#   ZYNC metadata used by the submit dialog is cached for this many seconds,
+#   in memory and, unless METADATA_CACHE_PATH is None, on disk so it
+#   survives Maya restarts.
+#
+METADATA_CACHE_TTL = 10 * 60
+METADATA_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.zync', 'maya_metadata_cache.json')
+
+def _write_json(path, data):
+    """
+    Writes data to the given JSON file, through a temp file so readers never
+    see it half written. Errors are ignored, as the files written this way
+    are only caches.
+    """
+    try:
+        cache_dir = os.path.dirname(path)
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        tmp_path = '%s.%d.tmp' % (path, os.getpid())
+        f = open(tmp_path, 'w')
+        try:
+            json.dump(data, f)
+        finally:
+            f.close()
+        if os.path.exists(path):
+            os.remove(path)
+        os.rename(tmp_path, path)
+    except (IOError, OSError, TypeError, ValueError):
+        pass
+
+class MetadataCache(object):
+    """
+    A TTL cache for the results of ZYNC API calls. Expired entries are still
+    returned while a background thread fetches a fresh value, so only the
+    very first fetch of a key ever blocks. The cache file is read on first
+    use, not when the cache is created.
+    """
+    def __init__(self, ttl=METADATA_CACHE_TTL, path=METADATA_CACHE_PATH):
+        self.ttl = ttl
+        self.path = path
+        self._entries = None
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+
+    def _load(self):
+        # returns the entries, reading them first if they haven't been;
+        # called with the lock held
+        if self._entries is not None:
+            return self._entries
+        self._entries = {}
+        if self.path is None or not os.path.exists(self.path):
+            return self._entries
+        try:
+            f = open(self.path)
+            try:
+                self._entries = dict((key, tuple(entry)) for key, entry in json.load(f).iteritems())
+            finally:
+                f.close()
+        except (IOError, ValueError):
+            self._entries = {}
+        return self._entries
+
+    def _save(self):
+        if self.path is None:
+            return
+        with self._lock:
+            entries = dict(self._load())
+        with self._save_lock:
+            self._write(entries)
+
+    def _write(self, entries):
+        _write_json(self.path, entries)
+
+    def _fetch(self, key, fetch, cache_if=None):
+        value = fetch()
+        if cache_if is None or cache_if(value):
+            with self._lock:
+                self._load()[key] = (time.time(), value)
+            self._save()
+        return value
+
+    def _refresh(self, key, fetch, cache_if):
+        try:
+            self._fetch(key, fetch, cache_if)
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get(self, key, fetch, cache_if=None):
+        """
+        Returns the cached value for key, calling fetch() to get it if it
+        isn't cached. Values for which cache_if(value) is False are returned
+        but not cached.
+        """
+        with self._lock:
+            entry = self._load().get(key)
+            stale = entry is not None and time.time() - entry[0] > self.ttl
+            if stale and key not in self._refreshing:
+                self._refreshing.add(key)
+            else:
+                stale = False
+        if entry is None:
+            return self._fetch(key, fetch, cache_if)
+        if stale:
+            thread = threading.Thread(target=self._refresh, args=(key, fetch, cache_if))
+            thread.daemon = True
+            thread.start()
+        return entry[1]
+
+    def prefetch(self, fetchers):
+        """
+        Fetches all keys in the given dict of key -> (fetch, cache_if) that
+        aren't cached yet, concurrently.
+        """
+        with self._lock:
+            entries = self._load()
+            missing = [key for key in fetchers if key not in entries]
+        threads = []
+        for key in missing:
+            fetch, cache_if = fetchers[key]
+            thread = threading.Thread(target=self._refresh, args=(key, fetch, cache_if))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+
+    def invalidate(self, key=None):
+        """
+        Drops key from the cache, or everything if key is None.
+        """
+        with self._lock:
+            if key is None:
+                self._load().clear()
+            else:
+                self._load().pop(key, None)
+        self._save()
+
+METADATA_CACHE = MetadataCache()
+
+def _response_ok(response):
+    return response["code"] == 0
+
+def _metadata_fetchers(scene_name):
+    return {'project_name:%s' % (scene_name,): (lambda: ZYNC.get_project_name(scene_name), _response_ok),
+            'project_list': (lambda: ZYNC.get_project_list(), _response_ok),
+            'use_mi': (lambda: ZYNC.get_config(var="USE_MI"), None),
+            'instance_types': (lambda: ZYNC.INSTANCE_TYPES, None),
+            'job_subtypes': (lambda: ZYNC.JOB_SUBTYPES, None),
+            'maya_renderers': (lambda: ZYNC.MAYA_RENDERERS, None)}
+
+def prefetch_metadata(scene_name):
+    """
+    Fetches all of the ZYNC metadata the submit dialog needs that isn't
+    cached yet, with the requests running concurrently.
+    """
+    METADATA_CACHE.prefetch(_metadata_fetchers(scene_name))
+
+def invalidate_metadata(key=None):
+    """
+    Drops cached ZYNC metadata, e.g. "project_list", or all of it.
+    """
+    METADATA_CACHE.invalidate(key)
+
+def _cached_metadata(key, scene_name=None):
+    fetch, cache_if = _metadata_fetchers(scene_name)[key]
+    return METADATA_CACHE.get(key, fetch, cache_if)
+
+def get_project_name(scene_name):
+    return _cached_metadata('project_name:%s' % (scene_name,), scene_name)
+
+def get_project_list():
+    return _cached_metadata('project_list')
+
+def get_use_mi_setting():
+    return _cached_metadata('use_mi')
+
+def get_instance_types():
+    return _cached_metadata('instance_types')
+
+def get_job_subtypes():
+    return _cached_metadata('job_subtypes')
+
+def get_maya_renderers():
+    return _cached_metadata('maya_renderers')
+
+
+try:
+    import maya.cmds as cmds
+    import maya.mel as mel
+    import maya.utils
+except ImportError:
+    # outside of Maya, a backend has to be installed with set_cmds_backend()
+    # before anything here can query a scene.
+    cmds = None
+    mel = None
+_MAYA_CMDS = cmds
+
+def set_cmds_backend(cmds_backend, mel_backend=None):
+    """
+    Replaces the maya.cmds module, and optionally the maya.mel module, that
+    all scene queries in this module go through - e.g. with a fake that
+    replays a recorded scene. Returns the previous (cmds, mel) pair so it can
+    be restored.
+
+    A backend may also provide bulk_get_attr(nodes, attr), with the same
+    arguments and result as the function of that name here, for the bulk
+    attribute reads that inside Maya go through the OpenMaya API.
+    """
+    global cmds, mel
+    previous = (cmds, mel)
+    cmds = cmds_backend
+    if mel_backend is not None:
+        mel = mel_backend
+    _TYPE_ANCESTORS.clear()
+    SCAN_CACHE.reset()
+    return previous
 
 def generate_scene_path(extra_name=None):
     """
@@ -110,6 +387,45 @@ def proj_name():
     else:
         return 'alex_test'
 
+def output_dir():
+    """
+    Returns the default render output dir. If the workspace has a mapping for
+    "images", use that, otherwise default to the images/ folder.
+    """
+    out_dir = cmds.workspace(q=True, rd=True)
+    if out_dir[-1] != '/':
+        out_dir += '/'
+    images_rule = cmds.workspace(fileRuleEntry='images')
+    if images_rule != None and images_rule.strip() != '':
+        if images_rule[0] == '/' or images_rule[1] == ':':
+            out_dir = images_rule
+        else:
+            out_dir += images_rule
+    else:
+        out_dir += 'images'
+    return out_dir
+
+def current_renderer():
+    """
+    Returns the ZYNC key of the renderer currently selected in the render
+    globals, falling back to the default ZYNC renderer if it isn't one ZYNC
+    supports.
+    """
+    renderer_keys = {'mentalRay': 'mr',
+                     'mayaSoftware': 'sw',
+                     'vray': 'vray',
+                     'arnold': 'arnold'}
+    try:
+        current_renderer = cmds.getAttr("defaultRenderGlobals.currentRenderer")
+    except:
+        current_renderer = None
+    renderer_key = renderer_keys.get(current_renderer)
+    if renderer_key not in get_maya_renderers():
+        return zync.MAYA_DEFAULT_RENDERER
+    if renderer_key == 'vray':
+        return zync.VRAY_RENDERER
+    return renderer_key
+
 def frame_range():
     """
     Returns the frame-range of the maya scene as a string, like:
@@ -119,21 +435,285 @@ def frame_range():
     end = str(int(cmds.getAttr('defaultRenderGlobals.endFrame')))
     return '%s-%s' % (start, end)
 
-def udim_range():
-    bake_sets = list(bake_set for bake_set in cmds.ls(type='VRayBakeOptions') \
-        if bake_set != 'vrayDefaultBakeOptions')
-    u_max = 0
-    v_max = 0
+_FRAME_LIST_ITEM = re.compile(r'^(-?\d+)(?:-(-?\d+)(?:x(\d+))?)?$')
+
+def parse_frame_list(frange, step=1):
+    """
+    Returns the sorted list of frames in the given frame list, a comma
+    separated list of frames and frame ranges with an optional step, e.g.
+    "1-10,20,30-40x2". step applies to ranges that don't give their own.
+    Raises ValueError if the frame list can't be parsed.
+    """
+    frames = set()
+    for item in str(frange).replace(' ', '').split(','):
+        match = _FRAME_LIST_ITEM.match(item)
+        if match == None:
+            raise ValueError('Invalid frame range "%s"' % (item,))
+        start = int(match.group(1))
+        if match.group(2) == None:
+            frames.add(start)
+            continue
+        end = int(match.group(2))
+        item_step = int(match.group(3) or step)
+        if end < start or item_step < 1:
+            raise ValueError('Invalid frame range "%s"' % (item,))
+        frames.update(range(start, end + 1, item_step))
+    return sorted(frames)
+
+#
+#   node type -> set of that type and all the types it inherits from. The
+#   type hierarchy doesn't change during a session, so this is kept across
+#   SceneIndex instances.
+#
+_TYPE_ANCESTORS = {}
+
+def _type_ancestors(node_type):
+    if node_type not in _TYPE_ANCESTORS:
+        try:
+            ancestors = cmds.nodeType(node_type, inherited=True, isTypeName=True)
+        except Exception:
+            ancestors = None
+        ancestors = set(ancestors or [])
+        ancestors.add(node_type)
+        _TYPE_ANCESTORS[node_type] = ancestors
+    return _TYPE_ANCESTORS[node_type]
+
+class SceneIndex(object):
+    """
+    Index of every node in the scene, bucketed by node type. It is built from
+    a single cmds.ls(showType=True) sweep, so everything that needs the nodes
+    of a given type can share one traversal of the scene instead of each
+    running its own cmds.ls(type=...).
+    """
+    def __init__(self):
+        self.refresh()
+
+    def refresh(self):
+        """
+        Re-reads the scene.
+        """
+        self._generation = SCAN_CACHE.generation
+        self._buckets = {}
+        self._results = {}
+        listing = cmds.ls(showType=True) or []
+        for i in range(0, len(listing), 2):
+            bucket = self._buckets.setdefault(listing[i+1], [])
+            bucket.append((i, listing[i]))
+
+    def update(self):
+        """
+        Re-reads the scene if nodes have been added, removed, renamed or
+        reparented since it was last read, or if SCAN_CACHE can't tell.
+        """
+        if not SCAN_CACHE.is_current(self._generation):
+            self.refresh()
+
+    def ls(self, node_type):
+        """
+        Returns a list of all nodes of the given type, including nodes of
+        derived types, in scene order. Equivalent to cmds.ls(type=node_type).
+        """
+        if node_type not in self._results:
+            buckets = [bucket for exact_type, bucket in self._buckets.iteritems() \
+                if node_type in _type_ancestors(exact_type)]
+            if len(buckets) == 1:
+                entries = buckets[0]
+            else:
+                entries = sorted(entry for bucket in buckets for entry in bucket)
+            self._results[node_type] = [node for i, node in entries]
+        return list(self._results[node_type])
+
+def _numpy():
+    # numpy is optional; Maya doesn't ship it
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+def _mesh_uvs(mesh):
+    """
+    Fetches all UVs of the given mesh, or mesh transform, in one go. Returns
+    a (us, vs, face_counts, face_uv_ids, shape) tuple. Through the OpenMaya
+    API face_counts is the number of UVs of each face and face_uv_ids their
+    indices into us and vs, face by face, and shape is the mesh shape node;
+    otherwise those three are None and us and vs are just the UV points.
+    """
+    if cmds is _MAYA_CMDS:
+        try:
+            import maya.api.OpenMaya as om
+        except ImportError:
+            om = None
+        if om is not None:
+            try:
+                sel_list = om.MSelectionList()
+                sel_list.add(mesh)
+                dag_path = sel_list.getDagPath(0)
+                dag_path.extendToShape()
+                mesh_fn = om.MFnMesh(dag_path)
+                us, vs = mesh_fn.getUVs()
+                face_counts, face_uv_ids = mesh_fn.getAssignedUVs()
+                return us, vs, face_counts, face_uv_ids, dag_path.partialPathName()
+            except RuntimeError:
+                pass
+    uvs = cmds.polyEditUV('%s.map[*]' % (mesh,), q=True, u=True, v=True) or []
+    return uvs[0::2], uvs[1::2], None, None, None
+
+#
+#   UDIM tile 1001 + u + 10 * v covers UVs from (u, v) to (u + 1, v + 1),
+#   for u from 0 to 9 and v from 0 up.
+#
+UDIM_START = 1001
+
+def _udim_tile(u, v):
+    if u < 0 or u > 9 or v < 0:
+        return None
+    return UDIM_START + u + 10 * v
+
+def _uv_tiles(us, vs, face_counts=None, face_uv_ids=None):
+    """
+    Returns the set of UDIM tiles the given UVs are in. With face_counts and
+    face_uv_ids, every face counts towards the tile its UV center is in.
+    Without them only the UV points are known, and a point on the top or
+    right edge of a tile counts towards that tile, as a shell that exactly
+    fills a tile has its points on all four edges. Tiles that aren't valid
+    UDIMs are left out.
+    """
+    np = _numpy()
+    if face_counts is not None:
+        if np is not None:
+            counts = np.asarray(face_counts, dtype=np.int64)
+            ids = np.asarray(face_uv_ids, dtype=np.int64)
+            starts = (np.cumsum(counts) - counts)[counts > 0]
+            if not len(starts):
+                return set()
+            counts = counts[counts > 0]
+            tile_us = np.floor(np.add.reduceat(np.asarray(us)[ids], starts) / counts)
+            tile_vs = np.floor(np.add.reduceat(np.asarray(vs)[ids], starts) / counts)
+            tiles = zip(tile_us.astype(np.int64).tolist(), tile_vs.astype(np.int64).tolist())
+        else:
+            tiles = []
+            pos = 0
+            for count in face_counts:
+                if count:
+                    face_ids = face_uv_ids[pos:pos+count]
+                    tiles.append((int(math.floor(sum(us[i] for i in face_ids) / count)),
+                                  int(math.floor(sum(vs[i] for i in face_ids) / count))))
+                pos += count
+    elif np is not None:
+        tile_us = np.maximum(np.ceil(np.asarray(us, dtype=np.float64)) - 1, 0)
+        tile_vs = np.maximum(np.ceil(np.asarray(vs, dtype=np.float64)) - 1, 0)
+        tiles = zip(tile_us.astype(np.int64).tolist(), tile_vs.astype(np.int64).tolist())
+    else:
+        tiles = [(max(int(math.ceil(u)) - 1, 0), max(int(math.ceil(v)) - 1, 0)) \
+            for u, v in zip(us, vs)]
+    return set(tile for tile in (_udim_tile(u, v) for u, v in set(tiles)) if tile is not None)
+
+#
+#   Mesh -> dict of the "bbox" and UDIM "tiles" of its UVs, from
+#   mesh_uv_info(), and mesh shape -> the mesh name that info is kept under.
+#   Kept between scans while SCAN_CACHE is watching the mesh for changes.
+#
+_UV_INFO = {}
+_UV_INFO_SHAPES = {}
+
+def mesh_uv_info(mesh):
+    """
+    Returns a dict with the bounding box of the UVs of the given mesh, or
+    mesh transform, as "bbox" in the format of cmds.polyEvaluate(b2=True),
+    and the sorted list of UDIM tiles its UVs are in as "tiles". Returns
+    None if it has no UVs.
+    """
+    if mesh in _UV_INFO:
+        return _UV_INFO[mesh]
+    us, vs, face_counts, face_uv_ids, shape = _mesh_uvs(mesh)
+    if len(us):
+        np = _numpy()
+        if np is not None:
+            us = np.asarray(us, dtype=np.float64)
+            vs = np.asarray(vs, dtype=np.float64)
+            bbox = [(float(us.min()), float(us.max())), (float(vs.min()), float(vs.max()))]
+        else:
+            bbox = [(min(us), max(us)), (min(vs), max(vs))]
+        info = {'bbox': bbox,
+                'tiles': sorted(_uv_tiles(us, vs, face_counts, face_uv_ids))}
+    else:
+        info = None
+    if SCAN_CACHE.start():
+        _UV_INFO[mesh] = info
+        nodes = [mesh]
+        if shape is not None:
+            _UV_INFO_SHAPES[shape] = mesh
+            nodes.append(shape)
+        SCAN_CACHE.track(nodes)
+    return info
+
+def forget_uv_info(node):
+    _UV_INFO.pop(node, None)
+    mesh = _UV_INFO_SHAPES.pop(node, None)
+    if mesh is not None:
+        _UV_INFO.pop(mesh, None)
+
+def clear_uv_info():
+    _UV_INFO.clear()
+    _UV_INFO_SHAPES.clear()
+
+def format_frame_list(numbers, steps=False):
+    """
+    Returns the given frame or tile numbers as a compact frame list string,
+    e.g. "1001-1003,1012". With steps, runs of three or more numbers with
+    an even step are written with it, e.g. "1-9x2".
+    """
+    numbers = sorted(set(numbers))
+    ranges = []
+    i = 0
+    while i < len(numbers):
+        step = 1
+        if steps and i + 2 < len(numbers):
+            step = numbers[i+1] - numbers[i]
+        end = i
+        while end + 1 < len(numbers) and numbers[end+1] - numbers[end] == step:
+            end += 1
+        if step != 1 and end - i < 2:
+            end = i
+        if end == i:
+            ranges.append(str(numbers[i]))
+        elif step == 1:
+            ranges.append('%d-%d' % (numbers[i], numbers[end]))
+        else:
+            ranges.append('%d-%dx%d' % (numbers[i], numbers[end], step))
+        i = end + 1
+    return ','.join(ranges)
+
+def bake_set_mesh(bake_set):
+    """
+    Returns the mesh transform the given bake set bakes, or None.
+    """
+    conn_list = cmds.listConnections(bake_set)
+    if conn_list == None or len(conn_list) == 0:
+        return None
+    return conn_list[0]
+
+def udim_range(index=None, bake_sets=None):
+    """
+    Returns the UDIM tiles the meshes of the given bake sets, all VRay bake
+    sets by default, have UVs in, as a frame list string. Only tiles that
+    actually hold UVs are listed, so no empty tiles get baked.
+    """
+    if bake_sets is None:
+        if index is None:
+            index = SceneIndex()
+        bake_sets = list(bake_set for bake_set in index.ls('VRayBakeOptions') \
+            if bake_set != 'vrayDefaultBakeOptions')
+    tiles = set()
     for bake_set in bake_sets:
-        conn_list = cmds.listConnections(bake_set)
-        if conn_list == None or len(conn_list) == 0:
+        mesh = bake_set_mesh(bake_set)
+        if mesh is None:
             continue
-        uv_info = cmds.polyEvaluate(conn_list[0], b2=True)
-        if uv_info[0][1] > u_max:
-            u_max = int(math.ceil(uv_info[0][1]))
-        if uv_info[1][1] > v_max:
-            v_max = int(math.ceil(uv_info[1][1]))
-    return '1001-%d' % (1001+u_max+(10*v_max))
+        uv_info = mesh_uv_info(mesh)
+        if uv_info is not None:
+            tiles.update(uv_info['tiles'])
+    return format_frame_list(tiles or [UDIM_START])
 
 def seq_to_glob(in_path):
     head = os.path.dirname(in_path)
@@ -142,20 +722,202 @@ def seq_to_glob(in_path):
     new_base = '%s*%s' % (base[:match.start()], base[match.end():])
     return '%s/%s' % (head, new_base)
 
+#
+#   Frame and UDIM tokens in file names: <UDIM>, <UVTILE> (u1_v1), the
+#   <U> and <V> of u<U>_v<V>, <f> and # padding.
+#
+_SEQUENCE_TOKEN = re.compile(r'<UDIM>|<UVTILE>|<U>|<V>|<f>|#+', re.I)
+
+def has_sequence_tokens(path):
+    return _SEQUENCE_TOKEN.search(os.path.basename(path)) != None
+
+def seq_to_pattern(in_path):
+    """
+    Returns the path of a file in a frame sequence, e.g. that of a file
+    texture using its frame extension, with the frame number in the file
+    name replaced by a frame token: # padding if the number is padded,
+    <f> if not.
+    """
+    head = os.path.dirname(in_path)
+    base = os.path.basename(in_path)
+    if _SEQUENCE_TOKEN.search(base):
+        return in_path
+    matches = list(re.finditer('\d+', base))
+    if not matches:
+        return in_path
+    match = matches[-1]
+    if len(match.group()) > 1 and match.group().startswith('0'):
+        token = '#' * len(match.group())
+    else:
+        token = '<f>'
+    new_base = '%s%s%s' % (base[:match.start()], token, base[match.end():])
+    return '%s/%s' % (head, new_base)
+
+#
+#   Attribute values fetched in bulk during a scene scan, keyed on node and
+#   then attribute. The handlers below read through _get_attr(), which
+#   serves values from here and only falls back to cmds.getAttr() for
+#   anything that wasn't prefetched. Values are kept between scans for the
+#   nodes SCAN_CACHE is watching for changes.
+#
+_ATTR_CACHE = {}
+_MISSING = object()
+
+def _plug_value(om, plug):
+    """
+    Returns the value of the given MPlug the same way cmds.getAttr() would,
+    for the string, numeric and enum attributes the handlers read. Raises
+    TypeError for anything else so the caller can fall back to cmds.
+    """
+    attr = plug.attribute()
+    if attr.hasFn(om.MFn.kTypedAttribute):
+        if om.MFnTypedAttribute(attr).attrType() != om.MFnData.kString:
+            raise TypeError('Unsupported typed attribute: %s' % plug.name())
+        # cmds.getAttr returns None for string attributes that were never set
+        try:
+            if plug.asMObject().isNull():
+                return None
+        except RuntimeError:
+            return None
+        return plug.asString()
+    if attr.hasFn(om.MFn.kEnumAttribute):
+        return plug.asInt()
+    if attr.hasFn(om.MFn.kNumericAttribute):
+        num_type = om.MFnNumericAttribute(attr).numericType()
+        if num_type == om.MFnNumericData.kBoolean:
+            return plug.asBool()
+        if num_type in (om.MFnNumericData.kFloat, om.MFnNumericData.kDouble):
+            return plug.asDouble()
+        if num_type in (om.MFnNumericData.kByte, om.MFnNumericData.kChar,
+                        om.MFnNumericData.kShort, om.MFnNumericData.kInt,
+                        om.MFnNumericData.kLong):
+            return plug.asInt()
+    raise TypeError('Unsupported attribute type: %s' % plug.name())
+
+def bulk_get_attr(nodes, attr):
+    """
+    Returns a dict of node -> value of the given attribute for all of the
+    given nodes. The plugs are read in-process through the OpenMaya API
+    rather than with one cmds.getAttr() call per node. Nodes that don't have
+    the attribute get the ValueError cmds.getAttr() would raise for them,
+    so _get_attr() can raise it without asking Maya again. Nodes whose
+    values can't be read that way are left out of the result.
+
+    attr may contain a logical index, e.g. "BaseColorMap[0]".
+    """
+    values = {}
+    if cmds is not _MAYA_CMDS:
+        # the API would read Maya's scene, not the one behind the backend,
+        # so leave it to the backend if it can read plugs in bulk itself
+        backend_bulk_get_attr = getattr(cmds, 'bulk_get_attr', None)
+        if backend_bulk_get_attr is None:
+            return values
+        return dict(backend_bulk_get_attr(nodes, attr))
+    try:
+        import maya.api.OpenMaya as om
+    except ImportError:
+        return values
+    attr_name = attr
+    index = None
+    match = re.match(r'^(\w+)\[(\d+)\]$', attr)
+    if match:
+        attr, index = match.group(1), int(match.group(2))
+    sel_list = om.MSelectionList()
+    for node in nodes:
+        try:
+            sel_list.clear()
+            sel_list.add(node)
+            dep_fn = om.MFnDependencyNode(sel_list.getDependNode(0))
+            plug = dep_fn.findPlug(attr, False)
+            if index is not None:
+                plug = plug.elementByLogicalIndex(index)
+        except (RuntimeError, ValueError):
+            values[node] = ValueError('No object matches name: %s.%s' % (node, attr_name))
+            continue
+        try:
+            values[node] = _plug_value(om, plug)
+        except (RuntimeError, TypeError, ValueError):
+            continue
+    return values
+
+def prefetch_attrs(nodes, attrs):
+    """
+    Bulk-fetches the given attributes for all of the given nodes into the
+    attribute cache used by the scene file handlers.
+    """
+    for attr in attrs:
+        missing = [node for node in nodes if attr not in _ATTR_CACHE.get(node, ())]
+        if not missing:
+            continue
+        for node, value in bulk_get_attr(missing, attr).iteritems():
+            _ATTR_CACHE.setdefault(node, {})[attr] = value
+    SCAN_CACHE.track(nodes)
+
+def clear_attr_cache():
+    _ATTR_CACHE.clear()
+
+def _get_attr(node, attr):
+    """
+    Returns the value of node.attr, from the attribute cache if it has been
+    fetched already. Raises the same errors cmds.getAttr() would.
+    """
+    if node not in _ATTR_CACHE:
+        _ATTR_CACHE[node] = {}
+        SCAN_CACHE.track([node])
+    values = _ATTR_CACHE[node]
+    value = values.get(attr, _MISSING)
+    if value is _MISSING:
+        try:
+            value = cmds.getAttr('%s.%s' % (node, attr))
+        except Exception as e:
+            value = e
+        values[attr] = value
+    if isinstance(value, Exception):
+        raise value
+    return value
+
+# for file handlers registered from outside this module
+get_node_attr = _get_attr
+
+#
+#   (node type, variant) -> the names of the attributes attr_schema() picked
+#   for that type. Attributes only change with the plugin that defines the
+#   node type, so these are kept across scans and scenes until a plugin is
+#   loaded or unloaded.
+#
+_ATTR_SCHEMAS = {}
+
+def attr_schema(node_type, node, select, variant=None):
+    """
+    Returns the names of the attributes select() picks for nodes of the
+    given type, e.g. the map attributes of FurDescription nodes. The first
+    time a type is seen, select is called with the given node, one of that
+    type, and a list of all its attributes, and returns the ones wanted; the
+    result is reused for every other node of the type. variant tells apart
+    nodes of one type that have different dynamic attributes.
+    """
+    key = (node_type, variant)
+    schema = _ATTR_SCHEMAS.get(key)
+    if schema == None:
+        schema = list(select(node, cmds.listAttr(node) or []))
+        _ATTR_SCHEMAS[key] = schema
+    return schema
+
+def clear_attr_schemas():
+    _ATTR_SCHEMAS.clear()
+
 def _file_handler(node):
     """Returns the file referenced by the given node"""
-    texture_path = cmds.getAttr('%s.fileTextureName' % (node,))
+    texture_path = _get_attr(node, 'fileTextureName')
     try:
-        if cmds.getAttr('%s.useFrameExtension' % (node,)) == True:
-            out_path = seq_to_glob(texture_path)
-        elif texture_path.find('<UDIM>') != -1:
-            out_path = texture_path.replace('<UDIM>', '*')
+        if _get_attr(node, 'useFrameExtension') == True:
+            out_path = seq_to_pattern(texture_path)
         else:
             out_path = texture_path
         yield (out_path,)
         arnold_use_tx = False
         try:
-            arnold_use_tx = cmds.getAttr('defaultArnoldRenderOptions.use_existing_tiled_textures')
+            arnold_use_tx = _get_attr('defaultArnoldRenderOptions', 'use_existing_tiled_textures')
         except:
             arnold_use_tx = False
         if arnold_use_tx:
@@ -168,8 +930,8 @@ def _file_handler(node):
 
 def _cache_file_handler(node):
     """Returns the files references by the given cacheFile node"""
-    path = cmds.getAttr('%s.cachePath' % node)
-    cache_name = cmds.getAttr('%s.cacheName' % node)
+    path = _get_attr(node, 'cachePath')
+    cache_name = _get_attr(node, 'cacheName')
 
     yield ('%s/%s.mc' % (path, cache_name),
            '%s/%s.mcx' % (path, cache_name),
@@ -177,28 +939,26 @@ def _cache_file_handler(node):
 
 def _diskCache_handler(node):
     """Returns disk caches"""
-    yield (cmds.getAttr('%s.cacheName' % node),)
+    yield (_get_attr(node, 'cacheName'),)
 
 def _vrmesh_handler(node):
     """Handles vray meshes"""
-    yield (cmds.getAttr('%s.fileName' % node),)
+    yield (_get_attr(node, 'fileName'),)
 
 def _mrtex_handler(node):
     """Handles mentalrayTexutre nodes"""
-    yield (cmds.getAttr('%s.fileTextureName' % node),)
+    yield (_get_attr(node, 'fileTextureName'),)
 
 def _gpu_handler(node):
     """Handles gpuCache nodes"""
-    yield (cmds.getAttr('%s.cacheFileName' % node),)
+    yield (_get_attr(node, 'cacheFileName'),)
 
 def _mrOptions_handler(node):
     """Handles mentalrayOptions nodes, for Final Gather"""
-    mapName = cmds.getAttr('%s.finalGatherFilename' % node).strip()
+    mapName = _get_attr(node, 'finalGatherFilename').strip()
     if mapName != "":
-        path = cmds.workspace(q=True, rd=True)
-        if path[-1] != "/":
-            path += "/"
-        path += "renderData/mentalray/finalgMap/"
+        path = scan_resolver().rule_dir('mentalRay', 'renderData/mentalray')
+        path += "/finalgMap/"
         path += mapName
         #if not mapName.endswith( ".fgmap" ):
         #    path += ".fgmap"
@@ -207,82 +967,89 @@ def _mrOptions_handler(node):
 
 def _mrIbl_handler(node):
     """Handles mentalrayIblShape nodes"""
-    yield (cmds.getAttr('%s.texture' % node),)
+    yield (_get_attr(node, 'texture'),)
 
 def _abc_handler(node):
     """Handles AlembicNode nodes"""
-    yield (cmds.getAttr('%s.abc_File' % node),)
+    yield (_get_attr(node, 'abc_File'),)
 
 def _vrSettings_handler(node):
     """Handles VRaySettingsNode nodes, for irradiance map"""
-    irmap = cmds.getAttr('%s.ifile' % node)
-    if cmds.getAttr('%s.imode' % node) == 7:
+    irmap = _get_attr(node, 'ifile')
+    if _get_attr(node, 'imode') == 7:
         if irmap.find('.') == -1:
             irmap += '*'
         else:
             last_dot = irmap.rfind('.')
             irmap = '%s*%s' % (irmap[:last_dot], irmap[last_dot:])
     yield (irmap,
-           cmds.getAttr('%s.fnm' % node),)
+           _get_attr(node, 'fnm'),)
 
 def _particle_handler(node):
-    project_dir = cmds.workspace(q=True, rd=True)
-    if project_dir[-1] == '/':
-        project_dir = project_dir[:-1]
+    particle_dir = scan_resolver().rule_dir('particles', 'particles')
     if node.find('|') == -1:
         node_base = node
     else:
         node_base = node.split('|')[-1]
     path = None
     try:
-        startup_cache = cmds.getAttr('%s.scp' % (node,)).strip()
+        startup_cache = _get_attr(node, 'scp').strip()
         if startup_cache in (None, ''):
             path = None
         else:
-            path = '%s/particles/%s/%s*' % (project_dir, startup_cache, node_base)
+            path = '%s/%s/%s*' % (particle_dir, startup_cache, node_base)
     except:
         path = None
     if path == None:
-        scene_base, ext = os.path.splitext(os.path.basename(cmds.file(q=True, loc=True)))
-        path = '%s/particles/%s/%s*' % (project_dir, scene_base, node_base)
+        scene_base, ext = os.path.splitext(os.path.basename(scan_resolver().scene_path()))
+        path = '%s/%s/%s*' % (particle_dir, scene_base, node_base)
     yield (path,)
 
 def _ies_handler(node):
     """Handles VRayLightIESShape nodes, for IES lighting files"""
-    yield (cmds.getAttr('%s.iesFile' % node),)
+    yield (_get_attr(node, 'iesFile'),)
+
+def _select_fur_maps(node, attrs):
+    return [attr for attr in attrs \
+        if attr.find('Map') != -1 and cmds.attributeQuery(attr, node=node, at=True) == 'typed']
+
+def _fur_map_attrs(nodes):
+    """
+    Returns the elements of the FurDescription "Map" attributes that may
+    hold file paths, for prefetching.
+    """
+    attrs = attr_schema('FurDescription', nodes[0], _select_fur_maps)
+    return ['%s[%s]' % (attr, index) for attr in attrs for index in ('0', '1')]
 
 def _fur_handler(node):
     """Handles FurDescription nodes"""
     #
     #   Find all "Map" attributes and see if they have stored file paths.
     #
-    for attr in cmds.listAttr(node):
-        if attr.find('Map') != -1 and cmds.attributeQuery(attr, node=node, at=True) == 'typed':
-            index_list = ['0', '1']
-            for index in index_list:
-                try:
-                    map_path = cmds.getAttr('%s.%s[%s]' % (node, attr, index))
-                    if map_path != None and map_path != '':
-                        yield (map_path,)
-                except:
-                    pass
+    for attr in _fur_map_attrs([node]):
+        try:
+            map_path = _get_attr(node, attr)
+            if map_path != None and map_path != '':
+                yield (map_path,)
+        except:
+            pass
 
 def _ptex_handler(node):
     """Handles Mental Ray ptex nodes"""
-    yield(cmds.getAttr('%s.S00' % node),)
+    yield(_get_attr(node, 'S00'),)
 
 def _substance_handler(node):
     """Handles Vray Substance nodes"""
-    yield(cmds.getAttr('%s.p' % node),)
+    yield(_get_attr(node, 'p'),)
 
 def _imagePlane_handler(node):
     """Handles Image Planes"""
     # only return the path if the display mode is NOT set to "None"
-    if cmds.getAttr('%s.displayMode' % (node,)) != 0:
-        texture_path = cmds.getAttr('%s.imageName' % (node,))
+    if _get_attr(node, 'displayMode') != 0:
+        texture_path = _get_attr(node, 'imageName')
         try:
-            if cmds.getAttr('%s.useFrameExtension' % (node,)) == True:
-                yield (seq_to_glob(texture_path),)
+            if _get_attr(node, 'useFrameExtension') == True:
+                yield (seq_to_pattern(texture_path),)
             else:
                 yield (texture_path,)
         except:
@@ -291,7 +1058,7 @@ def _imagePlane_handler(node):
 def _mesh_handler(node):
     """Handles Mesh nodes, in case they are using MR Proxies"""
     try:
-        proxy_path = cmds.getAttr('%s.miProxyFile' % (node,))
+        proxy_path = _get_attr(node, 'miProxyFile')
         if proxy_path != None:
             yield (proxy_path,)
     except:
@@ -299,154 +1066,3312 @@ def _mesh_handler(node):
 
 def _dynGlobals_handler(node):
     """Handles dynGlobals nodes"""
-    project_dir = cmds.workspace(q=True, rd=True)
-    if project_dir[-1] == '/':
-        project_dir = project_dir[:-1]
-    cache_dir = cmds.getAttr('%s.cd' % (node,))
+    particle_dir = scan_resolver().rule_dir('particles', 'particles')
+    cache_dir = _get_attr(node, 'cd')
     if cache_dir not in (None, ''):
-        path = '%s/particles/%s/*' % (project_dir, cache_dir.strip())
+        path = '%s/%s/*' % (particle_dir, cache_dir.strip())
         yield (path,)
 
 def _aiStandIn_handler(node):
     """Handles aiStandIn nodes"""
-    yield (cmds.getAttr('%s.dso' % (node,)),)
+    yield (_get_attr(node, 'dso'),)
 
 def _aiImage_handler(node):
     """Handles aiImage nodes"""
-    yield (cmds.getAttr('%s.filename' % (node,)),)
+    yield (_get_attr(node, 'filename'),)
     
 def _aiPhotometricLight_handler(node):
     """Handles aiPhotometricLight nodes"""
-    yield (cmds.getAttr('%s.aiFilename' % (node,)),)
+    yield (_get_attr(node, 'aiFilename'),)
  
 def _exocortex_handler(node):
     """Handles Exocortex Alembic nodes"""
-    yield (cmds.getAttr('%s.fileName' % (node,)),)
+    yield (_get_attr(node, 'fileName'),)
     
-def get_scene_files():
-    """Returns all of the files being used by the scene"""
-    file_types = {'file': _file_handler,
-                  'cacheFile': _cache_file_handler,
-                  'diskCache': _diskCache_handler,
-                  'VRayMesh': _vrmesh_handler,
-                  'mentalrayTexture': _mrtex_handler,
-                  'gpuCache': _gpu_handler,
-                  'mentalrayOptions': _mrOptions_handler,
-                  'mentalrayIblShape': _mrIbl_handler,
-                  'AlembicNode': _abc_handler,
-                  'VRaySettingsNode': _vrSettings_handler,
-                  'particle': _particle_handler,
-                  'VRayLightIESShape': _ies_handler,
-                  'FurDescription': _fur_handler,
-                  'mib_ptex_lookup': _ptex_handler,
-                  'substance': _substance_handler,
-                  'imagePlane': _imagePlane_handler,
-                  'mesh': _mesh_handler,
-                  'dynGlobals': _dynGlobals_handler,
-                  'aiStandIn': _aiStandIn_handler,
-                  'aiImage': _aiImage_handler,
-                  'aiPhotometricLight': _aiPhotometricLight_handler,
-                  'ExocortexAlembicFile': _exocortex_handler}
-
-    for file_type in file_types:
-        handler = file_types.get(file_type)
-        nodes = cmds.ls(type=file_type)
-        for node in nodes:
-            for files in handler(node):
-                for scene_file in files:
-                    if scene_file != None:
-                        yield scene_file.replace('\\', '/')
-
-def get_default_extension(renderer):
-    """Returns the filename prefix for the given renderer, either mental ray 
-       or maya software.
+#
+#   node type -> handler for the files used by nodes of that type, or of a
+#   type derived from it. A handler is called with the name of each node and
+#   yields tuples of paths. Extend with register_file_handler().
+#
+FILE_HANDLERS = {'file': _file_handler,
+                 'cacheFile': _cache_file_handler,
+                 'diskCache': _diskCache_handler,
+                 'VRayMesh': _vrmesh_handler,
+                 'mentalrayTexture': _mrtex_handler,
+                 'gpuCache': _gpu_handler,
+                 'mentalrayOptions': _mrOptions_handler,
+                 'mentalrayIblShape': _mrIbl_handler,
+                 'AlembicNode': _abc_handler,
+                 'VRaySettingsNode': _vrSettings_handler,
+                 'particle': _particle_handler,
+                 'VRayLightIESShape': _ies_handler,
+                 'FurDescription': _fur_handler,
+                 'mib_ptex_lookup': _ptex_handler,
+                 'substance': _substance_handler,
+                 'imagePlane': _imagePlane_handler,
+                 'mesh': _mesh_handler,
+                 'dynGlobals': _dynGlobals_handler,
+                 'aiStandIn': _aiStandIn_handler,
+                 'aiImage': _aiImage_handler,
+                 'aiPhotometricLight': _aiPhotometricLight_handler,
+                 'ExocortexAlembicFile': _exocortex_handler}
+
+#
+#   The attributes each handler reads, per node type. These are fetched for
+#   all nodes of a type in one sweep before the handler runs. Instead of a
+#   list this can be a function that's given the nodes and returns the list,
+#   for attributes that are only known once the nodes are.
+#
+FILE_TYPE_ATTRS = {'file': ['fileTextureName', 'useFrameExtension'],
+                   'cacheFile': ['cachePath', 'cacheName'],
+                   'diskCache': ['cacheName'],
+                   'VRayMesh': ['fileName'],
+                   'mentalrayTexture': ['fileTextureName'],
+                   'gpuCache': ['cacheFileName'],
+                   'mentalrayOptions': ['finalGatherFilename'],
+                   'mentalrayIblShape': ['texture'],
+                   'AlembicNode': ['abc_File'],
+                   'VRaySettingsNode': ['ifile', 'imode', 'fnm'],
+                   'particle': ['scp'],
+                   'VRayLightIESShape': ['iesFile'],
+                   'FurDescription': _fur_map_attrs,
+                   'mib_ptex_lookup': ['S00'],
+                   'substance': ['p'],
+                   'imagePlane': ['displayMode', 'imageName', 'useFrameExtension'],
+                   'mesh': ['miProxyFile'],
+                   'dynGlobals': ['cd'],
+                   'aiStandIn': ['dso'],
+                   'aiImage': ['filename'],
+                   'aiPhotometricLight': ['aiFilename'],
+                   'ExocortexAlembicFile': ['fileName']}
+
+def register_file_handler(node_type, handler, attrs=None):
     """
-    if renderer == "sw":
-        menu_grp = 'imageMenuMayaSW'
-    elif renderer == "mr":
-        menu_grp = 'imageMenuMentalRay'
+    Registers a handler for the files used by nodes of the given type, e.g.
+    for a studio's own node types, replacing any handler already registered
+    for it. The handler is called with the name of each node of that type
+    in the scene and yields tuples of the paths the node uses.
+
+    attrs is the list of attributes the handler reads. They are fetched for
+    all nodes of the type in one sweep before the handler runs, and the
+    handler should read them with get_node_attr().
+    """
+    FILE_HANDLERS[node_type] = handler
+    if attrs:
+        FILE_TYPE_ATTRS[node_type] = list(attrs)
     else:
-        raise Exception('Invalid Renderer: %s' % renderer)
+        FILE_TYPE_ATTRS.pop(node_type, None)
+
+def unregister_file_handler(node_type):
+    """
+    Removes the handler registered for the given node type, if any.
+    """
+    FILE_HANDLERS.pop(node_type, None)
+    FILE_TYPE_ATTRS.pop(node_type, None)
+
+def get_scene_files(index=None, profile=None, errors=None):
+    """
+    Returns all of the files being used by the scene.
+
+    If a profile dict is given, it's filled with node type -> dict of the
+    "nodes" handled, "paths" found and "seconds" spent on them, for every
+    registered node type found in the scene. If an errors list is given, a
+    message is added to it for each renderer scene file the scene loads
+    that couldn't be scanned for the files it names.
+    """
+    global _RESOLVER
+    if index is None:
+        index = SceneIndex()
+    if not SCAN_CACHE.start():
+        clear_attr_cache()
+    _RESOLVER = None
+    payloads = set()
     try:
-        val = cmds.optionMenuGrp(menu_grp, q=True, v=True)
-    except RuntimeError:
-        msg = 'Please open the Maya Render globals before submitting.'
-        raise Exception(msg)
-    else:
-        return val.split()[-1][1:-1]
+        for file_type, handler in FILE_HANDLERS.items():
+            nodes = index.ls(file_type)
+            if not nodes:
+                continue
+            start = time.time()
+            attrs = FILE_TYPE_ATTRS.get(file_type, [])
+            if callable(attrs):
+                attrs = attrs(nodes)
+            prefetch_attrs(nodes, attrs)
+            elapsed = time.time() - start
+            path_count = 0
+            for node in nodes:
+                # time only the handler, not whoever is consuming the paths
+                start = time.time()
+                node_files = [scene_file for files in handler(node) \
+                    for scene_file in files if scene_file != None]
+                # add the files named inside any renderer scene files the
+                # node loads, scanning each of those only once however many
+                # nodes load it
+                new_payloads = [scene_file for scene_file in node_files \
+                    if scene_file not in payloads and is_payload_path(scene_file)]
+                if new_payloads:
+                    payloads.update(new_payloads)
+                    node_files += scan_payload_files(new_payloads, resolve=scan_resolver().resolve,
+                                                     errors=errors)
+                elapsed += time.time() - start
+                path_count += len(node_files)
+                for scene_file in node_files:
+                    yield scene_file.replace('\\', '/')
+            if profile != None:
+                profile[file_type] = {'nodes': len(nodes),
+                                      'paths': path_count,
+                                      'seconds': elapsed}
+    finally:
+        _RESOLVER = None
+        SCAN_CACHE.end_scan()
+
+_DRIVE_PATH = re.compile(r'^[A-Za-z]:/')
+
+def is_abs_path(path):
+    """
+    Returns whether the given forward-slashed path is absolute, on any
+    platform - e.g. C:/tex/wood.tx is absolute on a Mac too.
+    """
+    return path.startswith('/') or _DRIVE_PATH.match(path) != None
+
+def canonical_path(path, root=None):
+    """
+    Returns the given scene file path with forward slashes, redundant
+    separators and up-level references collapsed, and, if it's relative,
+    resolved against root - usually the project dir.
+    """
+    path = path.replace('\\', '/')
+    if root != None and not is_abs_path(path):
+        path = '%s/%s' % (root.replace('\\', '/').rstrip('/'), path)
+    if '/.' in path or '//' in path[1:] or path.endswith('/'):
+        path = posixpath.normpath(path)
+    return path
+
+_ENV_VAR = re.compile(r'\$(\w+)|\$\{([^}]*)\}|%(\w+)%')
+
+def expand_env_vars(path):
+    """
+    Expands $VAR, ${VAR} and %VAR% environment variables in the given path,
+    the way Maya does when it opens a file. Variables that aren't set are
+    left as they are.
+    """
+    if '$' not in path and '%' not in path:
+        return path
+    def expand(match):
+        name = match.group(1) or match.group(2) or match.group(3)
+        return os.environ.get(name, match.group(0))
+    return _ENV_VAR.sub(expand, path)
+
+class PathResolver(object):
+    """
+    Turns the paths found in a scene into canonical absolute paths: expands
+    environment variables and resolves relative paths against the workspace
+    root dir. The workspace root, its file rules and the scene path are
+    queried once and reused, and resolved paths are memoized, as scenes
+    tend to reference the same paths many times over.
+    """
+    def __init__(self, root=None):
+        if root == None:
+            root = proj_dir()
+        self.root = canonical_path(root).rstrip('/')
+        self._rules = {}
+        self._scene_path = None
+        self._resolved = {}
+
+    def resolve(self, path):
+        """
+        Returns the canonical absolute form of the given path.
+        """
+        resolved = self._resolved.get(path)
+        if resolved == None:
+            resolved = expand_env_vars(path)
+            if resolved.startswith('$') or resolved.startswith('%'):
+                # a variable that isn't set here - leave it to the farm
+                resolved = canonical_path(resolved)
+            else:
+                resolved = canonical_path(resolved, self.root)
+            self._resolved[path] = resolved
+        return resolved
+
+    def rule_dir(self, rule, default):
+        """
+        Returns the absolute path of the dir the workspace's file rule of the
+        given name points at, or of the default dir relative to the workspace
+        root if it has no such rule.
+        """
+        if rule not in self._rules:
+            try:
+                entry = cmds.workspace(fileRuleEntry=rule)
+            except RuntimeError:
+                entry = None
+            self._rules[rule] = self.resolve(entry or default)
+        return self._rules[rule]
+
+    def scene_path(self):
+        """
+        Returns the path of the current scene.
+        """
+        if self._scene_path == None:
+            self._scene_path = cmds.file(q=True, loc=True)
+        return self._scene_path
+
+_RESOLVER = None
+
+def scan_resolver():
+    """
+    Returns the PathResolver shared by the scene file handlers for the scan
+    in progress.
+    """
+    global _RESOLVER
+    if _RESOLVER == None:
+        _RESOLVER = PathResolver()
+    return _RESOLVER
+
+def unique_paths(paths, root=None):
+    """
+    Resolves the given stream of paths with a PathResolver and yields
+    each distinct path the first time it's seen, so duplicates are dropped
+    as they come in instead of after collecting them all. Paths on Windows
+    drives are compared case-insensitively, like the filesystem does, and
+    come out as they were first spelled. Empty paths are skipped.
+    """
+    resolver = PathResolver(root)
+    seen = set()
+    # most duplicates are spelled the same way, so skip those before doing
+    # any work on them
+    seen_raw = set()
+    for path in paths:
+        if not path or path in seen_raw:
+            continue
+        seen_raw.add(path)
+        path = resolver.resolve(path)
+        if _DRIVE_PATH.match(path):
+            key = path.lower()
+        else:
+            key = path
+        if key not in seen:
+            seen.add(key)
+            yield path
+
+def iter_chunks(items, size):
+    """
+    Yields lists of up to size items from the given iterable, reading no
+    further ahead than the current chunk.
+    """
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+#
+#   Files bigger than this are reported by the preflight check.
+#
+LARGE_FILE_SIZE = 2 * 1024 * 1024 * 1024
+
+class DirectoryCache(object):
+    """
+    Caches directory listings, so that checking many files in the same
+    directory - UDIM tiles, frame sequences, particle caches - costs one
+    os.listdir() for the directory instead of one lookup per file.
+    Safe to share between threads.
+    """
+    def __init__(self):
+        self._listings = {}
+        self._lock = threading.Lock()
+
+    def listdir(self, dir_path):
+        """
+        Returns a dict of os.path.normcase(name) -> name for the entries in
+        dir_path, or an empty dict if the directory doesn't exist.
+        """
+        with self._lock:
+            listing = self._listings.get(dir_path)
+        if listing is None:
+            listing = {}
+            try:
+                for name in os.listdir(dir_path):
+                    listing[os.path.normcase(name)] = name
+            except OSError:
+                pass
+            with self._lock:
+                self._listings[dir_path] = listing
+        return listing
+
+    def expand(self, path):
+        """
+        Returns the list of existing files matching path. path may contain
+        glob wildcards in its file name.
+        """
+        dir_path, base = os.path.split(path)
+        if glob.has_magic(dir_path):
+            return sorted(glob.glob(path))
+        listing = self.listdir(dir_path)
+        if not glob.has_magic(base):
+            name = listing.get(os.path.normcase(base))
+            if name is None:
+                return []
+            return [path]
+        pattern = os.path.normcase(base)
+        return ['%s/%s' % (dir_path, listing[key]) \
+            for key in sorted(listing) if fnmatch.fnmatch(key, pattern)]
+
+    def expand_range(self, path):
+        """
+        Returns the list of existing files in the range described by the
+        given range descriptor path from SequenceExpander, e.g.
+        "tex.1001-1042.exr", or an empty list if it isn't one.
+        """
+        dir_path, base = os.path.split(path)
+        match = _range_match(base)
+        if match == None:
+            return []
+        listing = self.listdir(dir_path)
+        start, end = match.group(1), match.group(2)
+        found = []
+        for number in range(int(start), int(end) + 1):
+            name = listing.get(os.path.normcase('%s%s%s' % (base[:match.start()],
+                str(number).zfill(len(start)), base[match.end():])))
+            if name != None:
+                found.append('%s/%s' % (dir_path, name))
+        return found
+
+_RANGE = re.compile(r'(\d+)-(\d+)')
+
+def _range_match(base):
+    """
+    Returns the match of the last frame range in the given file name, or
+    None if it has none.
+    """
+    matches = [match for match in _RANGE.finditer(base) \
+        if int(match.group(1)) < int(match.group(2))]
+    if not matches:
+        return None
+    return matches[-1]
+
+#
+#   Whether the files of sequences found on disk are sent to ZYNC as
+#   compact range descriptors, e.g. "tex.1001-1042.exr", rather than one by
+#   one. Only set COMPACT_SEQUENCES in config_maya.py for a ZYNC server that
+#   expands them. Runs shorter than SEQUENCE_MIN_RANGE are always sent one
+#   by one. The scene info then lists the descriptors among its "files" in
+#   "file_ranges" too, so they aren't mistaken for files of that name; a
+#   run is sent one by one if a file with its descriptor's name exists.
+#
+COMPACT_SEQUENCES = False
+SEQUENCE_MIN_RANGE = 3
+
+def compact_sequences_enabled():
+    """
+    Returns whether sequences are sent as range descriptors, i.e. whether
+    COMPACT_SEQUENCES is set in config_maya.py.
+    """
+    _load_zync()
+    return bool(COMPACT_SEQUENCES)
+
+class SequenceExpander(object):
+    """
+    Expands file paths with frame or UDIM tokens in their file names into
+    the files on disk that belong to the sequence. Only names that have the
+    right kind of number in place of each token match, so unrelated files
+    in the same dir - "tex.bak.exr" next to "tex.<UDIM>.exr" - are left
+    out, unlike with a glob. Each dir is listed only once, through the
+    given DirectoryCache.
+    """
+    def __init__(self, dir_cache=None, compact=None):
+        if dir_cache == None:
+            dir_cache = DirectoryCache()
+        if compact == None:
+            compact = COMPACT_SEQUENCES
+        self.dir_cache = dir_cache
+        self.compact = compact
+        # the range descriptors expand() has returned
+        self.ranges = set()
+        self._sorted_keys = {}
+        self._case_flag = 0
+        if os.path.normcase('A') != 'A':
+            self._case_flag = re.I
+
+    def _name_regex(self, base):
+        parts = []
+        tokens = []
+        pos = 0
+        for match in _SEQUENCE_TOKEN.finditer(base):
+            parts.append(re.escape(base[pos:match.start()]))
+            token = match.group().upper()
+            if token == '<UDIM>':
+                parts.append(r'(1\d\d\d)')
+            elif token == '<UVTILE>':
+                parts.append(r'(u\d+_v\d+)')
+            elif token.startswith('#'):
+                parts.append(r'(\d{%d}|[1-9]\d{%d,})' % (len(token), len(token)))
+            else:
+                parts.append(r'(\d+)')
+            tokens.append(token)
+            pos = match.end()
+        parts.append(re.escape(base[pos:]))
+        return re.compile('^%s$' % (''.join(parts),), self._case_flag), tokens
+
+    def members(self, path):
+        """
+        Returns the file names in the sequence of the given path that exist
+        on disk, as a sorted list of (numbers, name) tuples, where numbers
+        are the strings that stand in for the tokens.
+        """
+        dir_path, base = os.path.split(path)
+        regex, tokens = self._name_regex(base)
+        listing = self.dir_cache.listdir(dir_path)
+        keys = self._sorted_keys.get(dir_path)
+        if keys == None:
+            keys = self._sorted_keys[dir_path] = sorted(listing)
+        # only names starting with the part before the first token can match
+        prefix = os.path.normcase(base[:_SEQUENCE_TOKEN.search(base).start()])
+        members = []
+        for i in xrange(bisect.bisect_left(keys, prefix), len(keys)):
+            if not keys[i].startswith(prefix):
+                break
+            name = listing[keys[i]]
+            match = regex.match(name)
+            if match == None:
+                continue
+            numbers = match.groups()
+            if '<UDIM>' in tokens and int(numbers[tokens.index('<UDIM>')]) < UDIM_START:
+                continue
+            members.append((numbers, name))
+        members.sort(key=lambda member: [_number_key(number) for number in member[0]])
+        return members
+
+    def expand(self, path):
+        """
+        Returns the list of paths to send for the given path: the path
+        itself if it has no tokens, otherwise the files of the sequence found
+        on disk, with runs of consecutive numbers as range descriptors,
+        which are added to ranges, if compact is set. If no file of the sequence is found, the path comes
+        back with its tokens turned into glob wildcards, so it's reported as
+        missing.
+        """
+        if not has_sequence_tokens(path):
+            return [path]
+        dir_path, base = os.path.split(path)
+        members = self.members(path)
+        if not members:
+            return ['%s/%s' % (dir_path, _SEQUENCE_TOKEN.sub('*', base))]
+        if not self.compact or len(members[0][0]) != 1 or not members[0][0][0].isdigit():
+            return ['%s/%s' % (dir_path, name) for numbers, name in members]
+        expanded = []
+        for run in _number_runs(members):
+            if len(run) < SEQUENCE_MIN_RANGE:
+                expanded += ['%s/%s' % (dir_path, name) for number, name in run]
+                continue
+            match = self._name_regex(base)[0].match(run[0][1])
+            range_name = '%s%s-%s%s' % (run[0][1][:match.start(1)], run[0][0], run[-1][0],
+                                        run[0][1][match.end(1):])
+            if os.path.normcase(range_name) in self.dir_cache.listdir(dir_path):
+                # a real file by that name - send the run one by one
+                expanded += ['%s/%s' % (dir_path, name) for number, name in run]
+                continue
+            range_path = '%s/%s' % (dir_path, range_name)
+            self.ranges.add(range_path)
+            expanded.append(range_path)
+        return expanded
+
+    def expand_paths(self, paths):
+        """
+        Yields the expansion of each of the given paths, skipping any path
+        that has been yielded already - e.g. two spellings of a sequence
+        that both turn into the same glob.
+        """
+        seen = set()
+        for path in paths:
+            for expanded in self.expand(path):
+                if expanded not in seen:
+                    seen.add(expanded)
+                    yield expanded
+
+def _number_key(number):
+    if number.isdigit():
+        return (int(number), number)
+    return (0, number)
+
+def _number_runs(members):
+    """
+    Splits the given sorted single-token sequence members into runs of
+    consecutive numbers of the same width, as lists of (number, name).
+    """
+    runs = []
+    for numbers, name in members:
+        number = numbers[0]
+        if runs:
+            last = runs[-1][-1][0]
+            if int(number) == int(last) + 1 and (len(number) == len(last) or \
+                    not (number.startswith('0') or last.startswith('0'))):
+                runs[-1].append((number, name))
+                continue
+        runs.append([(number, name)])
+    return runs
+
+def _thread_pool(processes):
+    # multiprocessing is only imported once a pool is actually needed
+    from multiprocessing.pool import ThreadPool
+    return ThreadPool(processes)
+
+def _stat_scene_file(dir_cache, path):
+    found = []
+    matches = dir_cache.expand(path)
+    if not matches:
+        matches = dir_cache.expand_range(path)
+    for match in matches:
+        try:
+            st = os.stat(match)
+        except OSError:
+            continue
+        if stat.S_ISDIR(st.st_mode):
+            continue
+        found.append((match, st.st_size, st.st_mtime))
+    return path, found
+
+def stat_scene_files(paths, root=None, threads=8):
+    """
+    Expands any wildcards in the given scene file paths and stats the files
+    they match, using a pool of threads. Relative paths are taken to be
+    relative to root, usually the project dir.
+
+    Returns a tuple (found, missing). found is a list of (path, size, mtime)
+    for every file matched; missing is the list of input paths that didn't
+    match any file.
+    """
+    dir_cache = DirectoryCache()
+    to_check = []
+    for path in paths:
+        if root != None and not is_abs_path(path):
+            path = '%s/%s' % (root.rstrip('/'), path)
+        to_check.append(path)
+    pool = _thread_pool(max(1, min(threads, len(to_check))))
+    try:
+        results = pool.map(partial(_stat_scene_file, dir_cache), to_check)
+    finally:
+        pool.close()
+        pool.join()
+    found = []
+    missing = []
+    for path, path_found in results:
+        if path_found:
+            found.extend(path_found)
+        else:
+            missing.append(path)
+    return found, missing
+
+MANIFEST_PATH = os.path.join(os.path.expanduser('~'), '.zync', 'maya_file_manifest.db')
+HASH_CHUNK_SIZE = 4 * 1024 * 1024
+
+def hash_file(path):
+    """
+    Returns the SHA-1 hex digest of the contents of the given file, reading
+    it in chunks so large files aren't loaded into memory.
+    """
+    sha = hashlib.sha1()
+    f = open(path, 'rb')
+    try:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            sha.update(chunk)
+    finally:
+        f.close()
+    return sha.hexdigest()
+
+def _hash_file_or_none(path):
+    try:
+        return path, hash_file(path)
+    except (IOError, OSError):
+        return path, None
+
+def hash_files(paths, threads=4):
+    """
+    Hashes the given files with a pool of threads. Returns a list of
+    (path, hash) pairs, with None as the hash of files that can't be read.
+    """
+    if not paths:
+        return []
+    pool = _thread_pool(max(1, min(threads, len(paths))))
+    try:
+        return pool.map(_hash_file_or_none, paths)
+    finally:
+        pool.close()
+        pool.join()
+
+class FileManifest(object):
+    """
+    A local sqlite record of the size, mtime and content hash of every scene
+    file as of the last time it was submitted, used to work out which files
+    have changed since then.
+
+    Files whose size and mtime match the record are taken as unchanged without
+    reading them. Files whose size matches but mtime doesn't are hashed and
+    compared with the recorded hash, so a file that was only touched or
+    re-copied doesn't count as changed. New and resized files count as
+    changed without being read, and are recorded without a hash when
+    they're marked as submitted, so submitting doesn't wait on reading
+    them. A file recorded without a hash is hashed the next time its mtime
+    changes; it counts as changed then, having no hash to compare with, and
+    its hash is recorded for the time after.
+    """
+    def __init__(self, db_path=MANIFEST_PATH):
+        import sqlite3
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        self.db = sqlite3.connect(db_path, timeout=30)
+        self.db.execute('CREATE TABLE IF NOT EXISTS files ('
+                        'path TEXT PRIMARY KEY, size INTEGER, mtime REAL, hash TEXT)')
+        self.db.commit()
+        # path -> (size, mtime, hash) of the files changed_files() hashed or
+        # found unchanged; the hash is None for files never hashed
+        self._hashes = {}
+
+    def close(self):
+        self.db.close()
+
+    def _records(self, paths):
+        records = {}
+        for batch in iter_chunks(paths, 500):
+            query = 'SELECT path, size, mtime, hash FROM files WHERE path IN (%s)' % \
+                (','.join('?' * len(batch)),)
+            for path, size, mtime, file_hash in self.db.execute(query, batch):
+                records[path] = (size, mtime, file_hash)
+        return records
+
+    def changed_files(self, found, threads=4):
+        """
+        Given a list of (path, size, mtime) as returned by stat_scene_files(),
+        returns the list of paths that have changed since they were last
+        submitted.
+        """
+        records = self._records(path for path, size, mtime in found)
+        changed = []
+        to_hash = {}
+        for path, size, mtime in found:
+            record = records.get(path)
+            if record is None or record[0] != size:
+                changed.append(path)
+            elif record[1] != mtime:
+                to_hash[path] = (size, mtime)
+            else:
+                self._hashes[path] = record
+        for path, file_hash in hash_files(list(to_hash), threads):
+            self._hashes[path] = to_hash[path] + (file_hash,)
+            if file_hash is None or file_hash != records[path][2]:
+                changed.append(path)
+        return changed
+
+    def mark_submitted(self, found):
+        """
+        Records the given list of (path, size, mtime) as submitted, with the
+        hash changed_files() got for each, if any. Files it didn't hash are
+        recorded without one rather than read here.
+        """
+        hashes = {}
+        for path, size, mtime in found:
+            known = self._hashes.get(path)
+            if known is not None and known[:2] == (size, mtime):
+                hashes[path] = known[2]
+            else:
+                hashes[path] = None
+        self.db.executemany('INSERT OR REPLACE INTO files (path, size, mtime, hash) VALUES (?, ?, ?, ?)',
+                            [(path, size, mtime, hashes[path]) for path, size, mtime in found])
+        self.db.commit()
+
+#
+#   Uploading scene files from the plugin before a job is submitted. This
+#   is only done if UPLOAD_URL is set in config_maya.py; otherwise the ZYNC
+#   client transfers the files itself. Jobs whose files were uploaded this
+#   way are submitted with the "files_uploaded" param set, for ZYNC to skip
+#   its own transfer of them, so only set UPLOAD_URL for a ZYNC setup that
+#   does that. Files are sent in parts of
+#   UPLOAD_PART_SIZE bytes over up to UPLOAD_CONNECTIONS connections at
+#   once, as
+#
+#       PUT  <UPLOAD_URL>/<file key>/<part number>    the part's bytes
+#       POST <UPLOAD_URL>/<file key>/complete         JSON path, size, mtime
+#                                                     and number of parts
+#
+#   where the file key is a hash of the file's path, size and mtime. Each
+#   part and file the server acknowledges is checkpointed in
+#   UPLOAD_CHECKPOINT_PATH, so an interrupted upload resumes where it left
+#   off instead of starting over. UPLOAD_MAX_BYTES_PER_SECOND caps the
+#   bandwidth used, if it's set; if UPLOAD_LIMIT_HOURS is set too, the cap
+#   only applies between those (start hour, end hour), in local time.
+#
+UPLOAD_URL = None
+UPLOAD_CONNECTIONS = 4
+UPLOAD_PART_SIZE = 16 * 1024 * 1024
+UPLOAD_MAX_BYTES_PER_SECOND = None
+UPLOAD_LIMIT_HOURS = None
+UPLOAD_RETRIES = 3
+UPLOAD_CHECKPOINT_PATH = os.path.join(os.path.expanduser('~'), '.zync', 'maya_upload_checkpoint.json')
+UPLOAD_CHECKPOINT_INTERVAL = 5.0
+_UPLOAD_BLOCK_SIZE = 64 * 1024
+
+def upload_enabled():
+    """
+    Returns whether scene files are uploaded by the plugin, i.e. whether
+    UPLOAD_URL is set in config_maya.py.
+    """
+    _load_zync()
+    return bool(UPLOAD_URL)
+
+class UploadError(Exception):
+    """
+    Raised when files can't be uploaded. Whatever was uploaded before the
+    error is checkpointed, so uploading them again picks up from there.
+    """
+
+def upload_key(path, size, mtime):
+    """
+    Returns the key the given version of a file is uploaded under.
+    """
+    if isinstance(path, unicode):
+        path = path.encode('utf-8')
+    return hashlib.sha1('%s\0%d\0%r' % (path, size, mtime)).hexdigest()
+
+class UploadCheckpoint(object):
+    """
+    The parts of files an upload server has acknowledged, by upload URL and
+    file key, saved to a JSON file as the upload goes. A file is recorded as
+    True once it's complete. Safe to use from several threads.
+    """
+    def __init__(self, url, path=UPLOAD_CHECKPOINT_PATH, interval=UPLOAD_CHECKPOINT_INTERVAL):
+        self.url = url
+        self.path = path
+        self.interval = interval
+        self._urls = {}
+        self._lock = threading.Lock()
+        self._saved = 0
+        self._dirty = False
+        self._load()
+        self._files = self._urls.setdefault(url, {})
+
+    def _load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            f = open(self.path)
+            try:
+                self._urls = json.load(f)
+            finally:
+                f.close()
+        except (IOError, ValueError):
+            self._urls = {}
+
+    def parts_done(self, key):
+        """
+        Returns the set of parts of the file with the given key that were
+        uploaded, or True if all of it was.
+        """
+        with self._lock:
+            done = self._files.get(key, ())
+            if done is True:
+                return True
+            return set(done)
+
+    def add_part(self, key, part):
+        with self._lock:
+            done = self._files.setdefault(key, [])
+            if done is not True:
+                done.append(part)
+                self._dirty = True
+
+    def complete(self, key):
+        with self._lock:
+            self._files[key] = True
+            self._dirty = True
+
+    def save(self, force=False):
+        """
+        Saves the checkpoint, unless it was saved less than interval seconds
+        ago and force is False.
+        """
+        if self.path is None:
+            return
+        with self._lock:
+            if not self._dirty or (not force and time.time() - self._saved < self.interval):
+                return
+            data = json.loads(json.dumps(self._urls))
+            self._dirty = False
+            self._saved = time.time()
+        _write_json(self.path, data)
+
+class RateLimiter(object):
+    """
+    Caps the combined rate of everything calling wait() - e.g. all upload
+    connections - at bytes_per_second. If hours is a (start hour, end hour)
+    pair, the cap only applies between them, in local time.
+    """
+    def __init__(self, bytes_per_second, hours=None):
+        self.bytes_per_second = bytes_per_second
+        self.hours = hours
+        self._lock = threading.Lock()
+        self._next = 0
+
+    def active(self):
+        if not self.bytes_per_second:
+            return False
+        if self.hours == None:
+            return True
+        start, end = self.hours
+        hour = time.localtime().tm_hour
+        if start <= end:
+            return start <= hour < end
+        # e.g. (20, 6), overnight
+        return hour >= start or hour < end
+
+    def wait(self, count):
+        """
+        Waits until count more bytes may be sent.
+        """
+        if not self.active():
+            return
+        with self._lock:
+            now = time.time()
+            start = max(self._next, now)
+            self._next = start + count / float(self.bytes_per_second)
+        if start > now:
+            time.sleep(start - now)
+
+class Uploader(object):
+    """
+    Uploads files to an upload server the way described above UPLOAD_URL,
+    which is where settings not given here are taken from.
+    """
+    def __init__(self, url=None, connections=None, part_size=None, limiter=None,
+                 checkpoint=None):
+        self.url = (url or UPLOAD_URL or '').rstrip('/')
+        url_parts = urlparse.urlsplit(self.url)
+        if url_parts.scheme not in ('http', 'https'):
+            raise UploadError('Unsupported upload URL: %s' % (self.url,))
+        self._scheme = url_parts.scheme
+        self._netloc = url_parts.netloc
+        self._base_path = url_parts.path
+        self.connections = connections or UPLOAD_CONNECTIONS
+        self.part_size = part_size or UPLOAD_PART_SIZE
+        if limiter == None:
+            limiter = RateLimiter(UPLOAD_MAX_BYTES_PER_SECOND, UPLOAD_LIMIT_HOURS)
+        self.limiter = limiter
+        if checkpoint == None:
+            checkpoint = UploadCheckpoint(self.url, path=UPLOAD_CHECKPOINT_PATH)
+        self.checkpoint = checkpoint
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._scheme == 'https':
+            return httplib.HTTPSConnection(self._netloc, timeout=60)
+        return httplib.HTTPConnection(self._netloc, timeout=60)
+
+    def upload(self, files, progress=None):
+        """
+        Uploads the given files, a list of (path, size, mtime) as
+        stat_scene_files() returns them, skipping whatever the checkpoint
+        says was uploaded already. progress is called with the bytes sent
+        and the total to send as the upload goes, from the upload threads.
+        Returns the number of bytes sent. Raises UploadError if a part
+        fails UPLOAD_RETRIES times.
+        """
+        parts = Queue.Queue()
+        self._pending = {}
+        self._sent = 0
+        self._total = 0
+        self._progress = progress
+        self._error = None
+        # biggest files first, so their parts are spread over all the
+        # connections while the small files fill in around them
+        for path, size, mtime in sorted(files, key=lambda found: -found[1]):
+            key = upload_key(path, size, mtime)
+            done = self.checkpoint.parts_done(key)
+            if done is True:
+                continue
+            count = max(1, (size + self.part_size - 1) // self.part_size)
+            todo = [part for part in range(count) if part not in done]
+            self._pending[key] = len(todo)
+            if not todo:
+                parts.put((path, size, mtime, key, None))
+            for part in todo:
+                length = min(self.part_size, size - part * self.part_size)
+                self._total += length
+                parts.put((path, size, mtime, key, part))
+        if progress != None:
+            progress(0, self._total)
+        threads = []
+        for i in range(min(self.connections, parts.qsize())):
+            thread = threading.Thread(target=self._work, args=(parts,))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        try:
+            for thread in threads:
+                thread.join()
+        finally:
+            self.checkpoint.save(force=True)
+        if self._error != None:
+            raise self._error
+        return self._sent
+
+    def _work(self, parts):
+        conn = self._connect()
+        try:
+            while self._error == None:
+                try:
+                    path, size, mtime, key, part = parts.get_nowait()
+                except Queue.Empty:
+                    break
+                try:
+                    if part != None:
+                        conn = self._retry(conn, self._put_part, path, size, key, part)
+                        self.checkpoint.add_part(key, part)
+                        with self._lock:
+                            self._pending[key] -= 1
+                            last = self._pending[key] == 0
+                    else:
+                        last = True
+                    if last:
+                        conn = self._retry(conn, self._complete, path, size, mtime, key)
+                        self.checkpoint.complete(key)
+                    self.checkpoint.save()
+                except Exception as e:
+                    if not isinstance(e, UploadError):
+                        e = UploadError('Could not upload %s: %s' % (path, e))
+                    self._error = e
+        finally:
+            conn.close()
+
+    def _retry(self, conn, request, *args):
+        # returns the connection to use from then on, which is a new one if
+        # the request had to be retried
+        for attempt in range(UPLOAD_RETRIES):
+            try:
+                request(conn, *args)
+                return conn
+            except (httplib.HTTPException, socket.error) as e:
+                conn.close()
+                if attempt == UPLOAD_RETRIES - 1:
+                    raise UploadError('Could not upload %s: %s' % (args[0], e))
+                time.sleep(2 ** attempt)
+                conn = self._connect()
+
+    def _check_response(self, conn, path):
+        response = conn.getresponse()
+        body = response.read()
+        if response.status >= 500:
+            # worth retrying
+            raise httplib.HTTPException('HTTP %d %s' % (response.status, body[:200]))
+        if response.status // 100 != 2:
+            raise UploadError('Could not upload %s: HTTP %d %s' % (path, response.status, body[:200]))
+
+    def _add_sent(self, count):
+        with self._lock:
+            self._sent += count
+            sent = self._sent
+        if self._progress != None:
+            self._progress(sent, self._total)
+
+    def _put_part(self, conn, path, size, key, part):
+        offset = part * self.part_size
+        length = min(self.part_size, size - offset)
+        sent = 0
+        f = open(path, 'rb')
+        try:
+            f.seek(offset)
+            conn.putrequest('PUT', '%s/%s/%d' % (self._base_path, key, part))
+            conn.putheader('Content-Type', 'application/octet-stream')
+            conn.putheader('Content-Length', str(length))
+            try:
+                block = None
+                while sent < length:
+                    block = f.read(min(_UPLOAD_BLOCK_SIZE, length - sent))
+                    if not block:
+                        raise UploadError('%s changed while it was being uploaded' % (path,))
+                    self.limiter.wait(len(block))
+                    if sent == 0:
+                        # in the same packets as the headers, or small parts
+                        # wait on a delayed ACK before their data goes out
+                        conn.endheaders(block)
+                    else:
+                        conn.send(block)
+                    sent += len(block)
+                    self._add_sent(len(block))
+                if block == None:
+                    conn.endheaders()
+                self._check_response(conn, path)
+            except (httplib.HTTPException, socket.error):
+                # the part is sent again from the start
+                self._add_sent(-sent)
+                raise
+        finally:
+            f.close()
+
+    def _complete(self, conn, path, size, mtime, key):
+        count = max(1, (size + self.part_size - 1) // self.part_size)
+        body = json.dumps({'path': path, 'size': size, 'mtime': mtime, 'parts': count})
+        conn.request('POST', '%s/%s/complete' % (self._base_path, key), body,
+                     {'Content-Type': 'application/json'})
+        self._check_response(conn, path)
+
+#
+#   Attributes that hold the paths of the files a node depends on, by node
+#   type, under the short and long names a Maya ASCII file may give them.
+#   Used to scan the .ma files of references that aren't loaded.
+#
+MA_FILE_ATTRS = {'file': ('ftn', 'fileTextureName'),
+                 'mentalrayTexture': ('ftn', 'fileTextureName'),
+                 'AlembicNode': ('fn', 'abc_File'),
+                 'gpuCache': ('cfn', 'cacheFileName'),
+                 'imagePlane': ('imn', 'imageName'),
+                 'VRayMesh': ('fn', 'fileName'),
+                 'diskCache': ('cacheName',),
+                 'mentalrayIblShape': ('texture',),
+                 'VRayLightIESShape': ('iesFile',),
+                 'mib_ptex_lookup': ('S00',),
+                 'aiStandIn': ('dso',),
+                 'aiImage': ('filename',),
+                 'aiPhotometricLight': ('aiFilename',),
+                 'ExocortexAlembicFile': ('fileName',)}
+
+_MA_STRING = r'"(?:[^"\\]|\\.)*"'
+# where statements _MA_STATEMENT may match start; much faster to find than
+# trying _MA_STATEMENT on every line
+_MA_STATEMENT_START = re.compile(r'\n[ \t]*(?:createNode|select|setAttr|file)[ \t]')
+_MA_STATEMENT = re.compile(
+    r'[ \t]*(?:createNode[ \t]+(?P<type>\w+)(?P<create>[^;\n]*)'
+    r'|select[ \t]+-ne[ \t]+(?P<select>[^;\s]+)'
+    r'|setAttr(?:[ \t]+-\w+(?:[ \t]+\w+)?)*[ \t]+"(?P<attr>[^"]+)"[ \t]+-type[ \t]+"string"'
+    r'(?P<value>(?:\s*\+?\s*' + _MA_STRING + r')+)\s*;'
+    r'|file(?P<file>[ \t](?:[^";]|' + _MA_STRING + r')*);)')
+_MA_TOKEN = re.compile(_MA_STRING + r'|\S+')
+_MA_NODE_NAME = re.compile(r'-n[ \t]+"([^"]+)"')
+
+#
+#   Maya ASCII files are read this many bytes at a time.
+#
+MA_READ_SIZE = 4 * 1024 * 1024
+
+def _ma_unquote(token):
+    return re.sub(r'\\(.)', lambda match: {'n': '\n', 't': '\t'}.get(match.group(1), match.group(1)),
+                  token[1:-1])
+
+def _ma_chunks(f):
+    """
+    Yields the contents of the given Maya ASCII file in pieces that each end
+    right before a top level statement, so no statement is split between
+    two pieces. Statements nested in a createNode block are indented.
+    """
+    pending = ''
+    while True:
+        data = f.read(MA_READ_SIZE)
+        if not data:
+            break
+        pending += data
+        end = len(pending)
+        while True:
+            end = pending.rfind('\n', 0, end)
+            if end == -1 or (end + 1 < len(pending) and pending[end+1] not in ' \t\r\n'):
+                break
+        if end > 0:
+            yield pending[:end+1]
+            pending = pending[end+1:]
+    if pending:
+        yield pending
+
+def parse_ma_file(path):
+    """
+    Scans the given Maya ASCII file without Maya, reading it a piece at a
+    time so files of any size take little memory. Returns a dict with the
+    "references" it makes, as a list of (path, deferred) tuples, and the
+    "files" its nodes depend on, for the node types and attributes in
+    MA_FILE_ATTRS. Paths are returned as written in the file.
+    """
+    attr_types = {}
+    for node_type, attrs in MA_FILE_ATTRS.iteritems():
+        for attr in attrs:
+            attr_types.setdefault(attr, set()).add(node_type)
+    node_types = {}
+    node_type = None
+    references = []
+    files = []
+    f = open(path, 'rb')
+    try:
+        for chunk in _ma_chunks(f):
+            chunk = '\n' + chunk
+            for start in _MA_STATEMENT_START.finditer(chunk):
+                match = _MA_STATEMENT.match(chunk, start.start() + 1)
+                if match == None:
+                    continue
+                if match.group('type') != None:
+                    node_type = match.group('type')
+                    name = _MA_NODE_NAME.search(match.group('create'))
+                    if name != None:
+                        node_types[name.group(1)] = node_type
+                elif match.group('select') != None:
+                    node_type = node_types.get(match.group('select').lstrip(':'))
+                elif match.group('attr') != None:
+                    attr = match.group('attr')
+                    attr_node_type = node_type
+                    if not attr.startswith('.'):
+                        node, attr = attr.split('.', 1)
+                        attr_node_type = node_types.get(node)
+                    if attr_node_type not in attr_types.get(attr.lstrip('.'), ()):
+                        continue
+                    value = ''.join(_ma_unquote(token) \
+                        for token in re.findall(_MA_STRING, match.group('value')))
+                    if value:
+                        files.append(value)
+                else:
+                    tokens = _MA_TOKEN.findall(match.group('file'))
+                    if not tokens or not tokens[-1].startswith('"'):
+                        continue
+                    if '-r' in tokens or '-rdi' in tokens:
+                        deferred = '-dr' in tokens and tokens[tokens.index('-dr') + 1] == '1'
+                        references.append((_ma_unquote(tokens[-1]), deferred))
+    finally:
+        f.close()
+    return {'references': references, 'files': files}
+
+def _parse_ma_worker(path):
+    # runs in the worker processes of scan_ma_references()
+    try:
+        return path, parse_ma_file(path), None
+    except (IOError, OSError) as e:
+        return path, None, str(e)
+
+#
+#   Levels of the reference tree with at least this many bytes of .ma files
+#   are parsed on a pool of MA_PARSE_PROCESSES processes; smaller ones
+#   aren't worth starting the processes for.
+#
+MA_PARSE_PROCESSES = 4
+MA_PARSE_POOL_MIN_BYTES = 64 * 1024 * 1024
+
+def _process_pool(processes):
+    # multiprocessing is only imported once a pool is actually needed
+    import multiprocessing
+    if sys.platform == 'win32' and cmds is not None and cmds is _MAYA_CMDS:
+        # Windows starts the workers by running sys.executable, which in
+        # Maya is Maya itself
+        multiprocessing.set_executable('%s.exe' % (_mayapy_path(),))
+    return multiprocessing.Pool(processes)
+
+#
+#   path -> ((mtime, size), parse_ma_file() result) for .ma files parsed
+#   before, so an unchanged file isn't parsed again.
+#
+_MA_PARSE_CACHE = {}
+
+def scan_ma_references(paths, resolve=None, processes=None, errors=None):
+    """
+    Scans the given Maya ASCII files, and the .ma files they reference,
+    recursively, for the files they depend on. Each level of the reference
+    tree is parsed in parallel, on a process pool if it's big enough.
+    resolve turns the paths written in a file into paths that can be
+    opened, e.g. PathResolver.resolve. .mb files can't be read without Maya
+    and are skipped.
+
+    Returns a dict of the "references" found, as written in the files that
+    make them, the "deferred_references" among them, which are saved
+    unloaded, and the "files" depended on. If an errors list is given, a
+    message for each file that couldn't be read is added to it.
+    """
+    if resolve == None:
+        resolve = lambda path: path
+    if processes == None:
+        processes = MA_PARSE_PROCESSES
+    references = []
+    deferred_references = []
+    files = []
+    seen = set()
+    level = list(paths)
+    while level:
+        to_parse = []
+        for path in level:
+            path = resolve(path)
+            if path in seen or not path.lower().endswith('.ma'):
+                continue
+            seen.add(path)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            to_parse.append((path, (st.st_mtime, st.st_size)))
+        results = {}
+        unparsed = []
+        for path, key in to_parse:
+            cached = _MA_PARSE_CACHE.get(path)
+            if cached != None and cached[0] == key:
+                results[path] = cached[1]
+            else:
+                unparsed.append(path)
+        if len(unparsed) > 1 and processes > 1 and \
+                sum(key[1] for path, key in to_parse if path in unparsed) >= MA_PARSE_POOL_MIN_BYTES:
+            pool = _process_pool(min(processes, len(unparsed)))
+            try:
+                parsed = pool.map(_parse_ma_worker, unparsed)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            parsed = [_parse_ma_worker(path) for path in unparsed]
+        keys = dict(to_parse)
+        for path, result, error in parsed:
+            if error != None:
+                if errors != None:
+                    errors.append('Could not scan %s: %s' % (path, error))
+                continue
+            _MA_PARSE_CACHE[path] = (keys[path], result)
+            results[path] = result
+        level = []
+        for path, key in to_parse:
+            if path not in results:
+                continue
+            for ref_path, deferred in results[path]['references']:
+                references.append(ref_path)
+                if deferred:
+                    deferred_references.append(ref_path)
+                level.append(ref_path)
+            files.extend(results[path]['files'])
+    return {'references': references,
+            'deferred_references': deferred_references,
+            'files': files}
+
+#
+#   Renderer scene files that nodes load at render time: Arnold .ass
+#   standins, also gzipped, VRay .vrscene files and mental ray .mi files.
+#   These name textures, caches and payload files of their own, which the
+#   render needs too.
+#
+PAYLOAD_EXTENSIONS = ('.ass', '.ass.gz', '.vrscene', '.mi')
+
+# .ass node parameters naming a file, one parameter per line
+_ASS_PARAM = re.compile(r'\n[ \t]*(?:filename|dso)[ \t]+"([^"\n]*)"')
+# .vrscene plugin parameters naming a file all end in "file"; searching for
+# that and checking the whole name is much faster than matching the names
+_VRSCENE_PARAM = re.compile(r'file[ \t]*=[ \t]*"([^"\n]*)"')
+_VRSCENE_INCLUDE = re.compile(r'#include[ \t]+"([^"\n]*)"')
+VRSCENE_FILE_PARAMS = ('file', 'ptex_file', 'ies_file')
+_MI_INCLUDE = re.compile(r'\$include[ \t]+"([^"\n]*)"')
+# color texture "name" "path"
+_MI_TEXTURE = re.compile(r'texture[ \t]+"[^"\n]*"[ \t]+"([^"\n]*)"')
+# the file of an assembly or a demand-loaded object
+_MI_FILE = re.compile(r'file[ \t]+"([^"\n]*)"')
+
+def _line_chunks(f):
+    # yields the file a piece at a time, each piece ending at a line end
+    pending = ''
+    while True:
+        data = f.read(MA_READ_SIZE)
+        if not data:
+            break
+        pending += data
+        end = pending.rfind('\n')
+        if end != -1:
+            yield pending[:end+1]
+            pending = pending[end+1:]
+    if pending:
+        yield pending
+
+def _name_before(chunk, pos):
+    # the part of an identifier that comes before pos
+    start = pos
+    while start > 0 and (chunk[start-1].isalnum() or chunk[start-1] == '_'):
+        start -= 1
+    return chunk[start:pos]
+
+def _ass_paths(chunk):
+    for match in _ASS_PARAM.finditer('\n' + chunk):
+        yield match.group(1)
+
+def _vrscene_paths(chunk):
+    for match in _VRSCENE_INCLUDE.finditer(chunk):
+        yield match.group(1)
+    for match in _VRSCENE_PARAM.finditer(chunk):
+        if _name_before(chunk, match.start()) + 'file' in VRSCENE_FILE_PARAMS:
+            yield match.group(1)
+
+def _mi_paths(chunk):
+    for match in _MI_INCLUDE.finditer(chunk):
+        yield match.group(1)
+    for match in _MI_TEXTURE.finditer(chunk):
+        if not _name_before(chunk, match.start()):
+            yield match.group(1)
+    for match in _MI_FILE.finditer(chunk):
+        if match.start() == 0 or chunk[match.start()-1] in ' \t\r\n':
+            yield match.group(1)
+
+_PAYLOAD_PARSERS = [('.ass', _ass_paths),
+                    ('.ass.gz', _ass_paths),
+                    ('.vrscene', _vrscene_paths),
+                    ('.mi', _mi_paths)]
+
+def is_payload_path(path):
+    """
+    Returns whether the given path is of a renderer scene file that
+    parse_payload_file() can scan.
+    """
+    return path.lower().endswith(PAYLOAD_EXTENSIONS)
+
+def parse_payload_file(path):
+    """
+    Scans the given .ass, .ass.gz, .vrscene or .mi file, a piece at a time,
+    for the files it names: textures, caches, procedurals and included
+    files. Returns their paths as written in the file.
+    """
+    lower = path.lower()
+    for extension, parser in _PAYLOAD_PARSERS:
+        if lower.endswith(extension):
+            break
+    else:
+        raise ValueError('Not a renderer scene file: %s' % (path,))
+    if lower.endswith('.gz'):
+        f = gzip.open(path, 'rb')
+    else:
+        f = open(path, 'rb')
+    files = []
+    try:
+        for chunk in _line_chunks(f):
+            files.extend(parser(chunk))
+    finally:
+        f.close()
+    return files
+
+#
+#   path -> ((mtime, size), parse_payload_file() result), so a payload file
+#   is only parsed again once it changes.
+#
+_PAYLOAD_CACHE = {}
+
+def scan_payload_files(paths, resolve=None, errors=None):
+    """
+    Returns the files named in the given renderer scene files and, in turn,
+    in the renderer scene files those name, as written. Paths of other
+    types, and files that don't exist, are skipped. resolve turns the paths
+    written in a file into paths that can be opened, e.g.
+    PathResolver.resolve. If an errors list is given, a message for each
+    file that couldn't be read is added to it.
+    """
+    if resolve == None:
+        resolve = lambda path: path
+    files = []
+    seen = set()
+    pending = list(paths)
+    while pending:
+        path = pending.pop()
+        if not is_payload_path(path):
+            continue
+        path = resolve(path)
+        if path in seen:
+            continue
+        seen.add(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        key = (st.st_mtime, st.st_size)
+        cached = _PAYLOAD_CACHE.get(path)
+        if cached != None and cached[0] == key:
+            named = cached[1]
+        else:
+            try:
+                named = parse_payload_file(path)
+            except (IOError, OSError, EOFError, zlib.error) as e:
+                if errors != None:
+                    errors.append('Could not scan %s: %s' % (path, e))
+                continue
+            _PAYLOAD_CACHE[path] = (key, named)
+        files.extend(named)
+        pending.extend(named)
+    return files
+
+def get_default_extension(renderer):
+    """Returns the filename prefix for the given renderer, either mental ray 
+       or maya software.
+    """
+    if renderer == "sw":
+        menu_grp = 'imageMenuMayaSW'
+    elif renderer == "mr":
+        menu_grp = 'imageMenuMentalRay'
+    else:
+        raise Exception('Invalid Renderer: %s' % renderer)
+    try:
+        val = cmds.optionMenuGrp(menu_grp, q=True, v=True)
+    except RuntimeError:
+        msg = 'Please open the Maya Render globals before submitting.'
+        raise Exception(msg)
+    else:
+        return val.split()[-1][1:-1]
+
+def _select_element_attrs(r_pass, attrs):
+    return [attr for attr in attrs if attr.startswith('vray_filename') or \
+        attr.startswith('vray_name') or attr.startswith('vray_explicit_name') or \
+        attr == 'vray_mtl_mtlselect']
+
+def get_render_element_name(r_pass, node_type=None):
+    """
+    Returns the name VRay uses for the output of the given render element,
+    or None if it doesn't have one. node_type is the element's node type,
+    if the caller knows it already.
+    """
+    vray_name = None
+    vray_explicit_name = None
+    vray_file_name = None
+    # the attributes are added per element, but are the same for all
+    # elements of a class
+    try:
+        element_class = _get_attr(r_pass, 'vrayClassType')
+    except:
+        element_class = None
+    if element_class:
+        if node_type == None:
+            node_type = cmds.nodeType(r_pass)
+        attr_names = attr_schema(node_type, r_pass, _select_element_attrs,
+                                 variant=element_class)
+    else:
+        attr_names = _select_element_attrs(r_pass, cmds.listAttr(r_pass))
+    for attr_name in attr_names:
+        if attr_name.startswith('vray_filename'):
+            vray_file_name = _get_attr(r_pass, attr_name)
+        elif attr_name.startswith('vray_name'):
+            vray_name = _get_attr(r_pass, attr_name)
+        elif attr_name.startswith('vray_explicit_name'):
+            vray_explicit_name = _get_attr(r_pass, attr_name)
+    if vray_file_name != None and vray_file_name != "":
+        final_name = vray_file_name
+    elif vray_explicit_name != None and vray_explicit_name != "":
+        final_name = vray_explicit_name
+    elif vray_name != None and vray_name != "":
+        final_name = vray_name
+    else:
+        return None
+    # special case for Material Select elements - these are named based on the material
+    # they are connected to.
+    if 'vray_mtl_mtlselect' in attr_names:
+        connections = cmds.listConnections('%s.vray_mtl_mtlselect' % (r_pass,))
+        if connections:
+            final_name += '_%s' % (str(connections[0]),)
+    return final_name
+
+class LayerOverrideError(Exception):
+    """
+    Raised when a layer's value for an attribute can't be worked out
+    without switching to that layer.
+    """
+
+#
+#   render layer -> { overridden plug: plug holding the layer's value }
+#
+_LAYER_ADJUSTMENTS = {}
+
+def _layer_adjustments(layer):
+    """
+    Returns a dict of the plugs overridden on the given render layer, mapped
+    to the adjustments[].value plugs that hold the layer's values for them.
+    """
+    if layer not in _LAYER_ADJUSTMENTS:
+        adjustments = {}
+        conns = cmds.listConnections('%s.adjustments' % (layer,), plugs=True,
+                                     connections=True, destination=False) or []
+        for i in range(0, len(conns), 2):
+            adj_plug, attr_plug = conns[i], conns[i+1]
+            if adj_plug.endswith('.plug'):
+                adjustments[attr_plug] = '%s.value' % (adj_plug[:-len('.plug')],)
+        _LAYER_ADJUSTMENTS[layer] = adjustments
+    return _LAYER_ADJUSTMENTS[layer]
+
+def get_layer_attr(layer, plug, cur_layer):
+    """
+    Returns the value the given plug has in the given render layer, without
+    switching render layers, by reading the layers' adjustments directly.
+    cur_layer is the currently active render layer.
+
+    Raises LayerOverrideError if the value can't be resolved that way.
+    """
+    if layer == cur_layer:
+        return cmds.getAttr(plug)
+    adjustments = _layer_adjustments(layer)
+    if plug in adjustments:
+        return cmds.getAttr(adjustments[plug])
+    # the layer uses the master value. that's the live value unless the
+    # current layer overrides it, in which case Maya keeps the master value
+    # in the defaultRenderLayer's adjustments.
+    if plug not in _layer_adjustments(cur_layer):
+        return cmds.getAttr(plug)
+    if layer != 'defaultRenderLayer':
+        default_adjustments = _layer_adjustments('defaultRenderLayer')
+        if plug in default_adjustments:
+            return cmds.getAttr(default_adjustments[plug])
+    raise LayerOverrideError('Could not resolve %s in layer %s' % (plug, layer))
+
+def _collect_layer_info(renderer, index, get_attr):
+    layer_info = {}
+
+    # get list of active render passes
+    layer_info['render_passes'] = []
+    if renderer == "vray" and get_attr('vraySettings.imageFormatStr') != 'exr (multichannel)' and get_attr('vraySettings.relements_enableall') != False: 
+        pass_list = index.ls('VRayRenderElement')
+        pass_list += index.ls('VRayRenderElementSet')
+        for r_pass in pass_list:
+            if get_attr('%s.enabled' % (r_pass,)) == True:
+                layer_info['render_passes'].append(r_pass)
+
+    # get prefix information
+    if renderer == 'vray':
+        node = 'vraySettings'
+        attribute = 'fileNamePrefix'
+    elif renderer in ('sw', 'mr', 'arnold'):
+        node = 'defaultRenderGlobals'
+        attribute = 'imageFilePrefix'
+    try:
+        layer_prefix = get_attr('%s.%s' % (node, attribute))
+        layer_info['prefix'] = layer_prefix
+    except LayerOverrideError:
+        raise
+    except Exception:
+        layer_info['prefix'] = ''
+
+    return layer_info
+
+#
+#   (render layer, renderer) -> info collected by collect_layer_info(). The
+#   info for a layer stays valid until SCAN_CACHE sees a change to the layer
+#   itself or to one of the _LAYER_SHARED_NODES every layer's info depends on.
+#
+LAYER_INFO = {}
+_LAYER_SHARED_NODES = set()
+
+def collect_layer_info(layer, renderer, index=None):
+    """
+    Returns the render passes and file prefix used by the given render layer.
+    The values are read from the layer overrides where possible; only if that
+    fails does this fall back to switching to the layer and back, which makes
+    Maya re-evaluate the scene.
+    """
+    if index is None:
+        index = SceneIndex()
+    cur_layer = cmds.editRenderLayerGlobals(q=True, currentRenderLayer=True)
+    try:
+        layer_info = _collect_layer_info(renderer, index,
+                                         lambda plug: get_layer_attr(layer, plug, cur_layer))
+    except LayerOverrideError:
+        cmds.editRenderLayerGlobals(currentRenderLayer=layer)
+        try:
+            layer_info = _collect_layer_info(renderer, index, cmds.getAttr)
+        finally:
+            cmds.editRenderLayerGlobals(currentRenderLayer=cur_layer)
+
+    # watch the nodes the info was read from - only now, so that switching
+    # layers above doesn't count as a change to them.
+    shared_nodes = [cur_layer, 'defaultRenderLayer']
+    if renderer == 'vray':
+        shared_nodes.append('vraySettings')
+        shared_nodes += index.ls('VRayRenderElement')
+        shared_nodes += index.ls('VRayRenderElementSet')
+    else:
+        shared_nodes.append('defaultRenderGlobals')
+    _LAYER_SHARED_NODES.update(shared_nodes)
+    SCAN_CACHE.track([layer] + shared_nodes)
+    return layer_info
+
+def clear_layer_info():
+    LAYER_INFO.clear()
+    _LAYER_ADJUSTMENTS.clear()
+    _LAYER_SHARED_NODES.clear()
+
+def invalidate_layer_info(node):
+    """
+    Drops the render layer info that depends on the given node: everything
+    if it's one of the nodes all layers share, otherwise just the info for
+    the layer of that name, if any.
+    """
+    if node in _LAYER_SHARED_NODES:
+        clear_layer_info()
+        return
+    _LAYER_ADJUSTMENTS.pop(node, None)
+    for key in [key for key in LAYER_INFO if key[0] == node]:
+        del LAYER_INFO[key]
+
+def get_layer_override(layer, renderer, field, index=None):
+    key = (layer, renderer)
+    if key not in LAYER_INFO:
+        LAYER_INFO[key] = collect_layer_info(layer, renderer, index=index)
+    return LAYER_INFO[key][field]
+
+def get_maya_version():
+    api_version = mel.eval("about -api")
+    maya_version = 2013 # default
+    # 2012
+    if api_version in range( 201215, 201299 ):
+        maya_version = 2012
+    # 2013
+    elif api_version in range( 201300, 201349 ):
+        maya_version = 2013
+    # 2013.5
+    elif api_version in range( 201350, 201399 ):
+        maya_version = 2013.5
+    # 2014
+    elif api_version in range( 201400, 201499 ):
+        maya_version = 2014
+    else:
+        version_split = str(cmds.fileInfo( "version", query=True )[0]).split(" ")
+        if len(version_split) > 1:
+            maya_version = " ".join(version_split[:-1]).strip()
+        else:
+            maya_version = " ".join(version_split).strip()
+    return str(maya_version)
+
+#
+#   Scene events after which nothing cached about the scene can be trusted.
+#
+_SCENE_REPLACED_MESSAGES = ('kBeforeNew', 'kBeforeOpen', 'kBeforeImport',
+                            'kBeforeCreateReference', 'kBeforeRemoveReference',
+                            'kBeforeImportReference', 'kBeforeLoadReference',
+                            'kBeforeUnloadReference')
+
+#
+#   Scene messages that mean node types may have changed their attributes,
+#   so the attribute schemas are stale.
+#
+_PLUGIN_CHANGED_MESSAGES = ('kAfterPluginLoad', 'kAfterPluginUnload')
+
+#
+#   Attribute changed messages that mean a node's cached values are stale.
+#
+_NODE_CHANGED_MESSAGES = ('kAttributeSet', 'kConnectionMade', 'kConnectionBroken',
+                          'kAttributeAdded', 'kAttributeRemoved', 'kAttributeRenamed',
+                          'kAttributeArrayAdded', 'kAttributeArrayRemoved')
+
+#
+#   Adding or removing nodes of these types changes the info of every layer.
+#
+_LAYER_NODE_TYPES = ('renderLayer', 'VRayRenderElement', 'VRayRenderElementSet')
+
+class SceneCache(object):
+    """
+    Keeps what a scene scan read from Maya - node attribute values, render
+    layer info and reference paths - for the next scan, and uses Maya's DG
+    messages to drop only the parts the user has changed in between.
+
+    Every node something was read from is watched with an attribute changed
+    callback, plus a dirty plug callback if it has incoming connections, as
+    its values may then change without being set. The first change to a node
+    forgets everything read from it and removes its callbacks again, so a
+    node costs nothing more until it's read again. Nodes being added,
+    removed, renamed or reparented bump the generation, which tells the
+    SceneIndex to re-read the scene. Opening a new scene or loading a
+    reference drops everything.
+
+    Loading or unloading a plugin drops the attribute schemas.
+
+    Changes can only be tracked in an interactive Maya session working on
+    Maya's own scene; anywhere else nothing is kept from one scan to the next.
+    """
+    def __init__(self):
+        self.generation = 0
+        self.references = {}
+        self._om = None
+        self._scene_callbacks = []
+        self._dg_callbacks = []
+        self._node_callbacks = {}
+        self._node_names = {}
+        self._tracked = {}
+        self._untracked = set()
+
+    def start(self):
+        """
+        Installs the scene-wide callbacks if they aren't already. Returns
+        whether changes to the scene are being tracked.
+        """
+        if cmds is None or cmds is not _MAYA_CMDS:
+            return False
+        if self._dg_callbacks:
+            return True
+        if self._om is None:
+            try:
+                import maya.api.OpenMaya as om
+            except ImportError:
+                return False
+            if cmds.about(batch=True):
+                # a batch session scans its scene once
+                return False
+            self._om = om
+            for name in _SCENE_REPLACED_MESSAGES:
+                self._scene_callbacks.append(om.MSceneMessage.addCallback(
+                    getattr(om.MSceneMessage, name), self._scene_replaced))
+            for name in _PLUGIN_CHANGED_MESSAGES:
+                self._scene_callbacks.append(om.MSceneMessage.addStringArrayCallback(
+                    getattr(om.MSceneMessage, name), self._plugin_changed))
+            self._change_mask = 0
+            for name in _NODE_CHANGED_MESSAGES:
+                self._change_mask |= getattr(om.MNodeMessage, name)
+        om = self._om
+        self._dg_callbacks = [
+            om.MDGMessage.addNodeAddedCallback(self._node_added, 'dependNode'),
+            om.MDGMessage.addNodeRemovedCallback(self._node_removed, 'dependNode'),
+            om.MNodeMessage.addNameChangedCallback(om.MObject(), self._node_moved),
+            om.MDagMessage.addParentAddedCallback(self._parent_changed),
+            om.MDagMessage.addParentRemovedCallback(self._parent_changed)]
+        # whatever happened before now wasn't seen
+        self.reset()
+        return True
+
+    def stop(self):
+        """
+        Removes all callbacks and drops everything cached.
+        """
+        self._remove_dg_callbacks()
+        self.reset()
+        if self._om is not None:
+            self._om.MMessage.removeCallbacks(self._scene_callbacks)
+            self._scene_callbacks = []
+            self._om = None
+
+    def _remove_dg_callbacks(self):
+        if self._dg_callbacks:
+            self._om.MMessage.removeCallbacks(self._dg_callbacks)
+            self._dg_callbacks = []
+
+    def reset(self):
+        """
+        Drops everything cached about the scene.
+        """
+        self.generation += 1
+        if self._node_callbacks:
+            ids = []
+            for node_ids in self._node_callbacks.itervalues():
+                ids += node_ids
+            self._om.MMessage.removeCallbacks(ids)
+        self._node_callbacks = {}
+        self._node_names = {}
+        self._tracked = {}
+        self._untracked = set()
+        self.references = {}
+        clear_attr_cache()
+        clear_uv_info()
+        clear_layer_info()
+
+    def is_current(self, generation):
+        """
+        Returns whether no nodes have been added, removed, renamed or
+        reparented since the given generation.
+        """
+        return bool(self._dg_callbacks) and generation == self.generation
+
+    def begin_scan(self):
+        """
+        Called at the start of a scan. Unless changes to the scene are being
+        tracked, drops everything cached by the last one.
+        """
+        if self.start():
+            self._forget_untracked()
+        else:
+            self.reset()
+
+    def end_scan(self):
+        """
+        Called at the end of a scan. Drops whatever was read from nodes that
+        aren't being watched for changes.
+        """
+        if not self._dg_callbacks:
+            clear_attr_cache()
+        self._forget_untracked()
+
+    def _forget_untracked(self):
+        for name in self._untracked:
+            self._forget_name(name)
+        self._untracked = set()
+
+    def track(self, nodes):
+        """
+        Watches the given nodes for changes, if changes are being tracked.
+        """
+        if not self._dg_callbacks:
+            return
+        om = self._om
+        sel_list = None
+        for node in nodes:
+            if node in self._tracked:
+                continue
+            if sel_list is None:
+                sel_list = om.MSelectionList()
+            try:
+                sel_list.clear()
+                sel_list.add(node)
+                obj = sel_list.getDependNode(0)
+            except RuntimeError:
+                self._untracked.add(node)
+                continue
+            key = om.MObjectHandle(obj).hashCode()
+            self._tracked[node] = key
+            self._node_names.setdefault(key, set()).add(node)
+            if key in self._node_callbacks:
+                continue
+            ids = [om.MNodeMessage.addAttributeChangedCallback(obj, self._attribute_changed)]
+            for plug in om.MFnDependencyNode(obj).getConnections():
+                if plug.isDestination:
+                    ids.append(om.MNodeMessage.addNodeDirtyPlugCallback(obj, self._plug_dirtied))
+                    break
+            self._node_callbacks[key] = ids
+
+    def _forget_name(self, name):
+        _ATTR_CACHE.pop(name, None)
+        self.references.pop(name, None)
+        forget_uv_info(name)
+        invalidate_layer_info(name)
+
+    def _forget(self, key):
+        """
+        Drops everything read from the node with the given hash code and
+        stops watching it.
+        """
+        ids = self._node_callbacks.pop(key, None)
+        if ids:
+            self._om.MMessage.removeCallbacks(ids)
+        for name in self._node_names.pop(key, ()):
+            self._tracked.pop(name, None)
+            self._forget_name(name)
+
+    def _node_key(self, node):
+        return self._om.MObjectHandle(node).hashCode()
+
+    def _scene_replaced(self, client_data):
+        # the DG callbacks would fire for every node coming and going, so
+        # they're only reinstalled by the next scan
+        self._remove_dg_callbacks()
+        self.reset()
+
+    def _plugin_changed(self, strings, client_data):
+        clear_attr_schemas()
+
+    def _node_added(self, node, client_data):
+        self.generation += 1
+        if self._om.MFnDependencyNode(node).typeName in _LAYER_NODE_TYPES:
+            clear_layer_info()
+
+    def _node_removed(self, node, client_data):
+        self.generation += 1
+        self._forget(self._node_key(node))
+        if self._om.MFnDependencyNode(node).typeName in _LAYER_NODE_TYPES:
+            clear_layer_info()
+
+    def _node_moved(self, node, prev_name, client_data):
+        # the names of a DAG node's descendants change along with it
+        self.generation += 1
+        if node.hasFn(self._om.MFn.kDagNode) and self._om.MFnDagNode(node).childCount():
+            self.reset()
+        else:
+            self._forget(self._node_key(node))
+
+    def _parent_changed(self, child, parent, client_data):
+        self._node_moved(child.node(), None, client_data)
+
+    def _attribute_changed(self, msg, plug, other_plug, client_data):
+        if msg & self._change_mask:
+            self._forget(self._node_key(plug.node()))
+
+    def _plug_dirtied(self, node, plug, client_data):
+        self._forget(self._node_key(node))
+
+SCAN_CACHE = SceneCache()
+
+class MayaZyncException(Exception):
+    """
+    This exception issues a Maya warning.
+    """
+    def __init__(self, msg, *args, **kwargs):
+        cmds.warning(msg)
+        super(MayaZyncException, self).__init__(msg, *args, **kwargs)
+
+#
+#   Set this environment variable to also capture a cProfile of each
+#   submit, saved next to its timing report.
+#
+PROFILE_ENV_VAR = 'ZYNC_PROFILE'
+
+#
+#   How many submits' timings the report next to each scene keeps.
+#
+TIMING_REPORT_LIMIT = 100
+
+_TIMING = threading.local()
+
+@contextmanager
+def _no_span():
+    yield None
+
+def timing_span(name):
+    """
+    Returns a context manager that times the enclosed block as a span of the
+    SubmitTimer active on this thread. Does nothing if there is none. The
+    span dict, or None, is bound by "with ... as".
+    """
+    timer = getattr(_TIMING, 'timer', None)
+    if timer is None:
+        return _no_span()
+    return timer.span(name)
+
+class SubmitTimer(object):
+    """
+    Times the stages of a submit as a tree of named spans, from building the
+    params to ZYNC.submit_job() returning, and saves them as a JSON report
+    next to the scene so submit times can be compared across scenes and
+    releases.
+
+    Spans are opened with timing_span() by code running on a thread the
+    timer has been activated on. A span opened inside another on the same
+    thread becomes its child; a thread's outermost spans hang off the root.
+    If PROFILE_ENV_VAR is set, each thread's outermost spans also run under
+    cProfile and the combined stats are saved along with the report.
+    """
+    def __init__(self, name='submit', started=None):
+        if started == None:
+            started = time.time()
+        self.report = {'name': name,
+                       'started': started,
+                       'seconds': None,
+                       'spans': []}
+        self._start = started
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._profiling = bool(os.environ.get(PROFILE_ENV_VAR))
+        self._profiles = []
+
+    @contextmanager
+    def activate(self):
+        """
+        Makes this the timer timing_span() uses on the current thread for
+        the duration of the block.
+        """
+        previous = getattr(_TIMING, 'timer', None)
+        _TIMING.timer = self
+        try:
+            yield self
+        finally:
+            _TIMING.timer = previous
+
+    @contextmanager
+    def span(self, name):
+        """
+        Times the enclosed block as a span of this timer.
+        """
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        if stack:
+            parent = stack[-1]
+        else:
+            parent = self.report
+        node = {'name': name, 'seconds': None, 'spans': []}
+        with self._lock:
+            parent['spans'].append(node)
+        profile = None
+        if self._profiling and not stack:
+            import cProfile
+            profile = cProfile.Profile()
+            with self._lock:
+                self._profiles.append(profile)
+            profile.enable()
+        stack.append(node)
+        start = time.time()
+        try:
+            yield node
+        except:
+            node['error'] = str(sys.exc_info()[1])
+            raise
+        finally:
+            node['seconds'] = time.time() - start
+            stack.pop()
+            if profile is not None:
+                profile.disable()
+
+    def add_span(self, node):
+        """
+        Adds a span recorded elsewhere, e.g. by a mayapy worker, to the root.
+        """
+        with self._lock:
+            self.report['spans'].append(node)
+
+    def finish(self, status):
+        """
+        Stops the clock on the whole submit, which ended with the given
+        status, e.g. "submitted" or "failed".
+        """
+        self.report['seconds'] = time.time() - self._start
+        self.report['status'] = status
+
+    def save(self, scene_path):
+        """
+        Appends the report to <scene>.zync_timing.json next to the given
+        scene, keeping the last TIMING_REPORT_LIMIT reports. If profiling,
+        the stats go to <scene>.zync_profile, overwriting the last ones.
+        Returns the report path, or None if it couldn't be written.
+        """
+        base, ext = os.path.splitext(scene_path)
+        if not base or not os.path.isdir(os.path.dirname(os.path.abspath(scene_path))):
+            return None
+        self.report['scene'] = scene_path
+        report_path = '%s.zync_timing.json' % (base,)
+        try:
+            if self._profiles:
+                import pstats
+                stats = pstats.Stats(self._profiles[0])
+                for profile in self._profiles[1:]:
+                    stats.add(profile)
+                self.report['profile'] = '%s.zync_profile' % (base,)
+                stats.dump_stats(self.report['profile'])
+            reports = []
+            if os.path.exists(report_path):
+                f = open(report_path)
+                try:
+                    reports = json.load(f)
+                except ValueError:
+                    reports = []
+                finally:
+                    f.close()
+            reports.append(self.report)
+            f = open(report_path, 'w')
+            try:
+                json.dump(reports[-TIMING_REPORT_LIMIT:], f, indent=1)
+            finally:
+                f.close()
+        except (IOError, OSError) as e:
+            print 'ZYNC: could not save the timing report: %s' % (e,)
+            return None
+        return report_path
+
+class SceneScanner(object):
+    """
+    Collects the information ZYNC needs about the current scene: the files it
+    uses, its references, render layers and passes, bake sets, plugins and
+    versions. It has no UI of its own, so it can be used from a batch mayapy
+    session as well as from the submit dialog.
+    """
+    def __init__(self, index=None):
+        if index is None:
+            index = SceneIndex()
+        self.index = index
+        # file handler timings of the last scan, see get_scene_files()
+        self.profile = {}
+        # messages for the files the last scan couldn't read
+        self.errors = []
+
+    def render_layers(self):
+        """
+        Returns the render layers in the root namespace.
+        """
+        return [x for x in self.index.ls('renderLayer') if not ':' in x]
+
+    def bake_sets(self):
+        """
+        Returns the sorted list of VRay bake sets, excluding the default one.
+        """
+        bake_sets = [bake_set for bake_set in self.index.ls('VRayBakeOptions') \
+            if bake_set != 'vrayDefaultBakeOptions']
+        bake_sets.sort()
+        return bake_sets
+
+    def cameras(self):
+        """
+        Returns the transforms of all renderable cameras.
+        """
+        cam_parents = [cmds.listRelatives(x, ap=True)[-1] for x in self.index.ls('camera')]
+        return [cam for cam in cam_parents if cmds.getAttr(cam + '.renderable') == True]
+
+    def get_bake_set_uvs(self, bake_set):
+        mesh = bake_set_mesh(bake_set)
+        if mesh is None:
+            return None
+        uv_info = mesh_uv_info(mesh)
+        if uv_info is None:
+            return None
+        return uv_info['bbox']
+
+    def get_bake_set_tiles(self, bake_set):
+        """
+        Returns the sorted list of UDIM tiles the given bake set's mesh has
+        UVs in.
+        """
+        mesh = bake_set_mesh(bake_set)
+        if mesh is None:
+            return []
+        uv_info = mesh_uv_info(mesh)
+        if uv_info is None:
+            return []
+        return uv_info['tiles']
+
+    def get_bake_set_map(self, bake_set):
+        return cmds.getAttr('%s.bakeChannel' % (bake_set,))
+
+    def get_bake_set_shape(self, bake_set):
+        transforms = cmds.listConnections(bake_set)
+        if transforms == None or len(transforms) == 0:
+            return None
+        transform = transforms[0]
+        shape_nodes = cmds.listRelatives(transform)
+        if shape_nodes == None or len(shape_nodes) == 0:
+            return None
+        return shape_nodes[0]
+
+    def get_bake_set_output_path(self, bake_set):
+        out_path = cmds.getAttr('%s.outputTexturePath' % (bake_set,))
+        out_path = out_path.replace('\\', '/')
+        if out_path[0] == '/' or out_path[1] == ':':
+            full_path = out_path
+        else:
+            full_path = proj_dir().replace('\\', '/')
+            if full_path[-1] != '/':
+                full_path += '/'
+            full_path += out_path
+        return full_path
+
+    def log_profile(self, file_count):
+        """
+        Prints a one line summary of the last scan's file handler timings,
+        slowest handlers first.
+        """
+        nodes = sum(entry['nodes'] for entry in self.profile.itervalues())
+        seconds = sum(entry['seconds'] for entry in self.profile.itervalues())
+        slowest = sorted(self.profile.iteritems(), key=lambda item: -item[1]['seconds'])
+        print 'ZYNC scan: %d files from %d nodes in %.2fs (%s)' % (file_count, nodes, seconds,
+            ', '.join('%s %.2fs/%d nodes/%d paths' % (node_type, entry['seconds'],
+                entry['nodes'], entry['paths']) for node_type, entry in slowest[:5]))
+
+    def get_scene_info(self, renderer, job_subtype='render', layers=None, bake_sets=None,
+                       project_dir=None, compact_sequences=None):
+        """
+        Returns scene info for the current scene.
+        We use this to allow ZYNC to skip the file checks.
+
+        layers and bake_sets are the render layers or bake sets selected for
+        the job, depending on job_subtype. Relative file paths are resolved
+        against project_dir, the workspace root dir by default. Sequences
+        are listed as range descriptors if compact_sequences is set,
+        COMPACT_SEQUENCES by default.
+        """
+
+        with timing_span('scene_index'):
+            SCAN_CACHE.begin_scan()
+            self.index.update()
+        self.errors = []
+
+        if job_subtype == 'bake':
+            selected_bake_sets = bake_sets or []
+            selected_layers = []
+        else:
+            selected_layers = layers or []
+            selected_bake_sets = []
+
+        #
+        #   Detect a list of referenced files. We must use ls() instead of file(q=True, r=True)
+        #   because the latter will only detect references one level down, not nested references.
+        #
+        if project_dir == None:
+            project_dir = proj_dir()
+
+        with timing_span('references'):
+            references = []
+            unresolved_references = []
+            unloaded = []
+            for ref_node in self.index.ls('reference'):
+                if ref_node not in SCAN_CACHE.references:
+                    ref_files = []
+                    try:
+                        ref_files.append(cmds.referenceQuery(ref_node, filename=True))
+                        ref_files.append(cmds.referenceQuery(ref_node, filename=True, unresolvedName=True))
+                    except:
+                        pass
+                    SCAN_CACHE.references[ref_node] = ref_files
+                    SCAN_CACHE.track([ref_node])
+                ref_files = SCAN_CACHE.references[ref_node]
+                if len(ref_files) > 0:
+                    references.append(ref_files[0])
+                if len(ref_files) > 1:
+                    unresolved_references.append(ref_files[1])
+                # loading or unloading a reference doesn't touch its node, so
+                # this can't be cached
+                try:
+                    if ref_files and not cmds.referenceQuery(ref_node, isLoaded=True):
+                        unloaded.append(ref_files[0])
+                except RuntimeError:
+                    pass
+
+        #
+        #   Unloaded references aren't in the scene, and neither are the files
+        #   they depend on or the references nested in them, so parse the ones
+        #   saved as Maya ASCII for those. Nested references saved unloaded
+        #   are listed as deferred_references as well.
+        #
+        with timing_span('unloaded_references') as span:
+            unloaded_files = []
+            deferred_references = []
+            if unloaded:
+                resolver = PathResolver(project_dir)
+                nested = scan_ma_references(unloaded, resolve=resolver.resolve,
+                                            errors=self.errors)
+                unloaded_files = nested['files']
+                for ref_path in nested['references']:
+                    resolved = resolver.resolve(ref_path)
+                    if resolved not in references:
+                        references.append(resolved)
+                        unresolved_references.append(ref_path)
+                for ref_path in nested['deferred_references']:
+                    resolved = resolver.resolve(ref_path)
+                    if resolved not in deferred_references:
+                        deferred_references.append(resolved)
+                if span != None:
+                    span['references'] = len(unloaded)
+                    span['files'] = len(unloaded_files)
+
+        with timing_span('render_passes'):
+            render_passes = {}
+            if renderer == 'vray' and cmds.getAttr('vraySettings.imageFormatStr') != 'exr (multichannel)':
+                pass_list = []
+                pass_types = {}
+                for pass_type in ('VRayRenderElement', 'VRayRenderElementSet'):
+                    for r_pass in self.index.ls(pass_type):
+                        pass_list.append(r_pass)
+                        pass_types.setdefault(r_pass, pass_type)
+                if len(pass_list) > 0:
+                    prefetch_attrs(pass_list, ['vrayClassType'])
+                    # element names don't change between layers, so look each one
+                    # up only once
+                    element_names = {}
+                    for layer in selected_layers:
+                        render_passes[layer] = []
+                        enabled_passes = set(get_layer_override(layer, renderer, 'render_passes', index=self.index))
+                        for r_pass in pass_list:
+                            if r_pass in enabled_passes:
+                                if r_pass not in element_names:
+                                    element_names[r_pass] = get_render_element_name(r_pass, pass_types[r_pass])
+                                if element_names[r_pass] != None:
+                                    render_passes[layer].append(element_names[r_pass])
+
+        with timing_span('layer_prefixes'):
+            layer_prefixes = dict()
+            for layer in selected_layers:
+                layer_prefix = get_layer_override(layer, renderer, 'prefix', index=self.index)
+                if layer_prefix != None:
+                    layer_prefixes[layer] = layer_prefix
+
+        with timing_span('bake_sets'):
+            bake_set_info = dict()
+            for bake_set in selected_bake_sets:
+                bake_set_info[bake_set] = {}
+                bake_set_info[bake_set]['uvs'] = self.get_bake_set_uvs(bake_set)
+                bake_set_info[bake_set]['tiles'] = self.get_bake_set_tiles(bake_set)
+                bake_set_info[bake_set]['map'] = self.get_bake_set_map(bake_set)
+                bake_set_info[bake_set]['shape'] = self.get_bake_set_shape(bake_set)
+                bake_set_info[bake_set]['output_path'] = self.get_bake_set_output_path(bake_set)
+
+        with timing_span('render_settings'):
+            if renderer == 'vray':
+                extension = cmds.getAttr('vraySettings.imageFormatStr')
+                if extension == None:
+                    extension = 'png'
+                padding = int(cmds.getAttr('vraySettings.fileNamePadding'))
+            elif renderer == 'mr':
+                extension = cmds.getAttr('defaultRenderGlobals.imfPluginKey')
+                if not extension:
+                    extension = get_default_extension(renderer)
+                padding = int(cmds.getAttr('defaultRenderGlobals.extensionPadding'))
+            elif renderer == 'arnold':
+                extension = cmds.getAttr('defaultRenderGlobals.imfPluginKey')
+                padding = int(cmds.getAttr('defaultRenderGlobals.extensionPadding'))
+            global_prefix = get_layer_override('defaultRenderLayer', renderer, 'prefix', index=self.index)
+
+            extension = extension[:3]
+
+            file_prefix = [global_prefix]
+            file_prefix.append(layer_prefixes)
+        with timing_span('scene_files') as span:
+            self.profile = {}
+            expander = SequenceExpander(compact=compact_sequences)
+            files = list(expander.expand_paths(
+                unique_paths(itertools.chain(get_scene_files(self.index, profile=self.profile,
+                                                             errors=self.errors),
+                                             unloaded_files),
+                             root=project_dir)))
+            file_ranges = [path for path in files if path in expander.ranges]
+            self.log_profile(len(files))
+            if span != None:
+                span['handlers'] = self.profile
+
+        with timing_span('plugins'):
+            plugins = []
+            plugin_list = cmds.pluginInfo( query=True, pluginsInUse=True )
+            for i in range( 0, len(plugin_list), 2): 
+                plugins.append( str(plugin_list[i]) )
+
+            # detect MentalCore
+            mentalcore_used = False
+            try:
+                mc_nodes = self.index.ls('core_globals')
+                if len(mc_nodes) == 0:
+                    mentalcore_used = False
+                else:
+                    mc_node = mc_nodes[0]
+                    if cmds.getAttr('%s.ec' % (mc_node,)) == True:
+                        mentalcore_used = True
+                    else:
+                        mentalcore_used = False
+            except:
+                mentalcore_used = False
+            if mentalcore_used:
+                plugins.append('mentalcore')
+
+            # detect use of cache files
+            if len(self.index.ls('cacheFile')) > 0:
+                plugins.append('cache')
+
+            version = get_maya_version() 
+
+            vray_version = ''
+            if renderer == 'vray':
+                try:
+                    vray_version = str(cmds.pluginInfo('vrayformaya', query=True, version=True)) 
+                except:
+                    raise Exception('Could not detect Vray version. This is required to render Vray jobs. Do you have the Vray plugin loaded?')
+
+            arnold_version = ''
+            if renderer == 'arnold':
+                try:
+                    arnold_version = str(cmds.pluginInfo('mtoa', query=True, version=True)) 
+                except:
+                    raise Exception('Could not detect Arnold version. This is required to render Arnold jobs. Do you have the Arnold plugin loaded?')
+
+        scene_info = {'files': files,
+                      'render_layers': self.render_layers(),
+                      'render_passes': render_passes,
+                      'references': references,
+                      'unresolved_references': unresolved_references,
+                      'deferred_references': deferred_references,
+                      'file_prefix': file_prefix,
+                      'padding': padding,
+                      'extension': extension,
+                      'plugins': plugins,
+                      'version': version,
+                      'arnold_version': arnold_version,
+                      'vray_version': vray_version,
+                      'bake_sets': bake_set_info}
+        if expander.compact:
+            scene_info['file_ranges'] = file_ranges
+        return scene_info
+
+#
+#   Per-frame render times of previous jobs, used to plan the chunks of new
+#   ones if PLAN_CHUNKS is set in config_maya.py. Nothing in the plugin
+#   knows how long frames took, so times are recorded with
+#   record_render_times(), or from a CSV of frame,seconds lines with
+#
+#       python zync_maya.py record_times <scene> <layer> <times.csv>
+#
+#   Each newly recorded time is averaged with the one before it with this
+#   weight, so the history follows changes to the shot.
+#
+PLAN_CHUNKS = False
+RENDER_HISTORY_PATH = os.path.join(os.path.expanduser('~'), '.zync', 'maya_render_history.json')
+RENDER_HISTORY_WEIGHT = 0.5
+
+#
+#   Estimated seconds each chunk spends on starting up - launching Maya and
+#   loading the scene - on top of rendering its frames.
+#
+CHUNK_OVERHEAD = 60.0
+
+#
+#   Number of chunk cost targets plan_chunks() tries.
+#
+CHUNK_PLAN_TARGETS = 40
+
+_SCENE_VERSION = re.compile(r'[._-]?v\d+$', re.I)
+
+class RenderHistory(object):
+    """
+    A local record of how many seconds each frame of previous jobs took to
+    render, per scene and render layer. Versions of a scene share their
+    history, e.g. shot_v003.ma and shot_v004.ma. Times are added with
+    record(), e.g. by a pipeline script reading them from the farm's logs.
+    """
+    def __init__(self, path=RENDER_HISTORY_PATH):
+        self.path = path
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def _key(self, scene_path, layer):
+        scene_name = os.path.splitext(os.path.basename(scene_path.replace('\\', '/')))[0]
+        return '%s|%s' % (_SCENE_VERSION.sub('', scene_name), layer)
+
+    def _load(self):
+        if self._entries != None:
+            return
+        self._entries = {}
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            f = open(self.path)
+            try:
+                self._entries = json.load(f)
+            finally:
+                f.close()
+        except (IOError, ValueError):
+            self._entries = {}
+
+    def record(self, scene_path, layer, frame_times):
+        """
+        Records the given dict of frame -> seconds it took to render, for
+        the given scene and render layer.
+        """
+        with self._lock:
+            self._load()
+            times = self._entries.setdefault(self._key(scene_path, layer), {})
+            for frame, seconds in frame_times.iteritems():
+                frame = str(int(frame))
+                if frame in times:
+                    seconds = (1.0 - RENDER_HISTORY_WEIGHT) * times[frame] + \
+                        RENDER_HISTORY_WEIGHT * seconds
+                times[frame] = float(seconds)
+            if self.path is not None:
+                _write_json(self.path, self._entries)
+
+    def frame_costs(self, scene_path, layers, frames):
+        """
+        Returns a dict of frame -> estimated seconds to render it in all of
+        the given layers, for each of the given frames. Frames without a
+        recorded time are interpolated from the nearest ones that have one.
+        Returns None unless every layer has a history.
+        """
+        with self._lock:
+            self._load()
+            histories = [self._entries.get(self._key(scene_path, layer)) for layer in layers]
+        if not histories or not all(histories):
+            return None
+        costs = dict.fromkeys(frames, 0.0)
+        for times in histories:
+            known = sorted((int(frame), seconds) for frame, seconds in times.iteritems())
+            known_frames = [frame for frame, seconds in known]
+            for frame in frames:
+                i = bisect.bisect_left(known_frames, frame)
+                if i < len(known) and known[i][0] == frame:
+                    cost = known[i][1]
+                elif i == 0:
+                    cost = known[0][1]
+                elif i == len(known):
+                    cost = known[-1][1]
+                else:
+                    (before, before_cost), (after, after_cost) = known[i-1], known[i]
+                    cost = before_cost + (after_cost - before_cost) * \
+                        (frame - before) / float(after - before)
+                costs[frame] += cost
+        return costs
+
+RENDER_HISTORY = RenderHistory()
+
+def record_render_times(scene_path, layer, frame_times):
+    """
+    Records how long frames of the given scene and layer took to render,
+    as a dict of frame -> seconds, for planning the chunks of later jobs.
+    """
+    RENDER_HISTORY.record(scene_path, layer, frame_times)
+
+def _record_times_main(scene_path, layer, csv_path):
+    """
+    Records the render times in the given CSV file of frame,seconds lines,
+    e.g. exported from the farm, for the given scene and layer. Lines that
+    aren't a frame and a time, like a header, are skipped.
+    """
+    frame_times = {}
+    f = open(csv_path)
+    try:
+        for row in csv.reader(f):
+            try:
+                frame_times[int(row[0])] = float(row[1])
+            except (IndexError, ValueError):
+                continue
+    finally:
+        f.close()
+    record_render_times(scene_path, layer, frame_times)
+    print 'ZYNC: recorded %d frame times for %s, layer %s' % (len(frame_times), scene_path, layer)
+    return 0
+
+def chunk_planning_enabled():
+    """
+    Returns whether jobs are sent a plan of their chunks, i.e. whether
+    PLAN_CHUNKS is set in config_maya.py.
+    """
+    _load_zync()
+    return bool(PLAN_CHUNKS)
+
+def _makespan(chunk_costs, instances):
+    """
+    Returns the estimated seconds until all chunks of the given costs are
+    rendered on the given number of instances, with each chunk going to
+    the instance that frees up first, heaviest chunks first.
+    """
+    loads = [0.0] * max(1, instances)
+    for cost in sorted(chunk_costs, reverse=True):
+        heapq.heappush(loads, heapq.heappop(loads) + cost)
+    return max(loads)
+
+def _cut_chunks(frames, costs, target, max_size):
+    """
+    Splits the frames into runs of up to max_size frames, each costing no
+    more than target where possible. Returns a list of (frames, cost).
+    """
+    chunks = []
+    chunk = []
+    chunk_cost = CHUNK_OVERHEAD
+    for frame in frames:
+        cost = costs[frame]
+        if chunk and (len(chunk) == max_size or chunk_cost + cost > target):
+            chunks.append((chunk, chunk_cost))
+            chunk = []
+            chunk_cost = CHUNK_OVERHEAD
+        chunk.append(frame)
+        chunk_cost += cost
+    if chunk:
+        chunks.append((chunk, chunk_cost))
+    return chunks
+
+class ChunkPlan(object):
+    """
+    The chunks a job's frames are split into, from plan_chunks().
+
+    chunks is a list of (frames, estimated seconds) tuples, heaviest first,
+    and makespan the estimated seconds until they're all rendered.
+    chunk_size is the fixed chunk size with the shortest estimate, with
+    fixed_makespan that estimate, for where only a fixed size can be used.
+    """
+    def __init__(self, chunks, makespan, chunk_size, fixed_makespan):
+        self.chunks = chunks
+        self.makespan = makespan
+        self.chunk_size = chunk_size
+        self.fixed_makespan = fixed_makespan
+
+    def frame_lists(self):
+        """
+        Returns the chunks as a string of frame lists separated by ";".
+        """
+        return ';'.join(format_frame_list(frames, steps=True) for frames, cost in self.chunks)
+
+def plan_chunks(frames, costs, instances, max_size):
+    """
+    Splits the given frames into chunks of consecutive frames of up to
+    max_size frames whose estimated render times, from the given dict of
+    frame -> seconds, balance out over the given number of instances:
+    frames that are expensive to render go in smaller chunks, cheap ones in
+    bigger chunks. Returns a ChunkPlan.
+    """
+    frames = sorted(frames)
+    max_size = max(1, max_size)
+    best = None
+    for size in range(1, max_size + 1):
+        chunks = [(frames[i:i+size], CHUNK_OVERHEAD + sum(costs[frame] for frame in frames[i:i+size])) \
+            for i in range(0, len(frames), size)]
+        makespan = _makespan([cost for chunk, cost in chunks], instances)
+        # fewer, bigger chunks when it's a tie
+        if best == None or makespan <= best[0]:
+            best = (makespan, size, chunks)
+    fixed_makespan, chunk_size, fixed_chunks = best
+
+    # try chunk cost targets from one frame per chunk up to all frames in one
+    low = CHUNK_OVERHEAD + max(costs[frame] for frame in frames)
+    high = CHUNK_OVERHEAD + sum(costs[frame] for frame in frames)
+    best = (fixed_makespan, len(fixed_chunks), fixed_chunks)
+    for i in range(CHUNK_PLAN_TARGETS):
+        target = low * (high / low) ** (i / float(CHUNK_PLAN_TARGETS - 1))
+        chunks = _cut_chunks(frames, costs, target, max_size)
+        makespan = _makespan([cost for chunk, cost in chunks], instances)
+        if (makespan, len(chunks)) < best[:2]:
+            best = (makespan, len(chunks), chunks)
+    makespan, count, chunks = best
+    chunks = sorted(chunks, key=lambda chunk: -chunk[1])
+    return ChunkPlan(chunks, makespan, chunk_size, fixed_makespan)
+
+def plan_render_chunks(scene_path, layers, frames, instances, max_size):
+    """
+    Returns a ChunkPlan for rendering the given frames of the given layers
+    of the scene, based on the render times recorded for earlier jobs, or
+    None if there are none for some layer.
+    """
+    if not frames:
+        return None
+    costs = RENDER_HISTORY.frame_costs(scene_path, layers, frames)
+    if costs == None:
+        return None
+    return plan_chunks(frames, costs, instances, max_size)
+
+#
+#   How the scene info is sent with a job. None sends it as it is; 'compact'
+#   sends encode_scene_info() of it instead, which is a small fraction of
+#   the size for scenes with many files. The server tells the two apart by
+#   the "format" key, which plain scene info doesn't have.
+#
+SCENE_INFO_ENCODING = None
+SCENE_INFO_FORMAT = 'zync-maya-compact-1'
+SCENE_INFO_PATH_KEYS = ('files', 'file_ranges', 'changed_files', 'references',
+                        'unresolved_references', 'deferred_references')
+SCENE_INFO_COMPRESSION_LEVEL = 6
+
+def _common_prefix_length(a, b):
+    # binary search on slices, which is much faster in Python than
+    # comparing a character at a time
+    low, high = 0, min(len(a), len(b))
+    if a[:high] == b[:high]:
+        return high
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+_NON_ASCII = re.compile(r'[\x80-\xff]')
+
+def _unicode_path(path):
+    # paths read from files come as UTF-8 byte strings. front coding them as
+    # bytes could split a character between the shared prefix and the rest,
+    # which JSON can't hold, so it's done on characters. ASCII byte strings
+    # compare and slice the same either way, so those are left alone.
+    if isinstance(path, str) and _NON_ASCII.search(path):
+        return path.decode('utf-8')
+    return path
+
+def _iter_compact_scene_info(scene_info):
+    """
+    Yields the compact JSON form of the given scene info, a piece at a time.
+    """
+    info = dict(scene_info)
+    yield '{"paths": {'
+    first = True
+    for key in SCENE_INFO_PATH_KEYS:
+        if not isinstance(info.get(key), list):
+            continue
+        paths = info.pop(key)
+        yield '%s%s: [' % (first and ' ' or ', ', json.dumps(key))
+        first = False
+        separator = ''
+        previous = ''
+        for batch in iter_chunks(paths, 1000):
+            entries = []
+            for path in batch:
+                path = _unicode_path(path)
+                shared = _common_prefix_length(previous, path)
+                entries.append([shared, path[shared:]])
+                previous = path
+            yield separator + json.dumps(entries)[1:-1]
+            separator = ', '
+        yield ']'
+    yield '}, "info": %s}' % (json.dumps(info),)
+
+def encode_scene_info(scene_info, level=None):
+    """
+    Returns the given scene info in the compact form the server recognizes
+    by its "format", SCENE_INFO_FORMAT. Its "data" is base64 of zlib
+    compressed JSON with:
+
+    paths - the path lists among SCENE_INFO_PATH_KEYS, front coded: each
+            path as [n, rest], where n is the number of leading characters
+            (not bytes) it shares with the path before it in the list and
+            rest is the remainder. Scene files come in runs from the same
+            dirs, so most of each path is shared;
+    info  - everything else in the scene info, as it is.
+
+    The path lists are compressed a batch at a time as their JSON is
+    generated, so only their compressed form is ever held in full; the rest
+    of the scene info is small and is dumped in one go. decode_scene_info()
+    reverses this, with the paths coming back as unicode.
+    """
+    if level == None:
+        level = SCENE_INFO_COMPRESSION_LEVEL
+    compressor = zlib.compressobj(level)
+    data = []
+    for piece in _iter_compact_scene_info(scene_info):
+        if isinstance(piece, unicode):
+            piece = piece.encode('utf-8')
+        data.append(compressor.compress(piece))
+    data.append(compressor.flush())
+    return {'format': SCENE_INFO_FORMAT, 'data': base64.b64encode(''.join(data))}
+
+def decode_scene_info(payload):
+    """
+    Returns the scene info encoded by encode_scene_info(), or payload itself
+    if it's plain scene info.
+    """
+    if payload.get('format') != SCENE_INFO_FORMAT:
+        return payload
+    compact = json.loads(zlib.decompress(base64.b64decode(payload['data'])))
+    scene_info = compact['info']
+    for key, entries in compact['paths'].iteritems():
+        paths = []
+        previous = ''
+        for shared, rest in entries:
+            previous = previous[:shared] + rest
+            paths.append(previous)
+        scene_info[key] = paths
+    return scene_info
+
+class JobBuilder(object):
+    """
+    Builds and submits ZYNC jobs for the current scene from a dict of submit
+    options, without any UI. The options use the same names as the params
+    ZYNC.submit_job() takes; see default_options() for the full set. The
+    submit dialog is a client of this, as is submit_scene().
+    """
+    def __init__(self, scanner=None):
+        self._scanner = scanner
+
+    @property
+    def scanner(self):
+        # created on first use, so a JobBuilder that only submits already
+        # scanned jobs doesn't need a scene
+        if self._scanner is None:
+            self._scanner = SceneScanner()
+        return self._scanner
+
+    def default_options(self):
+        """
+        Returns the default submit options for the current scene. These
+        match the initial state of the submit dialog, except that all
+        renderable layers in the root namespace are selected.
+        """
+        scene_name = cmds.file(q=True, loc=True)
+        if scene_name == 'unknown':
+            raise MayaZyncException('Please save your scene before launching a job.')
+
+        project_response = get_project_name(scene_name)
+        if project_response["code"] != 0:
+            raise MayaZyncException(project_response["response"])
+
+        renderer = current_renderer()
+        cameras = self.scanner.cameras()
+        layers = [layer for layer in self.scanner.render_layers() \
+            if cmds.getAttr('%s.renderable' % (layer,)) == True]
+
+        return {'proj_name': project_response["response"],
+                'upload_only': 0,
+                'start_new_slots': 1,
+                'skip_check': 0,
+                'notify_complete': 0,
+                'project': proj_dir().rstrip('/'),
+                'out_path': output_dir(),
+                'ignore_plugin_errors': 0,
+                'renderer': renderer,
+                'job_subtype': 'render',
+                'priority': 50,
+                'num_instances': 1,
+                'instance_type': zync.DEFAULT_INSTANCE_TYPE,
+                'frange': frame_range(),
+                'step': int(cmds.getAttr('defaultRenderGlobals.byFrameStep')),
+                'chunk_size': 10,
+                'camera': cameras[0] if cameras else '',
+                'xres': int(cmds.getAttr('defaultResolution.width')),
+                'yres': int(cmds.getAttr('defaultResolution.height')),
+                'vray_nightly': 0,
+                'use_standalone': int(renderer == 'mr'),
+                'distributed': 0,
+                'layers': layers,
+                'bake_sets': self.scanner.bake_sets()}
+
+    def get_render_params(self, options):
+        """
+        Returns the dict of render params for the given submit options,
+        checking that they make sense together.
+        """
+        params = dict()
+
+        params['proj_name'] = options['proj_name']
+        parent = options.get('parent_id')
+        if parent != None and str(parent).strip() != "":
+            params['parent_id'] = str(parent).strip()
+        for key in ('upload_only', 'start_new_slots', 'skip_check', 'notify_complete',
+                    'ignore_plugin_errors', 'priority', 'num_instances', 'step',
+                    'chunk_size', 'xres', 'yres'):
+            params[key] = int(options[key])
+        for key in ('project', 'out_path', 'frange', 'camera'):
+            params[key] = options[key]
+
+        if options['renderer'] in get_maya_renderers():
+            params['renderer'] = options['renderer']
+        else:
+            params['renderer'] = zync.MAYA_DEFAULT_RENDERER
+
+        params['job_subtype'] = options['job_subtype'].lower()
+
+        if options['instance_type'] in get_instance_types():
+            params['instance_type'] = options['instance_type']
+        else:
+            params['instance_type'] = zync.DEFAULT_INSTANCE_TYPE
+
+        use_standalone = int(options.get('use_standalone', 0))
+        if params['upload_only'] == 0 and params['renderer'] == 'vray':
+            params['vray_nightly'] = int(options.get('vray_nightly', 0))
+            if params['vray_nightly'] == 1:
+                vray_version = str(cmds.pluginInfo('vrayformaya', query=True, version=True))
+                if vray_version.startswith('3.0'):
+                    cmds.error('Nightly Builds are not currently supported for Vray 3.0.')
+            params['use_vrscene'] = use_standalone
+            if params['use_vrscene'] == 1 and params['job_subtype'] == 'bake':
+                cmds.error('Vray Standalone is not currently supported for Bake jobs.')
+            params['distributed'] = int(options.get('distributed', 0))
+            if params['distributed'] == 1 and params['job_subtype'] == 'bake':
+                cmds.error('Distributed Rendering is not currently supported for Bake jobs.')
+            params['use_mi'] = 0
+            params['use_ass'] = 0
+        elif params['upload_only'] == 0 and params['renderer'] == 'mr':
+            params['vray_nightly'] = 0
+            params['use_vrscene'] = 0
+            params['distributed'] = 0
+            params['use_mi'] = use_standalone
+            params['use_ass'] = 0
+        elif params['upload_only'] == 0 and params['renderer'] == 'arnold':
+            params['vray_nightly'] = 0
+            params['use_vrscene'] = 0
+            params['distributed'] = 0
+            params['use_mi'] = 0
+            params['use_ass'] = use_standalone
+        else:
+            params['vray_nightly'] = 0
+            params['use_vrscene'] = 0
+            params['distributed'] = 0
+            params['use_mi'] = 0
+
+        if params['upload_only'] == 1:
+            params['layers'] = None
+            params['bake_sets'] = None
+        elif params['job_subtype'] == 'bake':
+            bake_sets = options.get('bake_sets')
+            if not bake_sets:
+                msg = 'Please select bake set(s).'
+                raise MayaZyncException(msg)
+            params['bake_sets'] = ','.join(bake_sets)
+            params['layers'] = None
+        else:
+            layers = options.get('layers')
+            if not layers:
+                msg = 'Please select layer(s) to render.'
+                raise MayaZyncException(msg)
+            params['layers'] = ','.join(layers)
+            params['bake_sets'] = None
+
+            try:
+                frames = parse_frame_list(params['frange'], params['step'])
+            except ValueError as e:
+                raise MayaZyncException(str(e))
+            # balance the chunks if there are render times from earlier
+            # jobs. the chunk size is kept for servers that ignore the plan.
+            if chunk_planning_enabled():
+                plan = plan_render_chunks(cmds.file(q=True, loc=True), layers, frames,
+                                          params['num_instances'], params['chunk_size'])
+                if plan != None:
+                    params['chunks'] = plan.frame_lists()
+
+        return params
+
+    def get_scene_info(self, params, options):
+        """
+        Scans the scene for the job described by the given params.
+        """
+        return self.scanner.get_scene_info(params['renderer'],
+                                           job_subtype=params['job_subtype'],
+                                           layers=options.get('layers'),
+                                           bake_sets=options.get('bake_sets'),
+                                           project_dir=params['project'],
+                                           compact_sequences=compact_sequences_enabled())
+
+    def build(self, options):
+        """
+        Returns the full params for ZYNC.submit_job(), including the
+        scene info, for the given submit options.
+        """
+        with timing_span('get_render_params'):
+            params = self.get_render_params(options)
+        with timing_span('get_scene_info'):
+            params['scene_info'] = self.get_scene_info(params, options)
+        return params
 
-LAYER_INFO = {}
-def collect_layer_info(layer, renderer):
-    cur_layer = cmds.editRenderLayerGlobals(q=True, currentRenderLayer=True)
-    cmds.editRenderLayerGlobals(currentRenderLayer=layer)
+    def check_files(self, params):
+        """
+        Stats the scene files of the given params. Returns the
+        (found, missing) pair from stat_scene_files().
+        """
+        with timing_span('check_files'):
+            return stat_scene_files(params['scene_info']['files'], root=params['project'])
 
-    layer_info = {}
+    def login(self, username, password):
+        if username == '' or password == '':
+            msg = 'Please enter a ZYNC username and password.'
+            raise MayaZyncException(msg)
+        try:
+            with timing_span('login'):
+                ZYNC.login(username=username, password=password)
+        except zync.ZyncAuthenticationError as e:
+            msg = 'ZYNC Username Authentication Failed'
+            raise MayaZyncException(msg)
 
-    # get list of active render passes
-    layer_info['render_passes'] = []
-    if renderer == "vray" and cmds.getAttr('vraySettings.imageFormatStr') != 'exr (multichannel)' and cmds.getAttr('vraySettings.relements_enableall') != False: 
-        pass_list = cmds.ls(type='VRayRenderElement')
-        pass_list += cmds.ls(type='VRayRenderElementSet')
-        for r_pass in pass_list:
-            if cmds.getAttr('%s.enabled' % (r_pass,)) == True:
-                layer_info['render_passes'].append(r_pass)
+    def submit(self, scene_path, params, found, progress=None):
+        """
+        Submits the job to ZYNC. found is the list of (path, size, mtime)
+        from check_files(), used to mark the files that changed since the
+        last submit. If upload_enabled(), only those changed files are
+        uploaded, along with the scene, as the rest went with an earlier
+        submit, and the job is submitted with "files_uploaded" set so ZYNC
+        doesn't transfer them again; progress is passed on to
+        Uploader.upload(). The scene info
+        is sent encoded as SCENE_INFO_ENCODING says. Raises
+        zync.ZyncPreflightError if ZYNC rejects the job, or UploadError.
+        """
+        manifest = FileManifest()
+        try:
+            with timing_span('changed_files'):
+                changed = manifest.changed_files(found)
+            params['scene_info']['changed_files'] = changed
+            if upload_enabled():
+                with timing_span('upload') as span:
+                    changed = set(changed)
+                    to_upload = [entry for entry in found if entry[0] in changed]
+                    st = os.stat(scene_path)
+                    sent = Uploader().upload(to_upload + [(scene_path, st.st_size, st.st_mtime)],
+                                             progress=progress)
+                    if span != None:
+                        span['bytes'] = sent
+                # the files are on the upload server, so ZYNC mustn't
+                # transfer them again
+                params['files_uploaded'] = 1
+            # upload_enabled() has loaded the config
+            job_params = params
+            if SCENE_INFO_ENCODING == 'compact':
+                with timing_span('encode_scene_info'):
+                    job_params = dict(params)
+                    job_params['scene_info'] = encode_scene_info(params['scene_info'])
+            with timing_span('submit_job'):
+                ZYNC.submit_job('maya', scene_path, params=job_params)
+            with timing_span('mark_submitted'):
+                manifest.mark_submitted(found)
+            # the job may have created a new project
+            invalidate_metadata('project_list')
+        finally:
+            manifest.close()
+
+def submit_scene(username, password, **options):
+    """
+    Submits the currently open scene to ZYNC without the submit dialog, e.g.
+    from a mayapy batch script. Submit options not given take their values
+    from JobBuilder.default_options(). Missing scene files are reported as
+    warnings. Returns the params that were submitted.
+    """
+    scene_path = cmds.file(q=True, loc=True)
+    timer = SubmitTimer()
+    status = 'failed'
+    try:
+        with timer.activate():
+            builder = JobBuilder()
+            job_options = builder.default_options()
+            job_options.update(options)
+            if job_options['job_subtype'].lower() == 'bake' and 'frange' not in options:
+                job_options['frange'] = udim_range(bake_sets=job_options['bake_sets'])
+            params = builder.build(job_options)
+            for error in builder.scanner.errors:
+                cmds.warning(error)
+            found, missing = builder.check_files(params)
+            for path in missing:
+                cmds.warning('Scene file not found: %s' % (path,))
+            builder.login(username, password)
+            builder.submit(scene_path, params, found)
+        status = 'submitted'
+    finally:
+        timer.finish(status)
+        timer.save(scene_path)
+    return params
+
+def _mayapy_path():
+    """
+    Returns the path to the mayapy interpreter of the current Maya install.
+    """
+    if 'MAYA_LOCATION' in os.environ:
+        return os.path.join(os.environ['MAYA_LOCATION'], 'bin', 'mayapy')
+    return 'mayapy'
 
-    # get prefix information
-    if renderer == 'vray':
-        node = 'vraySettings'
-        attribute = 'fileNamePrefix'
-    elif renderer in ('sw', 'mr', 'arnold'):
-        node = 'defaultRenderGlobals'
-        attribute = 'imageFilePrefix'
+def scan_scene_file(scene_path, options=None, mayapy=None):
+    """
+    Opens the given scene in a separate mayapy process and scans it for
+    submission. Returns a dict with the scene path, the job params and the
+    found/missing files, or with an "error" key if the scan failed.
+    """
+    if mayapy is None:
+        mayapy = _mayapy_path()
+    script = '%s.py' % (os.path.splitext(os.path.abspath(__file__))[0],)
+    out_fd, out_path = tempfile.mkstemp(suffix='.json', prefix='zync_scan_')
+    os.close(out_fd)
     try:
-        layer_prefix = cmds.getAttr('%s.%s' % (node, attribute))
-        layer_info['prefix'] = layer_prefix
+        try:
+            proc = subprocess.Popen([mayapy, script, 'scan', scene_path, out_path,
+                                     json.dumps(options or {})],
+                                    stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            output = proc.communicate()[0]
+        except (OSError, IOError) as e:
+            # e.g. mayapy not found; the other scenes of the batch still
+            # get their scans
+            return {'scene_path': scene_path,
+                    'error': 'Could not run %s: %s' % (mayapy, e)}
+        try:
+            f = open(out_path)
+            try:
+                result = json.load(f)
+            finally:
+                f.close()
+        except (IOError, ValueError):
+            result = {'scene_path': scene_path,
+                      'error': 'mayapy exited with code %d:\n%s' % (proc.returncode, output)}
+    finally:
+        try:
+            os.remove(out_path)
+        except OSError:
+            pass
+    if 'found' in result:
+        result['found'] = [tuple(x) for x in result['found']]
+    return result
+
+def _scan_main(scene_path, out_path, options_json):
+    """
+    Entry point of the mayapy worker processes started by scan_scene_file().
+    """
+    result = {'scene_path': scene_path}
+    timer = SubmitTimer('scan')
+    try:
+        with timer.activate():
+            with timing_span('open_scene'):
+                import maya.standalone
+                maya.standalone.initialize(name='python')
+                cmds.file(scene_path, open=True, force=True)
+            builder = JobBuilder()
+            options = builder.default_options()
+            options.update(json.loads(options_json))
+            result['params'] = builder.build(options)
+            result['scan_errors'] = builder.scanner.errors
+            result['found'], result['missing'] = builder.check_files(result['params'])
     except Exception:
-        layer_info['prefix'] = ''
+        result['error'] = traceback.format_exc()
+    timer.finish('failed' if 'error' in result else 'scanned')
+    result['timing'] = timer.report
+    f = open(out_path, 'w')
+    try:
+        json.dump(result, f)
+    finally:
+        f.close()
+    return int('error' in result)
 
-    cmds.editRenderLayerGlobals(currentRenderLayer=cur_layer)
-    return layer_info
+def batch_submit(scene_paths, username, password, options=None, workers=2, mayapy=None):
+    """
+    Submits a list of .ma/.mb scenes to ZYNC. Each scene is opened and
+    scanned in its own mayapy process, up to workers at a time, while the
+    scenes already scanned are submitted from this process over a single
+    ZYNC login, so scanning one scene overlaps with uploading the previous.
+    options are submit options applied to every scene on top of the
+    scene's defaults.
+
+    Returns a report dict with a "scenes" list (scene path, status, error,
+    missing files, files that couldn't be scanned, scan and submit times) and the overall "elapsed" time and
+    "scenes_per_minute".
+    """
+    start = time.time()
+    ZYNC.login(username=username, password=password)
+    builder = JobBuilder()
+    pool = _thread_pool(max(1, workers))
+    report = {'scenes': []}
+    try:
+        def scan(scene_path):
+            scan_start = time.time()
+            result = scan_scene_file(scene_path, options=options, mayapy=mayapy)
+            result['scan_time'] = time.time() - scan_start
+            return result
+
+        for result in pool.imap_unordered(scan, scene_paths):
+            entry = {'scene_path': result['scene_path'],
+                     'scan_time': result['scan_time'],
+                     'submit_time': 0.0,
+                     'missing': result.get('missing', []),
+                     'scan_errors': result.get('scan_errors', []),
+                     'error': result.get('error')}
+            timer = SubmitTimer(started=time.time() - result['scan_time'])
+            if 'timing' in result:
+                timer.add_span(result['timing'])
+            if entry['error'] is None:
+                submit_start = time.time()
+                try:
+                    with timer.activate():
+                        builder.submit(result['scene_path'], result['params'], result['found'])
+                except Exception as e:
+                    entry['error'] = str(e)
+                entry['submit_time'] = time.time() - submit_start
+            if entry['error'] is None:
+                entry['status'] = 'submitted'
+            else:
+                entry['status'] = 'failed'
+            timer.finish(entry['status'])
+            timer.save(result['scene_path'])
+            print 'ZYNC batch: %s %s (scan %.1fs, submit %.1fs)' % (entry['status'],
+                entry['scene_path'], entry['scan_time'], entry['submit_time'])
+            report['scenes'].append(entry)
+    finally:
+        pool.close()
+        pool.join()
+
+    report['elapsed'] = time.time() - start
+    submitted = len([x for x in report['scenes'] if x['status'] == 'submitted'])
+    report['scenes_per_minute'] = submitted * 60.0 / max(report['elapsed'], 0.001)
+    print 'ZYNC batch: %d of %d scenes submitted in %.1fs (%.2f scenes/min)' % (submitted,
+        len(report['scenes']), report['elapsed'], report['scenes_per_minute'])
+    return report
+
+def _execute_deferred(func, *args):
+    """
+    Runs func on Maya's main thread once it is idle. Outside of Maya it is
+    simply called.
+    """
+    if cmds is _MAYA_CMDS and cmds is not None:
+        maya.utils.executeDeferred(func, *args)
+    else:
+        func(*args)
 
-def clear_layer_info():
-    global LAYER_INFO
-    LAYER_INFO = {}
+class SubmitTask(object):
+    """
+    Runs the network half of a dialog submit - checking the scene files,
+    logging in and submitting the job - on background threads, so Maya
+    stays responsive. Progress is shown in a progress window from which the
+    artist can cancel. Anything that needs Maya runs back on the main thread
+    through maya.utils.executeDeferred().
+
+    Cancelling takes effect between steps; a login or job submission that
+    has already started runs to completion.
+    """
+    def __init__(self, window, scene_path, params, username, password, timer=None):
+        self.window = window
+        self.scene_path = scene_path
+        self.params = params
+        self.username = username
+        self.password = password
+        if timer is None:
+            timer = SubmitTimer()
+        self.timer = timer
+        self.status = 'Checking scene files...'
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+        self.found = []
+        self.progress_shown = False
+
+    def start(self):
+        """
+        Starts the submit. Must be called from the main thread.
+        """
+        self._show_progress()
+        self._run_in_background(self._check_files)
+        ticker = threading.Thread(target=self._tick)
+        ticker.daemon = True
+        ticker.start()
+
+    def _run_in_background(self, func):
+        def run():
+            with self.timer.activate():
+                func()
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+
+    def _tick(self):
+        while not self.done.is_set():
+            self.done.wait(0.25)
+            _execute_deferred(self._poll_progress)
+
+    def _show_progress(self):
+        cmds.progressWindow(title='ZYNC Submit', status=self.status,
+                            isInterruptable=True)
+        self.progress_shown = True
+
+    def _hide_progress(self):
+        if self.progress_shown:
+            self.progress_shown = False
+            cmds.progressWindow(endProgress=True)
+
+    def _poll_progress(self):
+        # the window is down while the files are being confirmed
+        if self.done.is_set() or not self.progress_shown:
+            return
+        if cmds.progressWindow(q=True, isCancelled=True):
+            self.cancelled.set()
+            self.status = 'Cancelling...'
+        cmds.progressWindow(e=True, status=self.status)
+
+    def _finish(self, title=None, message=None, status='failed'):
+        self.done.set()
+        self._hide_progress()
+        self.timer.finish(status)
+        self.timer.save(self.scene_path)
+        if message != None:
+            cmds.confirmDialog(title=title,
+                               message=message,
+                               button='OK',
+                               defaultButton='OK')
 
-def get_layer_override(layer, renderer, field):
-    global LAYER_INFO
-    if layer not in LAYER_INFO:
-        LAYER_INFO[layer] = collect_layer_info(layer, renderer)
-    return LAYER_INFO[layer][field]
+    def _check_files(self):
+        try:
+            found, missing = self.window.builder.check_files(self.params)
+        except Exception as e:
+            _execute_deferred(self._finish, 'Submit Failed', str(e))
+            return
+        _execute_deferred(self._files_checked, found, missing)
 
-def get_maya_version():
-    api_version = maya.mel.eval("about -api")
-    maya_version = 2013 # default
-    # 2012
-    if api_version in range( 201215, 201299 ):
-        maya_version = 2012
-    # 2013
-    elif api_version in range( 201300, 201349 ):
-        maya_version = 2013
-    # 2013.5
-    elif api_version in range( 201350, 201399 ):
-        maya_version = 2013.5
-    # 2014
-    elif api_version in range( 201400, 201499 ):
-        maya_version = 2014
-    else:
-        version_split = str(cmds.fileInfo( "version", query=True )[0]).split(" ")
-        if len(version_split) > 1:
-            maya_version = " ".join(version_split[:-1]).strip()
+    def _files_checked(self, found, missing):
+        if self.cancelled.is_set():
+            self._finish(status='cancelled')
+            return
+        self.found = found
+        if self.params['skip_check'] == 0 and (missing or \
+                [x for x in found if x[1] >= LARGE_FILE_SIZE]):
+            self._hide_progress()
+            try:
+                with self.timer.span('confirm_files'):
+                    self.window.check_scene_files(found, missing)
+            except MayaZyncException:
+                self._finish(status='cancelled')
+                return
+            self._show_progress()
+        self.status = 'Logging in to ZYNC...'
+        self._run_in_background(self._submit)
+
+    def _upload_progress(self, sent, total):
+        if sent < total:
+            self.status = 'Uploading files, %d%% done...' % (100 * sent // total,)
         else:
-            maya_version = " ".join(version_split).strip()
-    return str(maya_version)
+            self.status = 'Submitting job...'
 
-class MayaZyncException(Exception):
-    """
-    This exception issues a Maya warning.
-    """
-    def __init__(self, msg, *args, **kwargs):
-        cmds.warning(msg)
-        super(MayaZyncException, self).__init__(msg, *args, **kwargs)
+    def _submit(self):
+        try:
+            try:
+                with timing_span('login'):
+                    ZYNC.login(username=self.username, password=self.password)
+            except zync.ZyncAuthenticationError:
+                _execute_deferred(self._finish, 'Submit Failed',
+                                  'ZYNC Username Authentication Failed')
+                return
+            if self.cancelled.is_set():
+                _execute_deferred(self._finish, None, None, 'cancelled')
+                return
+            self.status = 'Uploading and submitting job...'
+            self.window.builder.submit(self.scene_path, self.params, self.found,
+                                       progress=self._upload_progress)
+        except zync.ZyncPreflightError as e:
+            _execute_deferred(self._finish, 'Preflight Check Failed', str(e))
+        except Exception as e:
+            _execute_deferred(self._finish, 'Submit Failed', str(e))
+        else:
+            _execute_deferred(self._finish, 'Success', 'Job submitted to ZYNC.', 'submitted')
 
 class SubmitWindow(object):
     """
@@ -464,7 +4389,8 @@ class SubmitWindow(object):
         if scene_name == 'unknown':
             cmds.error( 'Please save your script before launching a job.' ) 
 
-        project_response = ZYNC.get_project_name( scene_name )
+        prefetch_metadata(scene_name)
+        project_response = get_project_name(scene_name)
         if project_response["code"] != 0:
             cmds.error( project_response["response"] )
         self.new_project_name = project_response["response"]
@@ -477,22 +4403,15 @@ class SubmitWindow(object):
         if self.project[-1] == "/":
             self.project = self.project[:-1]
 			
-        # set output directory. if the workspace has a mapping for "images", use that.
-        # otherwise default to the images/ folder.
-        self.output_dir = cmds.workspace(q=True, rd=True)
-        if self.output_dir[-1] != '/':
-            self.output_dir += '/'
-        images_rule = cmds.workspace(fileRuleEntry='images')
-        if images_rule != None and images_rule.strip() != '':
-            if images_rule[0] == '/' or images_rule[1] == ':':
-                self.output_dir = images_rule
-            else:
-                self.output_dir += images_rule
-        else:
-            self.output_dir += 'images'
+        self.output_dir = output_dir()
+
+        self.scanner = SceneScanner()
+        self.scene_index = self.scanner.index
+        self.builder = JobBuilder(self.scanner)
 
         self.frange = frame_range()
-        self.udim_range = udim_range()
+        # only needed for bake jobs, see change_job_type()
+        self.udim_range = None
         self.frame_step = cmds.getAttr('defaultRenderGlobals.byFrameStep')
         self.chunk_size = 10
         self.upload_only = 0
@@ -504,7 +4423,7 @@ class SubmitWindow(object):
         self.distributed = 0
         self.ignore_plugin_errors = 0
 
-        mi_setting = ZYNC.get_config( var="USE_MI" )
+        mi_setting = get_use_mi_setting()
         if mi_setting in ( None, "", 1, "1" ):
             self.force_mi = True
         else:
@@ -693,6 +4612,8 @@ class SubmitWindow(object):
         elif job_type == 'bake':
             cmds.textField('output_dir', e=True, en=False)
             cmds.text('frange_label', e=True, label='UDIM Range:')
+            if self.udim_range is None:
+                self.udim_range = udim_range(self.scene_index)
             cmds.textField('frange', e=True, tx=self.udim_range)
             cmds.optionMenu('camera', e=True, en=False)
             cmds.text('layers_label', e=True, label='Bake Sets:')
@@ -745,42 +4666,19 @@ class SubmitWindow(object):
         #        raise Exception(msg)
         pass
 
-    def get_bake_set_uvs(self, bake_set):
-        conn_list = cmds.listConnections(bake_set)
-        if conn_list == None or len(conn_list) == 0:
-            return None
-        return cmds.polyEvaluate(conn_list[0], b2=True)
-
-    def get_bake_set_map(self, bake_set):
-        return cmds.getAttr('%s.bakeChannel' % (bake_set,))
-
-    def get_bake_set_shape(self, bake_set):
-        transforms = cmds.listConnections(bake_set)
-        if transforms == None or len(transforms) == 0:
-            return None
-        transform = transforms[0]
-        shape_nodes = cmds.listRelatives(transform)
-        if shape_nodes == None or len(shape_nodes) == 0:
-            return None
-        return shape_nodes[0]
-
-    def get_bake_set_output_path(self, bake_set):
-        out_path = cmds.getAttr('%s.outputTexturePath' % (bake_set,))
-        out_path = out_path.replace('\\', '/')
-        if out_path[0] == '/' or out_path[1] == ':':
-            full_path = out_path
-        else:
-            full_path = proj_dir().replace('\\', '/')
-            if full_path[-1] != '/':
-                full_path += '/'
-            full_path += out_path
-        return full_path
-
     def get_render_params(self):
         """
         Returns a dict of all the render parameters set on the UI
         """
-        params = dict()
+        options = self.get_submit_options()
+        return self.builder.get_render_params(options)
+
+    def get_submit_options(self):
+        """
+        Returns the submit options set on the UI, in the form JobBuilder
+        takes them.
+        """
+        options = dict()
 
         if cmds.radioButton('existing_project', q=True, sl=True) == True:
             proj_name = eval_ui('existing_project_name', 'optionMenu', v=True)
@@ -788,100 +4686,54 @@ class SubmitWindow(object):
                 cmds.error('Your project name cannot be blank. Please select New Project and enter a name.')
         else:
             proj_name = eval_ui('new_project_name', text=True)
-        params['proj_name'] = proj_name
-
-        parent = eval_ui('parent_id', text=True).strip()
-        if parent != None and parent != "":
-            params['parent_id'] = parent
-        params['upload_only'] = int(eval_ui('upload_only', 'checkBox', v=True))
-        params['start_new_slots'] = int( not eval_ui('start_new_slots', 'checkBox', v=True) )
-        params['skip_check'] = int(eval_ui('skip_check', 'checkBox', v=True))
-        params['notify_complete'] = int(eval_ui('notify_complete', 'checkBox', v=True))
-        params['project'] = eval_ui('project', text=True)
-        params['out_path'] = eval_ui('output_dir', text=True)
-        params['ignore_plugin_errors'] = int(eval_ui('ignore_plugin_errors', 'checkBox', v=True))
+        options['proj_name'] = proj_name
+
+        options['parent_id'] = eval_ui('parent_id', text=True)
+        options['upload_only'] = int(eval_ui('upload_only', 'checkBox', v=True))
+        options['start_new_slots'] = int( not eval_ui('start_new_slots', 'checkBox', v=True) )
+        options['skip_check'] = int(eval_ui('skip_check', 'checkBox', v=True))
+        options['notify_complete'] = int(eval_ui('notify_complete', 'checkBox', v=True))
+        options['project'] = eval_ui('project', text=True)
+        options['out_path'] = eval_ui('output_dir', text=True)
+        options['ignore_plugin_errors'] = int(eval_ui('ignore_plugin_errors', 'checkBox', v=True))
 
         render = eval_ui('renderer', type='optionMenu', v=True)
-        for k in ZYNC.MAYA_RENDERERS:
-            if ZYNC.MAYA_RENDERERS[k] == render:
-                params['renderer'] = k
+        maya_renderers = get_maya_renderers()
+        for k in maya_renderers:
+            if maya_renderers[k] == render:
+                options['renderer'] = k
                 break
         else:
-            params['renderer'] = zync.MAYA_DEFAULT_RENDERER
+            options['renderer'] = zync.MAYA_DEFAULT_RENDERER
 
-        params['job_subtype'] = eval_ui('job_type', type='optionMenu', v=True).lower()
+        options['job_subtype'] = eval_ui('job_type', type='optionMenu', v=True).lower()
 
-        params['priority'] = int(eval_ui('priority', text=True))
-        params['num_instances'] = int(eval_ui('num_instances', text=True))
+        options['priority'] = int(eval_ui('priority', text=True))
+        options['num_instances'] = int(eval_ui('num_instances', text=True))
 
         selected_type = eval_ui('instance_type', 'optionMenu', v=True)
-        for inst_type in ZYNC.INSTANCE_TYPES:
-            if selected_type.split(' ')[0] == inst_type:
-                params['instance_type'] = inst_type
-                break
-        else:
-            params['instance_type'] = zync.DEFAULT_INSTANCE_TYPE
-
-        params['frange'] = eval_ui('frange', text=True)
-        params['step'] = int(eval_ui('frame_step', text=True))
-        params['chunk_size'] = int(eval_ui('chunk_size', text=True))
-        params['camera'] = eval_ui('camera', 'optionMenu', v=True)
-        params['xres'] = int(eval_ui('x_res', text=True))
-        params['yres'] = int(eval_ui('y_res', text=True))
-
-        if params['upload_only'] == 0 and params['renderer'] == 'vray':
-            params['vray_nightly'] = int(eval_ui('vray_nightly', 'checkBox', v=True))
-            if params['vray_nightly'] == 1:
-                vray_version = str(cmds.pluginInfo('vrayformaya', query=True, version=True))
-                if vray_version.startswith('3.0'):
-                    cmds.error('Nightly Builds are not currently supported for Vray 3.0.')
-            params['use_vrscene'] = int(eval_ui('use_standalone', 'checkBox', v=True))
-            if params['use_vrscene'] == 1 and params['job_subtype'] == 'bake':
-                cmds.error('Vray Standalone is not currently supported for Bake jobs.')
-            params['distributed'] = int(eval_ui('distributed', 'checkBox', v=True))
-            if params['distributed'] == 1 and params['job_subtype'] == 'bake':
-                cmds.error('Distributed Rendering is not currently supported for Bake jobs.')
-            params['use_mi'] = 0
-            params['use_ass'] = 0
-        elif params['upload_only'] == 0 and params['renderer'] == 'mr':
-            params['vray_nightly'] = 0
-            params['use_vrscene'] = 0
-            params['distributed'] = 0
-            params['use_mi'] = int(eval_ui('use_standalone', 'checkBox', v=True))
-            params['use_ass'] = 0
-        elif params['upload_only'] == 0 and params['renderer'] == 'arnold':
-            params['vray_nightly'] = 0
-            params['use_vrscene'] = 0
-            params['distributed'] = 0
-            params['use_mi'] = 0
-            params['use_ass'] = int(eval_ui('use_standalone', 'checkBox', v=True))
-        else:
-            params['vray_nightly'] = 0
-            params['use_vrscene'] = 0
-            params['distributed'] = 0
-            params['use_mi'] = 0
-
-        if params['upload_only'] == 1:
-            params['layers'] = None
-            params['bake_sets'] = None
-        elif params['job_subtype'] == 'bake':
-            bake_sets = eval_ui('layers', 'textScrollList', ai=True, si=True)
-            if not bake_sets:
-                msg = 'Please select bake set(s).'
-                raise MayaZyncException(msg)
-            bake_sets = ','.join(bake_sets)
-            params['bake_sets'] = bake_sets
-            params['layers'] = None
+        options['instance_type'] = selected_type.split(' ')[0]
+
+        options['frange'] = eval_ui('frange', text=True)
+        options['step'] = int(eval_ui('frame_step', text=True))
+        options['chunk_size'] = int(eval_ui('chunk_size', text=True))
+        options['camera'] = eval_ui('camera', 'optionMenu', v=True)
+        options['xres'] = int(eval_ui('x_res', text=True))
+        options['yres'] = int(eval_ui('y_res', text=True))
+
+        options['vray_nightly'] = int(eval_ui('vray_nightly', 'checkBox', v=True))
+        options['use_standalone'] = int(eval_ui('use_standalone', 'checkBox', v=True))
+        options['distributed'] = int(eval_ui('distributed', 'checkBox', v=True))
+
+        selected = eval_ui('layers', 'textScrollList', ai=True, si=True) or []
+        if options['job_subtype'] == 'bake':
+            options['bake_sets'] = selected
+            options['layers'] = []
         else:
-            layers = eval_ui('layers', 'textScrollList', ai=True, si=True)
-            if not layers:
-                msg = 'Please select layer(s) to render.'
-                raise MayaZyncException(msg)
-            layers = ','.join(layers)
-            params['layers'] = layers
-            params['bake_sets'] = None
+            options['layers'] = selected
+            options['bake_sets'] = []
 
-        return params
+        return options
 
     def show(self):
         """
@@ -890,10 +4742,7 @@ class SubmitWindow(object):
         cmds.showWindow(self.name)
  
     def init_bake(self):
-        self.bake_sets = (bake_set for bake_set in cmds.ls(type='VRayBakeOptions') \
-            if bake_set != 'vrayDefaultBakeOptions')
-        self.bake_sets = list(self.bake_sets)
-        self.bake_sets.sort()
+        self.bake_sets = self.scanner.bake_sets()
 
     #
     #   These init_* functions get run automatcially when the UI file is loaded.
@@ -902,17 +4751,10 @@ class SubmitWindow(object):
     #
 
     def init_layers(self):
-        self.layers = []
-        try:
-            all_layers = cmds.ls(type='renderLayer', showNamespace=True)
-            for i in range( 0, len(all_layers), 2 ):
-                if all_layers[i+1] == ':':
-                    self.layers.append( all_layers[i] )
-        except Exception:
-            self.layers = cmds.ls(type='renderLayer')
+        self.layers = self.scanner.render_layers()
 
     def init_existing_project_name(self):
-        project_response = ZYNC.get_project_list()
+        project_response = get_project_list()
         if project_response["code"] != 0:
             cmds.error( project_response["response"] )
         self.projects = project_response["response"]
@@ -930,11 +4772,12 @@ class SubmitWindow(object):
 
     def init_instance_type(self):
         non_default = []
-        for inst_type in ZYNC.INSTANCE_TYPES:
+        instance_types = get_instance_types()
+        for inst_type in instance_types:
             if inst_type == zync.DEFAULT_INSTANCE_TYPE:
-                cmds.menuItem( parent='instance_type', label='%s (%s)' % ( inst_type, ZYNC.INSTANCE_TYPES[inst_type]["description"] ) )
+                cmds.menuItem( parent='instance_type', label='%s (%s)' % ( inst_type, instance_types[inst_type]["description"] ) )
             else:
-                non_default.append( '%s (%s)' % ( inst_type, ZYNC.INSTANCE_TYPES[inst_type]["description"] ) ) 
+                non_default.append( '%s (%s)' % ( inst_type, instance_types[inst_type]["description"] ) ) 
         for label in non_default:
             cmds.menuItem( parent='instance_type', label=label )
 
@@ -943,35 +4786,14 @@ class SubmitWindow(object):
         #   Try to detect the currently selected renderer, so it will be selected
         #   when the form appears. If we can't, fall back to the default set in zync.py.
         #
-        try:
-            current_renderer = cmds.getAttr("defaultRenderGlobals.currentRenderer")
-            if current_renderer == "mentalRay":
-                default_renderer_name = ZYNC.MAYA_RENDERERS["mr"]
-                self.renderer = "mr"
-            elif current_renderer == "mayaSoftware":
-                default_renderer_name = ZYNC.MAYA_RENDERERS["sw"]
-                self.renderer = "sw"
-            elif current_renderer == "vray":
-                default_renderer_name = ZYNC.MAYA_RENDERERS["vray"]
-                self.renderer = zync.VRAY_RENDERER
-            elif current_renderer == "arnold":
-                if "arnold" in ZYNC.MAYA_RENDERERS:
-                    default_renderer_name = ZYNC.MAYA_RENDERERS["arnold"]
-                    self.renderer = "arnold"
-                else:
-                    raise Exception( "Arnold not supported for this site, using default ZYNC renderer." )
-            else:
-                default_renderer_name = ZYNC.MAYA_RENDERERS[zync.MAYA_DEFAULT_RENDERER]
-                self.renderer = zync.MAYA_DEFAULT_RENDERER
-        except:
-            default_renderer_name = ZYNC.MAYA_RENDERERS[zync.MAYA_DEFAULT_RENDERER]
-            self.renderer = zync.MAYA_DEFAULT_RENDERER
+        self.renderer = current_renderer()
+        default_renderer_name = get_maya_renderers().get(self.renderer)
 
         #
         #   Add the list of renderers to UI element.
         #
         rend_found = False
-        for item in ZYNC.MAYA_RENDERERS.values():
+        for item in get_maya_renderers().values():
             cmds.menuItem(parent='renderer', label=item)
             if item == default_renderer_name:
                 rend_found = True
@@ -979,181 +4801,55 @@ class SubmitWindow(object):
             cmds.optionMenu('renderer', e=True, v=default_renderer_name)
 
     def init_job_type(self):
-        self.job_types = ZYNC.JOB_SUBTYPES['maya']
+        self.job_types = get_job_subtypes()['maya']
 
     def init_camera(self):
-        cam_parents = [cmds.listRelatives(x, ap=True)[-1] for x in cmds.ls(cameras=True)]
-        for cam in cam_parents:
-            if ( cmds.getAttr( cam + '.renderable') ) == True:
-                cmds.menuItem( parent='camera', label=cam )
+        for cam in self.scanner.cameras():
+            cmds.menuItem( parent='camera', label=cam )
 
-    def get_scene_info(self, renderer):
+    def get_scene_info(self, renderer, project_dir=None):
         """
-        Returns scene info for the current scene.
-        We use this to allow ZYNC to skip the file checks.
-
+        Returns scene info for the current scene, for the layers or bake sets
+        selected on the UI.
         """
-
-        clear_layer_info()
-
-        layers = [x for x in cmds.ls(type='renderLayer') \
-                       if x != 'defaultRenderLayer' and not ':' in x]
-
         subtype = eval_ui('job_type', type='optionMenu', v=True).lower()
-        if subtype == 'bake':
-            selected_bake_sets = eval_ui('layers', 'textScrollList', ai=True, si=True)
-            if selected_bake_sets == None:
-                selected_bake_sets = []
-            selected_layers = []
-        else:
-            selected_layers = eval_ui('layers', 'textScrollList', ai=True, si=True)
-            if selected_layers == None:
-                selected_layers = []
-            selected_bake_sets = []
-
-        #
-        #   Detect a list of referenced files. We must use ls() instead of file(q=True, r=True)
-        #   because the latter will only detect references one level down, not nested references.
-        #
-        references = []
-        unresolved_references = []
-        for ref_node in cmds.ls(type='reference'):
-            try:
-                ref_file = cmds.referenceQuery(ref_node, filename=True)
-                references.append(ref_file)
-
-                un_ref_file = cmds.referenceQuery(ref_node, filename=True, unresolvedName=True)
-                unresolved_references.append(un_ref_file)
-            except:
-                pass
-
-        render_passes = {}
-        if renderer == 'vray' and cmds.getAttr('vraySettings.imageFormatStr') != 'exr (multichannel)':
-            pass_list = cmds.ls(type='VRayRenderElement')
-            pass_list += cmds.ls(type='VRayRenderElementSet')
-            if len(pass_list) > 0:
-                for layer in selected_layers:
-                    render_passes[layer] = []
-                    enabled_passes = get_layer_override(layer, renderer, 'render_passes')
-                    for r_pass in pass_list:
-                        if r_pass in enabled_passes:
-                            vray_name = None
-                            vray_explicit_name = None
-                            vray_file_name = None
-                            for attr_name in cmds.listAttr(r_pass):
-                                if attr_name.startswith('vray_filename'):
-                                    vray_file_name = cmds.getAttr('%s.%s' % (r_pass, attr_name))
-                                elif attr_name.startswith('vray_name'):
-                                    vray_name = cmds.getAttr('%s.%s' % (r_pass, attr_name))
-                                elif attr_name.startswith('vray_explicit_name'):
-                                    vray_explicit_name = cmds.getAttr('%s.%s' % (r_pass, attr_name))
-                            if vray_file_name != None and vray_file_name != "":
-                                final_name = vray_file_name
-                            elif vray_explicit_name != None and vray_explicit_name != "":
-                                final_name = vray_explicit_name
-                            elif vray_name != None and vray_name != "":
-                                final_name = vray_name
-                            else:
-                                continue
-                            # special case for Material Select elements - these are named based on the material
-                            # they are connected to.
-                            if 'vray_mtl_mtlselect' in cmds.listAttr(r_pass):
-                                connections = cmds.listConnections('%s.vray_mtl_mtlselect' % (r_pass,))
-                                if connections:
-                                    final_name += '_%s' % (str(connections[0]),)
-                            render_passes[layer].append(final_name)
-
-        layer_prefixes = dict()
-        for layer in selected_layers:
-            layer_prefix = get_layer_override(layer, renderer, 'prefix')
-            if layer_prefix != None:
-                layer_prefixes[layer] = layer_prefix
-
-        bake_set_info = dict()
-        for bake_set in selected_bake_sets:
-            bake_set_info[bake_set] = {}
-            bake_set_info[bake_set]['uvs'] = self.get_bake_set_uvs(bake_set)
-            bake_set_info[bake_set]['map'] = self.get_bake_set_map(bake_set)
-            bake_set_info[bake_set]['shape'] = self.get_bake_set_shape(bake_set)
-            bake_set_info[bake_set]['output_path'] = self.get_bake_set_output_path(bake_set)
-
-        if renderer == 'vray':
-            extension = cmds.getAttr('vraySettings.imageFormatStr')
-            if extension == None:
-                extension = 'png'
-            padding = int(cmds.getAttr('vraySettings.fileNamePadding'))
-        elif renderer == 'mr':
-            extension = cmds.getAttr('defaultRenderGlobals.imfPluginKey')
-            if not extension:
-                extension = get_default_extension(renderer)
-            padding = int(cmds.getAttr('defaultRenderGlobals.extensionPadding'))
-        elif renderer == 'arnold':
-            extension = cmds.getAttr('defaultRenderGlobals.imfPluginKey')
-            padding = int(cmds.getAttr('defaultRenderGlobals.extensionPadding'))
-        global_prefix = get_layer_override('defaultRenderLayer', renderer, 'prefix')
-
-        extension = extension[:3]
-
-        file_prefix = [global_prefix]
-        file_prefix.append(layer_prefixes)
-        files = list(set(get_scene_files()))
-
-        plugins = []
-        plugin_list = cmds.pluginInfo( query=True, pluginsInUse=True )
-        for i in range( 0, len(plugin_list), 2): 
-            plugins.append( str(plugin_list[i]) )
-
-        # detect MentalCore
-        mentalcore_used = False
-        try:
-            mc_nodes = cmds.ls(type='core_globals')
-            if len(mc_nodes) == 0:
-                mentalcore_used = False
-            else:
-                mc_node = mc_nodes[0]
-                if cmds.getAttr('%s.ec' % (mc_node,)) == True:
-                    mentalcore_used = True
-                else:
-                    mentalcore_used = False
-        except:
-            mentalcore_used = False
-        if mentalcore_used:
-            plugins.append('mentalcore')
-
-        # detect use of cache files
-        if len(cmds.ls(type='cacheFile')) > 0:
-            plugins.append('cache')
+        selected = eval_ui('layers', 'textScrollList', ai=True, si=True) or []
+        return self.scanner.get_scene_info(renderer, job_subtype=subtype,
+                                           layers=selected, bake_sets=selected,
+                                           project_dir=project_dir,
+                                           compact_sequences=compact_sequences_enabled())
 
-        version = get_maya_version() 
-
-        vray_version = ''
-        if renderer == 'vray':
-            try:
-                vray_version = str(cmds.pluginInfo('vrayformaya', query=True, version=True)) 
-            except:
-                raise Exception('Could not detect Vray version. This is required to render Vray jobs. Do you have the Vray plugin loaded?')
-
-        arnold_version = ''
-        if renderer == 'arnold':
-            try:
-                arnold_version = str(cmds.pluginInfo('mtoa', query=True, version=True)) 
-            except:
-                raise Exception('Could not detect Arnold version. This is required to render Arnold jobs. Do you have the Arnold plugin loaded?')
-
-        scene_info = {'files': files,
-                      'render_layers': self.layers,
-                      'render_passes': render_passes,
-                      'references': references,
-                      'unresolved_references': unresolved_references,
-                      'file_prefix': file_prefix,
-                      'padding': padding,
-                      'extension': extension,
-                      'plugins': plugins,
-                      'version': version,
-                      'arnold_version': arnold_version,
-                      'vray_version': vray_version,
-                      'bake_sets': bake_set_info}
-        return scene_info
+    def check_scene_files(self, found, missing):
+        """
+        Warns about scene files that are missing or very large, given the
+        results of stat_scene_files(). Raises a MayaZyncException if the user
+        chooses to cancel the submit.
+        """
+        large = [(path, size) for path, size, mtime in found if size >= LARGE_FILE_SIZE]
+        if not missing and not large:
+            return
+        lines = []
+        if missing:
+            lines.append('%d file(s) could not be found:' % (len(missing),))
+            lines.extend(missing[:20])
+            if len(missing) > 20:
+                lines.append('...')
+        if large:
+            if lines:
+                lines.append('')
+            lines.append('%d file(s) are larger than %d GB:' % (len(large), LARGE_FILE_SIZE / (1024 ** 3)))
+            for path, size in large[:20]:
+                lines.append('%s (%.1f GB)' % (path, size / float(1024 ** 3)))
+            if len(large) > 20:
+                lines.append('...')
+        result = cmds.confirmDialog(title='Scene File Check',
+                                    message='\n'.join(lines),
+                                    button=['Submit Anyway', 'Cancel'],
+                                    defaultButton='Cancel',
+                                    cancelButton='Cancel',
+                                    dismissString='Cancel')
+        if result != 'Submit Anyway':
+            raise MayaZyncException('Submit cancelled.')
 
     @staticmethod
     def get_initial_value(window, name):
@@ -1186,37 +4882,46 @@ class SubmitWindow(object):
         cmds.file( modified=original_modified )
         '''
 
-        params = window.get_render_params()
-
-        scene_info = window.get_scene_info(params['renderer'])
-        params['scene_info'] = scene_info
-
-        username = eval_ui('username', text=True)
-        password = eval_ui('password', text=True)
-        if username=='' or password=='':
-            msg = 'Please enter a ZYNC username and password.'
-            raise MayaZyncException(msg)
-
+        timer = SubmitTimer()
         try:
-            ZYNC.login( username=username, password=password )
-        except zync.ZyncAuthenticationError as e:
-            msg = 'ZYNC Username Authentication Failed'
-            raise MayaZyncException(msg)
+            # check the credentials before the scene is scanned, which can
+            # take a while on big scenes
+            username = eval_ui('username', text=True)
+            password = eval_ui('password', text=True)
+            if username=='' or password=='':
+                msg = 'Please enter a ZYNC username and password.'
+                raise MayaZyncException(msg)
 
-        try:
-            ZYNC.submit_job('maya', scene_path, params=params)
-            cmds.confirmDialog(title='Success',
-                               message='Job submitted to ZYNC.',
-                               button='OK',
-                               defaultButton='OK')
-        except zync.ZyncPreflightError as e:
-            cmds.confirmDialog(title='Preflight Check Failed',
-                               message=str(e),
-                               button='OK',
-                               defaultButton='OK')
-            
+            with timer.activate():
+                with timing_span('get_render_params'):
+                    params = window.get_render_params()
+
+                with timing_span('get_scene_info'):
+                    scene_info = window.get_scene_info(params['renderer'], project_dir=params['project'])
+                params['scene_info'] = scene_info
+            for error in window.scanner.errors:
+                cmds.warning(error)
+
+            #
+            #   Everything from here on doesn't touch the scene, so it runs in
+            #   the background and leaves Maya responsive. The task finishes
+            #   and saves the timer from then on.
+            #
+            SubmitTask(window, scene_path, params, username, password, timer=timer).start()
+        except:
+            timer.finish('failed')
+            timer.save(scene_path)
+            raise
 
 def submit_dialog():
     submit_window = SubmitWindow()
     submit_window.show()
 
+if __name__ == '__main__':
+    if len(sys.argv) == 5 and sys.argv[1] == 'scan':
+        sys.exit(_scan_main(*sys.argv[2:]))
+    if len(sys.argv) == 5 and sys.argv[1] == 'record_times':
+        sys.exit(_record_times_main(*sys.argv[2:]))
+    sys.exit('usage: mayapy zync_maya.py scan <scene> <out.json> <options json>\n'
+             '       python zync_maya.py record_times <scene> <layer> <times.csv>')
+